@@ -0,0 +1,6 @@
+-- AlterTable
+ALTER TABLE "PrintJob" ADD COLUMN "leaseExpiresAt" DATETIME;
+ALTER TABLE "PrintJob" ADD COLUMN "workerId" TEXT;
+
+-- CreateIndex
+CREATE INDEX "PrintJob_status_leaseExpiresAt_idx" ON "PrintJob"("status", "leaseExpiresAt");
@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """生成打印预览"""
+import os
 import sys
-sys.path.insert(0, '/home/david/study/jxkc/inventory-system/scripts')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from print_service_text import create_print_content
 
 job = {
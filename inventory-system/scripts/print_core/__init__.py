@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+"""
+打印服务公共模块
+各 print_service_*.py 脚本共用的任务客户端、调度、渲染器和服务主循环；
+也可以直接运行 python -m print_core --backend <渲染器> 作为通用打印服务
+"""
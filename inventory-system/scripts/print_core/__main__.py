@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+通用打印服务
+用法: python -m print_core --backend text|cups|escp|image|html_pdf|console [--printer 打印机] [--test]
+只导入所选渲染器需要的依赖；PRINT_RUNTIME=asyncio 时使用异步主循环（print_core.async_worker）
+"""
+
+import argparse
+import os
+import sys
+
+from print_core.renderers import RENDERERS, get_renderer
+
+# API配置
+API_BASE_URL = os.environ.get("PRINT_API_URL", "http://localhost:3001/api")
+POLL_INTERVAL = int(os.environ.get("PRINT_POLL_INTERVAL", "5"))
+DEFAULT_PRINTER = os.environ.get("CUPS_PRINTER", "default")
+PRINT_BACKEND = os.environ.get("PRINT_BACKEND", "text")
+
+# 主循环：thread（渲染线程池 + 打印机队列线程） | asyncio（一个事件循环，各阶段有超时）
+PRINT_RUNTIME = os.environ.get("PRINT_RUNTIME", "thread")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m print_core", description="打印服务")
+    parser.add_argument("--backend", default=PRINT_BACKEND, choices=sorted(RENDERERS), help="渲染器")
+    parser.add_argument("--printer", default=DEFAULT_PRINTER, help="默认打印机")
+    parser.add_argument("--test", action="store_true", help="只渲染示例任务并输出，不打印")
+    parser.add_argument("--runtime", default=PRINT_RUNTIME, choices=["thread", "asyncio"], help="主循环")
+    args = parser.parse_args(argv)
+
+    renderer = get_renderer(args.backend)
+
+    if args.test:
+        from print_core.sample import SAMPLE_JOB
+        document = renderer.render(SAMPLE_JOB)
+        if document.text is not None:
+            print(document.text)
+        print(f"渲染结果: {len(document.data)} 字节 ({document.suffix})")
+        return
+
+    from print_core.api_client import PRINT_LONG_POLL, create_client
+    from print_core.dispatcher import PRINT_WORKERS
+    from print_core.metrics import PRINT_METRICS_PORT
+    from print_core.sinks import PRINT_SINK
+    from print_core.spool import PRINT_SPOOL
+    from print_core.tracing import PRINT_TRACE_FILE
+    if args.runtime == "asyncio":
+        from print_core.async_worker import AsyncPrintWorker as PrintWorker
+    else:
+        from print_core.worker import PrintWorker
+
+    print("=" * 50)
+    print(f"打印服务已启动 ({renderer.title})")
+    print("=" * 50)
+    print(f"API地址: {API_BASE_URL}")
+    print(f"打印机: {args.printer}")
+    print(f"主循环: {args.runtime}")
+    print(f"渲染线程: {PRINT_WORKERS}")
+    print(f"输出通道: {PRINT_SINK}")
+    print(f"提交方式: {PRINT_SPOOL}")
+    print(f"指标接口: 端口 {PRINT_METRICS_PORT}" if PRINT_METRICS_PORT else "指标接口: 未启用")
+    print(f"链路追踪: {PRINT_TRACE_FILE}" if PRINT_TRACE_FILE else "链路追踪: 未启用")
+    print(f"长轮询: {PRINT_LONG_POLL}秒" if PRINT_LONG_POLL else f"轮询间隔: {POLL_INTERVAL}秒")
+    print("按 Ctrl+C 停止服务")
+    print()
+
+    client = create_client(API_BASE_URL, poll_interval=POLL_INTERVAL, printer_name=args.printer)
+    PrintWorker(renderer, client, default_printer=args.printer).run_forever()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
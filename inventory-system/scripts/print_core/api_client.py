@@ -0,0 +1,507 @@
+# -*- coding: utf-8 -*-
+"""
+打印任务API客户端
+通过认领接口获取任务：每个任务带租约，只会被一个打印服务认领，
+多台打印服务可以同时运行；支持长轮询，新任务创建后立即返回。
+状态更新经 StatusBuffer 合并后批量提交。
+所有请求共用一个连接池（keep-alive），连接失败自动退避重试，并记录每个接口的耗时
+"""
+
+import os
+import socket
+import threading
+import time
+
+from print_core import tracing
+from print_core.metrics import REQUEST_SECONDS, timed
+from print_core.print_view import decode_jobs
+
+# 长轮询等待时间（秒），0 表示关闭长轮询，按固定间隔轮询
+PRINT_LONG_POLL = int(os.environ.get("PRINT_LONG_POLL", "30"))
+
+# 打印服务ID，多台打印服务同时运行时用于区分认领者
+PRINT_WORKER_ID = os.environ.get("PRINT_WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+# 认领租约（秒），超时未完成的任务会被其他打印服务重新认领
+PRINT_LEASE_SECONDS = int(os.environ.get("PRINT_LEASE_SECONDS", "300"))
+
+# 续租间隔（秒），0 表示租约的三分之一；处理中的任务按此间隔续租，处理时间超过租约也不会被重新认领
+PRINT_LEASE_RENEW_INTERVAL = float(os.environ.get("PRINT_LEASE_RENEW_INTERVAL", "0"))
+
+# 续租失败后的重试间隔（秒）
+LEASE_RETRY_SECONDS = 10
+
+# 状态批量提交：缓冲条数上限、最长缓冲时间（秒）
+PRINT_STATUS_BATCH_SIZE = int(os.environ.get("PRINT_STATUS_BATCH_SIZE", "50"))
+PRINT_STATUS_FLUSH_INTERVAL = float(os.environ.get("PRINT_STATUS_FLUSH_INTERVAL", "1"))
+
+# 连接池大小、失败重试次数、重试退避系数（秒）
+PRINT_HTTP_POOL_SIZE = int(os.environ.get("PRINT_HTTP_POOL_SIZE", "10"))
+PRINT_HTTP_RETRIES = int(os.environ.get("PRINT_HTTP_RETRIES", "3"))
+PRINT_HTTP_BACKOFF = float(os.environ.get("PRINT_HTTP_BACKOFF", "0.5"))
+
+# 设为 1 时使用 HTTP/2（需要安装 httpx[http2]）
+PRINT_HTTP2 = os.environ.get("PRINT_HTTP2", "0") == "1"
+
+# 任务数据视图：print 只取渲染需要的字段（体积小、服务端一条联表查询），full 为完整订单数据
+PRINT_JOB_VIEW = os.environ.get("PRINT_JOB_VIEW", "print")
+
+# 请求超时（秒），长轮询请求在此基础上加上等待时间
+REQUEST_TIMEOUT = 10
+
+# 状态更新被拒绝时仍然重试的 4xx 状态码（其余 4xx 丢弃，只重试 5xx 和连接失败）
+RETRYABLE_CLIENT_ERRORS = (408, 429)
+
+
+def create_session(pool_size=None, retries=None, http2=None):
+    """创建带连接池的HTTP会话
+
+    默认使用 requests.Session：连接复用（keep-alive），连接失败、网关错误时按指数退避重试。
+    认领接口（POST）不做读超时/状态码重试，避免重复认领。
+    http2 为真且安装了 httpx 时改用 httpx.Client(http2=True)，接口与 requests 一致
+    """
+    pool_size = pool_size or PRINT_HTTP_POOL_SIZE
+    retries = PRINT_HTTP_RETRIES if retries is None else retries
+    http2 = PRINT_HTTP2 if http2 is None else http2
+
+    if http2:
+        try:
+            import httpx
+            return httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                transport=httpx.HTTPTransport(http2=True, retries=retries),
+            )
+        except ImportError:
+            print("未安装 httpx[http2]，使用 HTTP/1.1")
+
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=retries,
+        backoff_factor=PRINT_HTTP_BACKOFF,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(["GET", "PUT"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def create_client(base_url, poll_interval=5, printer_name=None):
+    """创建打印任务客户端：设置了 PRINT_DB_PATH 时直连数据库，否则通过HTTP API"""
+    if os.environ.get("PRINT_DB_PATH"):
+        from print_core.db_client import DBClient
+        return DBClient(poll_interval=poll_interval, printer_name=printer_name)
+    return APIClient(base_url, poll_interval=poll_interval, printer_name=printer_name)
+
+
+def status_record(job_id, status, printer_name=None, error_message=None):
+    """一条状态更新记录"""
+    record = {"id": job_id, "status": status}
+    if printer_name:
+        record["printerName"] = printer_name
+    if error_message is not None:
+        record["errorMessage"] = error_message
+    return record
+
+
+def merge_status(pending, record):
+    """记录放入待提交的状态（按任务ID），同一任务只保留最后一次状态，沿用之前记录的打印机"""
+    previous = pending.pop(record["id"], None)
+    if previous and "printerName" in previous and "printerName" not in record:
+        record["printerName"] = previous["printerName"]
+    pending[record["id"]] = record
+
+
+def client_error(response):
+    """状态更新被服务端拒绝（4xx）时返回错误信息：请求本身有误（参数错误、租约冲突等），重试也不会成功；
+    超时（408）、限流（429）和其他状态码返回 None"""
+    if not 400 <= response.status_code < 500 or response.status_code in RETRYABLE_CLIENT_ERRORS:
+        return None
+    try:
+        error = response.json().get("error")
+    except ValueError:
+        error = None
+    return f"{response.status_code} {error or response.text[:200]}"
+
+
+def report_stale(result):
+    """批量状态更新的返回结果中，提示租约已失效的任务"""
+    for item in result.get("data", []):
+        if not item.get("updated"):
+            print(f"打印任务 #{item.get('id')} 租约已失效，已被其他打印服务认领")
+
+
+def drop_rejected(records, error, leases):
+    """被服务端拒绝的状态记录：不再重试，记录日志"""
+    job_ids = ', '.join(f"#{record['id']}" for record in records)
+    print(f"更新打印任务状态被拒绝，不再重试 {job_ids}: {error}")
+    leases.release(records)
+
+
+class LeaseTracker:
+    """本打印服务持有租约的任务：认领时加入，最终状态提交后移除，按 renew_interval 续租
+
+    Args:
+        lease_seconds: 租约（秒）
+        renew_interval: 续租间隔（秒），不传时为 PRINT_LEASE_RENEW_INTERVAL 或租约的三分之一
+    """
+
+    def __init__(self, lease_seconds, renew_interval=None):
+        self.renew_interval = renew_interval or PRINT_LEASE_RENEW_INTERVAL or lease_seconds / 3
+        self._ids = set()
+        self._lock = threading.Lock()
+        self._renew_at = time.monotonic() + self.renew_interval
+
+    def hold(self, jobs):
+        """认领到的任务"""
+        with self._lock:
+            if not self._ids:
+                self._renew_at = time.monotonic() + self.renew_interval
+            self._ids.update(job["id"] for job in jobs)
+
+    def release(self, records):
+        """已提交的状态记录：最终状态（不再是 processing）的任务不再续租"""
+        with self._lock:
+            for record in records:
+                if record["status"] != 'processing':
+                    self._ids.discard(record["id"])
+
+    def drop(self, job_ids):
+        """已不归本打印服务所有的任务"""
+        with self._lock:
+            self._ids.difference_update(job_ids)
+
+    def is_due(self):
+        """是否到了续租时间"""
+        with self._lock:
+            return bool(self._ids) and time.monotonic() >= self._renew_at
+
+    def due(self):
+        """到了续租时间时返回需要续租的任务ID，否则返回空列表"""
+        with self._lock:
+            if not self._ids or time.monotonic() < self._renew_at:
+                return []
+            self._renew_at = time.monotonic() + self.renew_interval
+            return sorted(self._ids)
+
+    def renewed(self, ids, renewed_ids):
+        """续租结果：未续租成功的任务已不归本打印服务所有"""
+        lost = set(ids) - set(renewed_ids)
+        self.drop(lost)
+        for job_id in sorted(lost):
+            print(f"打印任务 #{job_id} 租约已失效，已被其他打印服务认领")
+        return lost
+
+    def failed(self):
+        """续租请求失败，稍后重试"""
+        with self._lock:
+            self._renew_at = min(self._renew_at, time.monotonic() + LEASE_RETRY_SECONDS)
+
+
+class LatencyStats:
+    """接口耗时统计：每个接口的调用次数、失败次数、总耗时、最大耗时"""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, ok=True):
+        REQUEST_SECONDS.observe(seconds, name, "1" if ok else "0")
+        with self._lock:
+            stat = self._stats.setdefault(name, {"count": 0, "errors": 0, "total": 0.0, "max": 0.0})
+            stat["count"] += 1
+            stat["total"] += seconds
+            stat["max"] = max(stat["max"], seconds)
+            if not ok:
+                stat["errors"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(stat) for name, stat in self._stats.items()}
+
+    def summary(self):
+        """耗时汇总文本"""
+        lines = []
+        for name, stat in sorted(self.snapshot().items()):
+            avg = stat["total"] / stat["count"] * 1000
+            lines.append(
+                f"{name}: {stat['count']}次 失败{stat['errors']}次 "
+                f"平均{avg:.1f}ms 最大{stat['max'] * 1000:.1f}ms"
+            )
+        return "\n".join(lines)
+
+
+class APIClient:
+    """API客户端"""
+
+    def __init__(self, base_url, poll_interval=5, long_poll=None, printer_name=None,
+                 worker_id=None, lease_seconds=None, session=None, view=None):
+        self.base_url = base_url
+        self.poll_interval = poll_interval
+        self.long_poll = PRINT_LONG_POLL if long_poll is None else long_poll
+        self.printer_name = printer_name
+        self.worker_id = worker_id or PRINT_WORKER_ID
+        self.lease_seconds = lease_seconds or PRINT_LEASE_SECONDS
+        self.session = session or create_session()
+        self.view = PRINT_JOB_VIEW if view is None else view
+        self.latency = LatencyStats()
+        self.leases = LeaseTracker(self.lease_seconds)
+
+    def _request(self, name, method, path, timeout=REQUEST_TIMEOUT, **kwargs):
+        """发送请求并记录耗时"""
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", timeout=timeout, **kwargs)
+            ok = response.status_code < 400
+            return response
+        finally:
+            self.latency.record(name, time.perf_counter() - started, ok)
+
+    def get_pending_jobs(self, limit=10, wait=0):
+        """获取待打印任务
+
+        Args:
+            limit: 最多返回的任务数
+            wait: 没有任务时服务端最多挂起的秒数
+        """
+        try:
+            params = {"limit": limit}
+            if self.view:
+                params["view"] = self.view
+            if wait:
+                params["wait"] = wait
+            response = self._request(
+                "pending", "GET", "/print-jobs/pending",
+                params=params,
+                timeout=REQUEST_TIMEOUT + wait
+            )
+            response.raise_for_status()
+            return decode_jobs(response.json())
+        except Exception as e:
+            print(f"获取打印任务失败: {e}")
+            return []
+
+    def claim_jobs(self, limit=10, wait=0):
+        """认领待打印任务
+
+        认领成功的任务在服务端已标记为 processing，租约期内不会再分给其他打印服务
+
+        Args:
+            limit: 最多认领的任务数
+            wait: 没有任务时服务端最多挂起的秒数
+        """
+        try:
+            response = self._request(
+                "claim", "POST", "/print-jobs/claim",
+                json=self.claim_payload(limit, wait),
+                timeout=REQUEST_TIMEOUT + wait
+            )
+            response.raise_for_status()
+            jobs = decode_jobs(response.json())
+            self.leases.hold(jobs)
+            return jobs
+        except Exception as e:
+            print(f"认领打印任务失败: {e}")
+            return []
+
+    def claim_payload(self, limit, wait):
+        """认领请求的参数"""
+        payload = {
+            "workerId": self.worker_id,
+            "limit": limit,
+            "leaseSeconds": self.lease_seconds,
+        }
+        if wait:
+            payload["wait"] = wait
+        if self.view:
+            payload["view"] = self.view
+        if self.printer_name:
+            payload["printerName"] = self.printer_name
+        return payload
+
+    def renew_leases(self):
+        """到了续租间隔时为处理中的任务续租，返回已失效（不再归本打印服务所有）的任务ID"""
+        ids = self.leases.due()
+        if not ids:
+            return set()
+        try:
+            response = self._request("lease", "PUT", "/print-jobs/lease", json=self.lease_payload(ids))
+            response.raise_for_status()
+            return self.leases.renewed(ids, response.json().get("data", []))
+        except Exception as e:
+            print(f"打印任务续租失败: {e}")
+            self.leases.failed()
+            return set()
+
+    def lease_payload(self, ids):
+        """续租请求的参数"""
+        return {"workerId": self.worker_id, "ids": ids, "leaseSeconds": self.lease_seconds}
+
+    def wait_for_jobs(self, limit=10):
+        """等待并认领待打印任务
+
+        长轮询模式下由服务端挂起请求直到有新任务；服务端不支持长轮询、
+        请求失败或关闭长轮询时，退回按 poll_interval 间隔轮询
+        """
+        started = time.monotonic()
+        jobs = self.claim_jobs(limit, wait=self.long_poll)
+        if not jobs:
+            remaining = self.poll_interval - (time.monotonic() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+        return jobs
+
+    def update_status(self, job_id, status, printer_name=None, error_message=None):
+        """更新打印任务状态
+
+        Returns:
+            是否提交完成（已更新，或被服务端拒绝、不再重试）；服务端错误、连接失败时返回 False
+        """
+        try:
+            payload = {"status": status, "workerId": self.worker_id}
+            if printer_name:
+                payload["printerName"] = printer_name
+            if error_message is not None:
+                payload["errorMessage"] = error_message
+
+            response = self._request(
+                "status", "PUT", f"/print-jobs/{job_id}/status",
+                json=payload
+            )
+            if response.status_code == 409:
+                print(f"打印任务 #{job_id} 租约已失效，已被其他打印服务认领")
+                self.leases.drop([job_id])
+                return True
+            error = client_error(response)
+            if error:
+                drop_rejected([{"id": job_id, "status": status}], error, self.leases)
+                return True
+            response.raise_for_status()
+            self.leases.release([{"id": job_id, "status": status}])
+            return True
+        except Exception as e:
+            print(f"更新打印任务状态失败: {e}")
+            return False
+
+    def update_statuses(self, records):
+        """批量更新打印任务状态
+
+        Args:
+            records: [{"id", "status", "printerName", "errorMessage"}, ...]
+
+        Returns:
+            是否提交完成；服务端错误（5xx）、连接失败时返回 False，调用方应保留记录稍后重试；
+            被服务端拒绝（4xx）的记录已记录日志并丢弃，返回 True
+        """
+        try:
+            response = self._request(
+                "status_batch", "PUT", "/print-jobs/status",
+                json=self.status_payload(records)
+            )
+            if response.status_code == 404:
+                # 服务端没有批量接口，逐条更新；有一条需要重试时整批保留（重复提交相同状态不影响结果）
+                done = [
+                    self.update_status(
+                        record["id"], record["status"],
+                        printer_name=record.get("printerName"),
+                        error_message=record.get("errorMessage")
+                    )
+                    for record in records
+                ]
+                return all(done)
+            error = client_error(response)
+            if error:
+                drop_rejected(records, error, self.leases)
+                return True
+            response.raise_for_status()
+            report_stale(response.json())
+            self.leases.release(records)
+            return True
+        except Exception as e:
+            print(f"批量更新打印任务状态失败: {e}")
+            return False
+
+    def status_payload(self, records):
+        """批量状态更新请求的参数"""
+        return {"updates": [dict(record, workerId=self.worker_id) for record in records]}
+
+    def close(self):
+        """关闭连接池"""
+        self.session.close()
+
+
+class StatusBuffer:
+    """状态更新缓冲
+
+    与 APIClient.update_status 用法相同，但只记录到内存：同一任务的多次状态变化
+    合并为最后一次，缓冲满 batch_size 条或超过 flush_interval 秒后一次性提交。
+    提交失败的记录保留在缓冲区，下次提交时重试；
+    后台线程同时为处理中的任务续租（api_client.renew_leases）
+    """
+
+    def __init__(self, api_client, batch_size=None, flush_interval=None):
+        self.api_client = api_client
+        self.batch_size = batch_size or PRINT_STATUS_BATCH_SIZE
+        self.flush_interval = flush_interval or PRINT_STATUS_FLUSH_INTERVAL
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def update_status(self, job_id, status, printer_name=None, error_message=None):
+        """记录状态变化"""
+        record = status_record(job_id, status, printer_name, error_message)
+        with self._lock:
+            merge_status(self._pending, record)
+            full = len(self._pending) >= self.batch_size
+        self.start()
+
+        if full:
+            self._wakeup.set()
+        return True
+
+    def start(self):
+        """启动后台线程（认领到任务后调用，处理期间按时续租）"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="status-flush", daemon=True)
+                self._thread.start()
+
+    def flush(self):
+        """立即提交缓冲的状态"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return True
+                records = list(self._pending.values())
+                self._pending.clear()
+
+            started = tracing.now()
+            with timed("status"):
+                updated = self.api_client.update_statuses(records)
+            tracing.statuses_flushed(records, started, updated)
+            if updated:
+                return True
+
+            # 提交失败放回缓冲区，期间新到的状态优先
+            with self._lock:
+                for record in records:
+                    self._pending.setdefault(record["id"], record)
+            return False
+
+    def _run(self):
+        """后台提交线程"""
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+            self.api_client.renew_leases()
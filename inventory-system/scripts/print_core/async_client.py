@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+异步打印任务客户端
+供异步打印服务（print_core.async_worker）使用：安装了 httpx 时用 httpx.AsyncClient 直接发起请求，
+请求参数、超时和耗时统计与 APIClient 一致；否则（以及直连数据库的 DBClient）在线程中调用同步客户端。
+状态更新经 AsyncStatusBuffer 合并后批量提交
+"""
+
+import asyncio
+import time
+
+from print_core import tracing
+from print_core.api_client import (
+    APIClient, PRINT_HTTP2, PRINT_HTTP_POOL_SIZE, PRINT_HTTP_RETRIES, PRINT_STATUS_BATCH_SIZE,
+    PRINT_STATUS_FLUSH_INTERVAL, REQUEST_TIMEOUT, client_error, drop_rejected, merge_status, report_stale,
+    status_record,
+)
+from print_core.metrics import timed
+from print_core.print_view import decode_jobs
+
+
+def create_async_client(client):
+    """按同步客户端创建对应的异步客户端"""
+    if isinstance(client, APIClient):
+        try:
+            return AsyncAPIClient(client)
+        except ImportError:
+            print("未安装 httpx，HTTP 请求在线程中执行")
+    return ThreadedClient(client)
+
+
+class AsyncJobClient:
+    """异步客户端公共部分：子类实现 claim_jobs / update_statuses / renew_leases"""
+
+    def __init__(self, client):
+        self.client = client
+        self.poll_interval = client.poll_interval
+        self.long_poll = getattr(client, 'long_poll', 0)
+        self.latency = client.latency
+
+    async def wait_for_jobs(self, limit=10):
+        """等待并认领待打印任务，没有任务时等到 poll_interval 秒后返回（不占用线程）"""
+        started = time.monotonic()
+        jobs = await self.claim_jobs(limit, wait=self.long_poll)
+        if not jobs:
+            remaining = self.poll_interval - (time.monotonic() - started)
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+        return jobs
+
+    async def claim_jobs(self, limit=10, wait=0):
+        raise NotImplementedError
+
+    async def update_statuses(self, records):
+        raise NotImplementedError
+
+    async def renew_leases(self):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class ThreadedClient(AsyncJobClient):
+    """在线程中调用同步客户端（DBClient，或未安装 httpx 时的 APIClient）"""
+
+    async def claim_jobs(self, limit=10, wait=0):
+        return await asyncio.to_thread(self.client.claim_jobs, limit, wait)
+
+    async def update_statuses(self, records):
+        return await asyncio.to_thread(self.client.update_statuses, records)
+
+    async def renew_leases(self):
+        # 没到续租时间时不占用线程
+        if not self.client.leases.is_due():
+            return set()
+        return await asyncio.to_thread(self.client.renew_leases)
+
+
+class AsyncAPIClient(AsyncJobClient):
+    """httpx.AsyncClient 发起请求的API客户端
+
+    Args:
+        client: APIClient，沿用其地址、打印服务ID、租约、数据视图和耗时统计
+    """
+
+    def __init__(self, client, pool_size=None, retries=None, http2=None):
+        import httpx
+
+        super().__init__(client)
+        pool_size = pool_size or PRINT_HTTP_POOL_SIZE
+        retries = PRINT_HTTP_RETRIES if retries is None else retries
+        http2 = PRINT_HTTP2 if http2 is None else http2
+
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        try:
+            transport = httpx.AsyncHTTPTransport(http2=http2, retries=retries, limits=limits)
+        except ImportError:
+            print("未安装 httpx[http2]，使用 HTTP/1.1")
+            transport = httpx.AsyncHTTPTransport(retries=retries, limits=limits)
+        self.http = httpx.AsyncClient(transport=transport)
+
+    async def _request(self, name, method, path, timeout=REQUEST_TIMEOUT, **kwargs):
+        """发送请求并记录耗时"""
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = await self.http.request(method, f"{self.client.base_url}{path}", timeout=timeout, **kwargs)
+            ok = response.status_code < 400
+            return response
+        finally:
+            self.latency.record(name, time.perf_counter() - started, ok)
+
+    async def claim_jobs(self, limit=10, wait=0):
+        """认领待打印任务，参数同 APIClient.claim_jobs"""
+        try:
+            response = await self._request(
+                "claim", "POST", "/print-jobs/claim",
+                json=self.client.claim_payload(limit, wait),
+                timeout=REQUEST_TIMEOUT + wait
+            )
+            response.raise_for_status()
+            jobs = decode_jobs(response.json())
+            self.client.leases.hold(jobs)
+            return jobs
+        except Exception as e:
+            print(f"认领打印任务失败: {e}")
+            return []
+
+    async def update_status(self, job_id, status, printer_name=None, error_message=None):
+        """更新打印任务状态，返回值同 APIClient.update_status"""
+        try:
+            payload = {"status": status, "workerId": self.client.worker_id}
+            if printer_name:
+                payload["printerName"] = printer_name
+            if error_message is not None:
+                payload["errorMessage"] = error_message
+
+            response = await self._request(
+                "status", "PUT", f"/print-jobs/{job_id}/status",
+                json=payload
+            )
+            if response.status_code == 409:
+                print(f"打印任务 #{job_id} 租约已失效，已被其他打印服务认领")
+                self.client.leases.drop([job_id])
+                return True
+            error = client_error(response)
+            if error:
+                drop_rejected([{"id": job_id, "status": status}], error, self.client.leases)
+                return True
+            response.raise_for_status()
+            self.client.leases.release([{"id": job_id, "status": status}])
+            return True
+        except Exception as e:
+            print(f"更新打印任务状态失败: {e}")
+            return False
+
+    async def update_statuses(self, records):
+        """批量更新打印任务状态，参数同 APIClient.update_statuses"""
+        try:
+            response = await self._request(
+                "status_batch", "PUT", "/print-jobs/status",
+                json=self.client.status_payload(records)
+            )
+            if response.status_code == 404:
+                # 服务端没有批量接口，逐条更新；有一条需要重试时整批保留（重复提交相同状态不影响结果）
+                done = [
+                    await self.update_status(
+                        record["id"], record["status"],
+                        printer_name=record.get("printerName"),
+                        error_message=record.get("errorMessage")
+                    )
+                    for record in records
+                ]
+                return all(done)
+            error = client_error(response)
+            if error:
+                drop_rejected(records, error, self.client.leases)
+                return True
+            response.raise_for_status()
+            report_stale(response.json())
+            self.client.leases.release(records)
+            return True
+        except Exception as e:
+            print(f"批量更新打印任务状态失败: {e}")
+            return False
+
+    async def renew_leases(self):
+        """为处理中的任务续租，参数同 APIClient.renew_leases"""
+        leases = self.client.leases
+        ids = leases.due()
+        if not ids:
+            return set()
+        try:
+            response = await self._request("lease", "PUT", "/print-jobs/lease", json=self.client.lease_payload(ids))
+            response.raise_for_status()
+            return leases.renewed(ids, response.json().get("data", []))
+        except Exception as e:
+            print(f"打印任务续租失败: {e}")
+            leases.failed()
+            return set()
+
+    async def close(self):
+        """关闭连接池"""
+        await self.http.aclose()
+
+
+class AsyncStatusBuffer:
+    """StatusBuffer 的异步版本
+
+    update_status 只记录到内存（在事件循环中调用），run() 按 flush_interval 或缓冲满时批量提交，
+    并为处理中的任务续租；单次提交超过 timeout 秒视为失败，记录保留到下次重试
+    """
+
+    def __init__(self, client, batch_size=None, flush_interval=None, timeout=REQUEST_TIMEOUT):
+        self.client = client
+        self.batch_size = batch_size or PRINT_STATUS_BATCH_SIZE
+        self.flush_interval = flush_interval or PRINT_STATUS_FLUSH_INTERVAL
+        self.timeout = timeout
+        self._pending = {}
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+
+    def update_status(self, job_id, status, printer_name=None, error_message=None):
+        """记录状态变化"""
+        merge_status(self._pending, status_record(job_id, status, printer_name, error_message))
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    async def flush(self):
+        """立即提交缓冲的状态"""
+        async with self._flush_lock:
+            if not self._pending:
+                return True
+            records = list(self._pending.values())
+            self._pending.clear()
+
+            started = tracing.now()
+            updated = False
+            try:
+                with timed("status"):
+                    updated = await asyncio.wait_for(self.client.update_statuses(records), self.timeout)
+            except asyncio.TimeoutError:
+                print(f"提交打印任务状态超时（{self.timeout}秒）")
+            except BaseException:
+                # 提交中途被取消（停止服务）或出错：放回缓冲区，由停止服务时的最后一次 flush 重新提交
+                self._restore(records)
+                raise
+            tracing.statuses_flushed(records, started, updated)
+            if updated:
+                return True
+            self._restore(records)
+            return False
+
+    def _restore(self, records):
+        """提交失败的记录放回缓冲区，期间新到的状态优先"""
+        for record in records:
+            self._pending.setdefault(record["id"], record)
+
+    async def run(self):
+        """后台提交任务"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+            try:
+                await asyncio.wait_for(self.client.renew_leases(), self.timeout)
+            except asyncio.TimeoutError:
+                print(f"打印任务续租超时（{self.timeout}秒）")
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+异步打印服务主循环
+一个事件循环同时认领、渲染、提交和回写状态：认领不等上一批打印完，最多 PRINT_ASYNC_JOBS 个任务同时处理；
+每台打印机一个提交队列，保证同一台打印机按顺序出纸，一台打印机卡住不影响其他打印机。
+认领、渲染、提交、状态回写各有超时，超时的阶段被取消，其中的 lp / wkhtmltopdf 子进程随即结束；
+在线程中执行的渲染（Python 代码无法中断）超时后结果丢弃，任务记为失败。
+停止服务时已认领、还没开始提交的任务退回待打印，不必等租约过期。
+用法: PRINT_RUNTIME=asyncio python -m print_core --backend ...
+"""
+
+import asyncio
+import os
+
+from print_core import metrics, tracing
+from print_core.api_client import REQUEST_TIMEOUT
+from print_core.async_client import AsyncStatusBuffer, create_async_client
+from print_core.dispatcher import PRINT_WORKERS
+from print_core.render_cache import PRINT_RENDER_CACHE, RenderCache
+from print_core.renderers.base import PageStream
+from print_core.sinks import close_sink
+from print_core.worker import BATCH_SIZE, PRINT_STREAM_PAGES
+
+# 同时处理（已认领、未完成）的任务数上限
+PRINT_ASYNC_JOBS = int(os.environ.get("PRINT_ASYNC_JOBS", "32"))
+
+# 各阶段超时（秒）：认领（长轮询时加上等待时间）、渲染、提交（多页订单按页数计）、状态回写
+PRINT_CLAIM_TIMEOUT = float(os.environ.get("PRINT_CLAIM_TIMEOUT", str(REQUEST_TIMEOUT + 5)))
+PRINT_RENDER_TIMEOUT = float(os.environ.get("PRINT_RENDER_TIMEOUT", "90"))
+PRINT_SPOOL_TIMEOUT = float(os.environ.get("PRINT_SPOOL_TIMEOUT", "90"))
+PRINT_STATUS_TIMEOUT = float(os.environ.get("PRINT_STATUS_TIMEOUT", str(REQUEST_TIMEOUT + 5)))
+
+
+class AsyncPrintWorker:
+    """异步打印服务，参数与 PrintWorker 一致
+
+    Args:
+        renderer: 渲染器（print_core.renderers.base.Renderer）
+        client: 任务客户端（APIClient 或 DBClient）
+        default_printer: 任务未指定打印机时使用的打印机
+        batch_size: 每次认领的任务数
+        max_workers: 同时渲染的任务数
+        render_cache: 渲染缓存，默认按 PRINT_RENDER_CACHE 创建，传 False 关闭
+        stream_pages: 多页订单逐页提交，默认按 PRINT_STREAM_PAGES
+        max_jobs: 同时处理的任务数，默认按 PRINT_ASYNC_JOBS
+    """
+
+    def __init__(self, renderer, client, default_printer="default", batch_size=None, max_workers=None,
+                 render_cache=None, stream_pages=None, max_jobs=None):
+        self.renderer = renderer
+        self.client = client
+        self.default_printer = default_printer
+        self.batch_size = batch_size or BATCH_SIZE
+        self.max_workers = max_workers or PRINT_WORKERS
+        self.max_jobs = max_jobs or PRINT_ASYNC_JOBS
+        self.stream_pages = PRINT_STREAM_PAGES if stream_pages is None else stream_pages
+        if render_cache is None:
+            render_cache = RenderCache() if PRINT_RENDER_CACHE else False
+        self.render_cache = render_cache or None
+        self.claim_timeout = PRINT_CLAIM_TIMEOUT
+        self.render_timeout = PRINT_RENDER_TIMEOUT
+        self.spool_timeout = PRINT_SPOOL_TIMEOUT
+        self.status_timeout = PRINT_STATUS_TIMEOUT
+        # 以下在事件循环中创建
+        self.jobs_client = None
+        self.status_buffer = None
+        self._render_slots = None
+        self._capacity = None
+        self._active = 0
+        self._queues = {}
+        self._waiting = {}
+        self._tasks = []
+        self.poll_clock = metrics.PollClock()
+
+    def printer_for(self, job):
+        """任务对应的打印机"""
+        return job.get("printerName") or self.default_printer
+
+    def _start(self):
+        if self.jobs_client is not None:
+            return
+        self.jobs_client = create_async_client(self.client)
+        self.status_buffer = AsyncStatusBuffer(self.jobs_client, timeout=self.status_timeout)
+        self._render_slots = asyncio.Semaphore(self.max_workers)
+        self._capacity = asyncio.Condition()
+        self._tasks.append(asyncio.create_task(self.status_buffer.run(), name="status-flush"))
+
+    async def render(self, job):
+        """渲染阶段，同时渲染的任务数不超过 max_workers；超时只计渲染本身，不含等待空闲渲染位的时间"""
+        async with self._render_slots:
+            print(f"处理打印任务 #{job['id']}, 订单 #{job.get('orderId') or job.get('order', {}).get('id')}")
+            with tracing.stage("render", job['id']):
+                return await asyncio.wait_for(self.render_document(job), self.render_timeout)
+
+    async def render_document(self, job):
+        """渲染任务文档"""
+        if self.stream_pages and self.renderer.page_count(job) > 1:
+            # 第一页在线程中渲染，其余页在提交时逐页渲染
+            return await asyncio.to_thread(lambda: PageStream(self.renderer.render_pages(job)))
+        if self.render_cache is not None:
+            return await self.render_cache.render_async(self.renderer, job)
+        return await self.renderer.render_async(job)
+
+    async def submit(self, printer_name, job, rendered):
+        """等待渲染结果并提交打印，回写状态"""
+        job_id = job['id']
+        try:
+            document = await rendered
+        except asyncio.TimeoutError:
+            return self.fail(job, f"渲染超时（{self.render_timeout:g}秒）")
+        except Exception as e:
+            return self.fail(job, e)
+
+        # 开始提交后停止服务不再退回任务（可能已经出纸）
+        self._waiting.pop(job_id, None)
+        try:
+            if isinstance(document, PageStream):
+                timeout = self.spool_timeout * self.renderer.page_count(job)
+                spooling = self.renderer.spool_pages_async(printer_name, document)
+            else:
+                timeout = self.spool_timeout
+                spooling = self.renderer.spool_async(printer_name, document)
+            with tracing.stage("spool", job_id, **{"print.printer": printer_name}) as span:
+                success, spool_id, error = await asyncio.wait_for(spooling, timeout)
+                span.set("cups.job.id", spool_id)
+                if not success:
+                    span.fail(error)
+        except asyncio.TimeoutError:
+            return self.fail(job, f"提交打印超时（{timeout:g}秒）")
+        except Exception as e:
+            return self.fail(job, e)
+        metrics.job_finished(printer_name, 'completed' if success else 'failed')
+
+        if success:
+            print(f"打印成功 #{job_id}" + (f", 打印作业: {spool_id}" if spool_id else ""))
+            self.status_buffer.update_status(job_id, 'completed', printer_name=printer_name)
+        else:
+            print(f"打印失败 #{job_id}: {error}")
+            self.status_buffer.update_status(job_id, 'failed', error_message=error)
+        return success
+
+    def fail(self, job, e):
+        """渲染或提交失败"""
+        error_msg = str(e)
+        metrics.job_finished(self.printer_for(job), 'error')
+        tracing.job_error(job['id'], error_msg)
+        print(f"打印任务 #{job['id']} 失败: {error_msg}")
+        self.status_buffer.update_status(job['id'], 'failed', error_message=error_msg)
+        return False
+
+    def dispatch(self, jobs):
+        """任务立即开始渲染，按打印机排队等待提交"""
+        for job in jobs:
+            self._active += 1
+            printer_name = self.printer_for(job)
+            metrics.QUEUE_DEPTH.inc(printer_name)
+            rendered = asyncio.create_task(self.render(job))
+            self._waiting[job['id']] = (printer_name, job, rendered)
+            self._queue_for(printer_name).put_nowait((job, rendered))
+
+    def _queue_for(self, printer_name):
+        """获取打印机的提交队列，首次使用时启动队列任务"""
+        q = self._queues.get(printer_name)
+        if q is None:
+            q = asyncio.Queue()
+            self._queues[printer_name] = q
+            self._tasks.append(asyncio.create_task(self._printer_loop(printer_name, q), name=f"printer-{printer_name}"))
+        return q
+
+    async def _printer_loop(self, printer_name, q):
+        """打印机队列任务：按认领顺序等待渲染结果并提交"""
+        while True:
+            job, rendered = await q.get()
+            try:
+                await self.submit(printer_name, job, rendered)
+            except Exception as e:
+                print(f"打印任务 #{job.get('id')} 失败: {e}")
+            finally:
+                self._waiting.pop(job.get('id'), None)
+                metrics.QUEUE_DEPTH.dec(printer_name)
+                q.task_done()
+                async with self._capacity:
+                    self._active -= 1
+                    self._capacity.notify_all()
+
+    async def claim(self):
+        """有空闲容量时认领一批任务，返回任务列表"""
+        # 轮询间隔包括等待空闲容量的时间
+        async with self._capacity:
+            await self._capacity.wait_for(lambda: self._active < self.max_jobs)
+            limit = min(self.batch_size, self.max_jobs - self._active)
+        started = self.poll_clock.claiming()
+        claim_started = tracing.now()
+        jobs = []
+        timeout = self.claim_timeout + self.jobs_client.long_poll + self.jobs_client.poll_interval
+        try:
+            jobs = await asyncio.wait_for(self.jobs_client.wait_for_jobs(limit=limit), timeout)
+        except asyncio.TimeoutError:
+            print(f"认领打印任务超时（{timeout:g}秒）")
+        self.poll_clock.claimed(jobs, started)
+        tracing.jobs_claimed(jobs, claim_started)
+        return jobs
+
+    async def run_once(self):
+        """认领并处理一批任务，等待全部提交完成，返回任务数"""
+        self._start()
+        jobs = await self.claim()
+        if jobs:
+            print(f"发现 {len(jobs)} 个待打印任务")
+            self.dispatch(jobs)
+            for q in list(self._queues.values()):
+                await q.join()
+            await self.status_buffer.flush()
+        else:
+            print("没有待打印任务")
+        return len(jobs)
+
+    async def run(self):
+        """主循环：持续认领，不等上一批打印完成"""
+        self._start()
+        try:
+            while True:
+                jobs = await self.claim()
+                if jobs:
+                    print(f"发现 {len(jobs)} 个待打印任务（处理中 {self._active} 个）")
+                    self.dispatch(jobs)
+        finally:
+            await self.stop()
+
+    def run_forever(self):
+        """在事件循环中运行主循环，Ctrl+C 停止；设置了 PRINT_METRICS_PORT 时同时提供指标接口"""
+        metrics.WORKER_INFO.set(1, self.renderer.name, "asyncio", getattr(self.client, "worker_id", ""))
+        metrics.start_server()
+        try:
+            asyncio.run(self.run())
+        except KeyboardInterrupt:
+            pass
+        print("\n打印服务已停止")
+
+    def release_waiting(self):
+        """停止服务时还没开始提交的任务退回待打印（服务端同时清除 workerId），其他服务可以立即认领，不必等租约过期"""
+        if not self._waiting:
+            return
+        for printer_name, job, rendered in self._waiting.values():
+            rendered.cancel()
+            metrics.QUEUE_DEPTH.dec(printer_name)
+            self.status_buffer.update_status(job['id'], 'pending')
+        print(f"退回 {len(self._waiting)} 个未开始打印的任务")
+        self._waiting.clear()
+
+    async def stop(self):
+        """取消处理中的任务，退回未开始提交的任务，提交剩余状态，关闭打印机连接、渲染进程和客户端"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        if self.status_buffer is not None:
+            self.release_waiting()
+            await self.status_buffer.flush()
+        close_sink()
+        self.renderer.close()
+        print(self.client.latency.summary())
+        if self.render_cache is not None:
+            print(self.render_cache.summary())
+        if self.jobs_client is not None:
+            await self.jobs_client.close()
+        self.client.close()
+        tracing.shutdown()
@@ -0,0 +1,448 @@
+# -*- coding: utf-8 -*-
+"""
+性能测试与正确性校验
+用法: python -m print_core.bench chinese [--limit 200000] [--rounds 100000]
+      python -m print_core.bench templates [--rounds 20000]
+      python -m print_core.bench raster [--jobs 48] [--threads 4] [--processes 4]
+      python -m print_core.bench mono [--rounds 20]
+      python -m print_core.bench widths [--rounds 20000]
+      python -m print_core.bench wrap [--rounds 20000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+from print_core.common import (
+    cents_to_chinese, format_order_date, item_fields, job_fields, number_to_chinese,
+)
+
+
+def legacy_number_to_chinese(num):
+    """旧版数字转中文大写（浮点运算），仅用于对比"""
+    if not num or num == 0:
+        return "零元整"
+
+    digits = ['零', '壹', '贰', '叁', '肆', '伍', '陆', '柒', '捌', '玖']
+    units = ['', '拾', '佰', '仟']
+    big_units = ['', '万', '亿']
+
+    num = float(num)
+    integer_part = int(num)
+    decimal_part = round((num - integer_part) * 100)
+
+    if integer_part == 0:
+        result = '零'
+    else:
+        result = ''
+        num_str = str(integer_part)
+        groups = []
+
+        while num_str:
+            groups.insert(0, num_str[-4:])
+            num_str = num_str[:-4]
+
+        for i, group in enumerate(groups):
+            group_result = ''
+            zero_flag = False
+            group_zero = True
+
+            for j, ch in enumerate(group):
+                digit = int(ch)
+                position = len(group) - 1 - j
+
+                if digit == 0:
+                    if not zero_flag and not group_zero:
+                        group_result += digits[0]
+                        zero_flag = True
+                else:
+                    zero_flag = False
+                    group_zero = False
+                    group_result += digits[digit] + units[position]
+
+            if not group_zero:
+                result += group_result + big_units[len(groups) - 1 - i]
+            elif i < len(groups) - 1 and not result.endswith(digits[0]):
+                result += digits[0]
+
+    result += '元'
+
+    jiao = decimal_part // 10
+    fen = decimal_part % 10
+
+    if jiao == 0 and fen == 0:
+        result += '整'
+    else:
+        if jiao > 0:
+            result += digits[jiao] + '角'
+        if fen > 0:
+            result += digits[fen] + '分'
+
+    return result
+
+
+# 读零规则的固定用例（旧版在这些金额上漏读或多读零）
+CHINESE_CASES = {
+    '0': '零元整',
+    '0.05': '零元伍分',
+    '0.29': '零元贰角玖分',
+    '1.05': '壹元零伍分',
+    '10': '壹拾元整',
+    '100.5': '壹佰元伍角',
+    '1010': '壹仟零壹拾元整',
+    '10001': '壹万零壹元整',
+    '100100': '壹拾万零壹佰元整',
+    '10000000': '壹仟万元整',
+    '10000100': '壹仟万零壹佰元整',
+    '100000000': '壹亿元整',
+    '100010000': '壹亿零壹万元整',
+    '1234.56': '壹仟贰佰叁拾肆元伍角陆分',
+    '0.995': '壹元整',
+    '-3.5': '负叁元伍角',
+    '-0.05': '负零元伍分',
+}
+
+
+def verify_number_to_chinese(limit):
+    """校验 number_to_chinese，返回错误列表
+
+    1. 固定用例
+    2. 0.00-999.99 每一分、0-limit 每个整数、随机大额：与旧版去掉“零”后完全一致
+       （两者只在读零位置上有区别），同时统计与旧版完全一致的比例
+    3. 0.00-999.99 每一分：float 输入与 Decimal 输入结果一致（没有浮点误差）
+    """
+    errors = []
+
+    for text, expected in CHINESE_CASES.items():
+        result = number_to_chinese(Decimal(text))
+        if result != expected:
+            errors.append(f"{text}: {result} != {expected}")
+
+    rng = random.Random(0)
+    values = [Decimal(cents).scaleb(-2) for cents in range(100000)]
+    values += [Decimal(n) for n in range(limit)]
+    values += [Decimal(rng.randrange(10 ** 12)).scaleb(-2) for _ in range(limit // 10)]
+
+    same = 0
+    for value in values:
+        result = number_to_chinese(value)
+        try:
+            legacy = legacy_number_to_chinese(value)
+        except IndexError:
+            # 旧版在 x.995 以上等金额四舍五入到100分时越界
+            continue
+        if result == legacy:
+            same += 1
+        elif result.replace('零', '') != legacy.replace('零', ''):
+            errors.append(f"{value}: {result} / 旧版 {legacy}")
+
+    for cents in range(100000):
+        text = f"{cents // 100}.{cents % 100:02d}"
+        if number_to_chinese(float(text)) != cents_to_chinese(cents):
+            errors.append(f"{text}: float 输入结果不一致")
+
+    print(f"校验 {len(values) + len(CHINESE_CASES) + 100000} 个金额，"
+          f"与旧版完全一致 {same}/{len(values)}，错误 {len(errors)} 个")
+    return errors
+
+
+def bench(name, func, args):
+    """执行并输出每次调用的平均耗时"""
+    started = time.perf_counter()
+    for arg in args:
+        func(arg)
+    elapsed = time.perf_counter() - started
+    print(f"{name}: {elapsed / len(args) * 1e6:.2f}µs/次")
+    return elapsed
+
+
+def bench_number_to_chinese(rounds):
+    """对比旧版、新版（无缓存）、新版（缓存命中）的耗时"""
+    rng = random.Random(0)
+    amounts = [rng.randrange(100, 10 ** 7) / 100 for _ in range(rounds)]
+
+    legacy = bench("旧版", legacy_number_to_chinese, amounts)
+    cents_to_chinese.cache_clear()
+    number_to_chinese.cache_clear()
+    uncached = bench("新版（首次）", number_to_chinese, amounts)
+    # 同一批金额重复打印（补打、同额订单）时命中缓存
+    repeated = [amounts[i % 100] for i in range(rounds)]
+    bench("新版（重复金额）", number_to_chinese, repeated)
+    print(f"加速: {legacy / uncached:.1f}x")
+
+
+def legacy_generate_html(head, job):
+    """旧版HTML生成：整页 f-string，商品行用 += 拼接（样式部分取自模板，与旧版等长）"""
+    order, products, customer = job_fields(job)
+    order_date = format_order_date(order.get('createdAt', ''))
+    total_amount = float(order.get('totalAmount', 0))
+    total_qty = sum(item.get('quantity', 0) for item in products)
+
+    product_rows = ""
+    for idx, item in enumerate(products, 1):
+        fields = item_fields(item)
+        product_rows += f"""
+        <tr>
+            <td class="cell center">{idx}</td>
+            <td class="cell">{fields['name']}</td>
+            <td class="cell right">{fields['quantity']}</td>
+            <td class="cell right">{fields['price']:.2f}</td>
+            <td class="cell right">{fields['amount']:.2f}</td>
+        </tr>
+        """
+    for _ in range(max(4 - len(products), 0)):
+        product_rows += """
+        <tr>
+            <td class="cell center">&nbsp;</td>
+            <td class="cell">&nbsp;</td>
+            <td class="cell right">&nbsp;</td>
+            <td class="cell right">&nbsp;</td>
+            <td class="cell right">&nbsp;</td>
+        </tr>
+        """
+
+    html = head + f"""    <div class="title">销售单</div>
+    <table class="header">
+        <tr>
+            <td class="header-left">客户: {customer.get('name', '')}</td>
+            <td class="header-right">日期: {order_date}</td>
+        </tr>
+        <tr>
+            <td class="header-left">电话: {customer.get('phone', '')}</td>
+            <td class="header-right">单号: {order.get('orderNumber', '')}</td>
+        </tr>
+    </table>
+    <table class="info-table">
+        <tbody>
+            {product_rows}
+        </tbody>
+    </table>
+    <table class="total-section">
+        <tr><td>总数量: {total_qty}</td></tr>
+        <tr><td>总金额: ¥{total_amount:.2f}</td></tr>
+        <tr><td>大写: {number_to_chinese(total_amount)}</td></tr>
+    </table>
+</body>
+</html>"""
+    return html.encode('utf-8')
+
+
+def sample_order(lines):
+    """生成指定商品行数的订单"""
+    from print_core.sample import SAMPLE_JOB
+
+    products = SAMPLE_JOB['order']['products']
+    items = [dict(products[i % len(products)]) for i in range(lines)]
+    for i, item in enumerate(items):
+        item['product'] = {"name": f"{item['product']['name']}{i + 1}", "code": f"P{i + 1:05d}"}
+    return {"id": 0, "order": dict(SAMPLE_JOB['order'], products=items)}
+
+
+def bench_templates(rounds, line_counts=(1, 50, 500)):
+    """对比旧版 f-string 拼接与预编译模板在不同商品行数下的耗时"""
+    from print_core.html_template import get_template
+
+    template = get_template()
+    head = template.single_head.decode('utf-8')
+    print(f"模板: {template.path}")
+    for lines in line_counts:
+        jobs = [sample_order(lines)] * max(rounds // lines, 20)
+        print(f"--- {lines} 行 ---")
+        legacy = bench("旧版", lambda job: legacy_generate_html(head, job), jobs)
+        compiled = bench("模板", template.render, jobs)
+        print(f"加速: {legacy / compiled:.1f}x")
+
+
+def bench_raster(jobs, threads, processes):
+    """图片渲染吞吐量：渲染线程池（受GIL限制）对比渲染进程池"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    from print_core.renderers.image import ImageRenderer
+
+    orders = [sample_order(10)] * jobs
+    results = {}
+    for name, renderer in (("线程", ImageRenderer(processes=0)), ("进程", ImageRenderer(processes=processes))):
+        # 预热：加载字体、启动渲染进程
+        renderer.render(orders[0])
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            started = time.perf_counter()
+            sizes = [len(document.data) for document in pool.map(renderer.render, orders)]
+            elapsed = time.perf_counter() - started
+        renderer.close()
+        results[name] = elapsed
+        print(f"{name}: {jobs / elapsed:.1f}单/秒 ({elapsed / jobs * 1000:.1f}ms/单, 平均 {sum(sizes) // len(sizes)} 字节)")
+    print(f"加速: {results['线程'] / results['进程']:.1f}x（{threads} 个渲染线程，{processes} 个渲染进程）")
+
+
+def bench_mono(rounds):
+    """图片渲染：彩色PNG 对比 1位黑白 PNG / TIFF 的绘制耗时、编码耗时、内存和数据量"""
+    from print_core.renderers.image import create_print_image, encode_image
+
+    job = sample_order(10)
+    for mode, image_format in (("rgb", "png"), ("mono", "png"), ("mono", "tiff")):
+        started = time.perf_counter()
+        images = [create_print_image(job, mode=mode) for _ in range(rounds)]
+        draw = (time.perf_counter() - started) / rounds
+        started = time.perf_counter()
+        data, suffix = [encode_image(img, image_format) for img in images][-1]
+        encode = (time.perf_counter() - started) / rounds
+        img = images[-1]
+        # PIL 内部 RGB 每像素4字节，1位图片每像素1字节；打包后1位图片每像素1位
+        pixel_bytes = img.width * img.height * (4 if img.mode == 'RGB' else 1)
+        print(f"{mode}/{suffix[1:]}: 绘制 {draw * 1000:.1f}ms 编码 {encode * 1000:.1f}ms "
+              f"内存 {pixel_bytes / 1e6:.2f}MB（打包 {len(img.tobytes()) / 1e6:.2f}MB） 数据 {len(data)} 字节")
+
+
+def legacy_pad_text(text, width, align='left'):
+    """旧版 pad_text：逐字符判断，只把 \u4e00-\u9fff 算作2个宽度，超出时截断后不补足"""
+    text = str(text)
+    current_width = 0
+    for char in text:
+        current_width += 2 if '\u4e00' <= char <= '\u9fff' else 1
+
+    if current_width >= width:
+        result = ''
+        current = 0
+        for char in text:
+            char_width = 2 if '\u4e00' <= char <= '\u9fff' else 1
+            if current + char_width > width:
+                break
+            result += char
+            current += char_width
+        return result
+
+    padding = width - current_width
+    if align == 'left':
+        return text + ' ' * padding
+    elif align == 'right':
+        return ' ' * padding + text
+    else:
+        left = padding // 2
+        return ' ' * left + text + ' ' * (padding - left)
+
+
+def bench_widths(rounds):
+    """纯文本表格一行（6个单元格，90列）的排版耗时，并核对全角标点的对齐"""
+    from print_core.text_width import clear_cache, display_width, pad_text, width_table
+
+    started = time.perf_counter()
+    width_table()
+    print(f"宽度表生成: {(time.perf_counter() - started) * 1000:.0f}ms（进程内一次）")
+
+    columns = (6, 22, 18, 10, 14, 18)
+
+    def make_rows(products):
+        # 商品名、数量单位来自 products 种商品（真实订单中大量重复），序号和金额各行不同
+        return [
+            (str(i), f"特级（散装）苹果醋{i % products}号：500ml", f"{i % products}.5箱", "500g/袋",
+             f"{i * 1.5:.2f}", f"{i * 12.25:.2f}")
+            for i in range(rounds)
+        ]
+
+    for label, rows in (("200种商品", make_rows(200)), ("商品各不相同", make_rows(rounds))):
+        clear_cache()
+        for name, pad in (("旧版", legacy_pad_text), ("新版", pad_text)):
+            started = time.perf_counter()
+            lines = ["|" + "".join(pad(cell, width, 'center') for cell, width in zip(row, columns)) + "|"
+                     for row in rows]
+            elapsed = time.perf_counter() - started
+            widths = {display_width(line) for line in lines}
+            print(f"{label} {name}: {elapsed / rounds * 1e6:.2f}µs/行，行宽 {sorted(widths)}")
+
+
+def bench_wrap(rounds):
+    """纯文本表格长商品名折行：首次排版（未缓存）与重复商品（已缓存）的耗时"""
+    from print_core.layout import wrap_cell
+    from print_core.renderers.text import TABLE
+    from print_core.text_width import clear_cache, width_table
+
+    names = [f"特级（散装）苹果醋{i}号：500ml规格装，一箱二十四瓶装" for i in range(200)]
+    specs = [f"500g/袋×{i}袋/箱" for i in range(200)]
+    rows = [
+        (str(i), names[i % 200], f"{i % 50}.5箱", specs[i % 200], f"{i * 1.5:.2f}", f"{i * 12.25:.2f}")
+        for i in range(rounds)
+    ]
+
+    clear_cache()
+    wrap_cell.cache_clear()
+    # 宽度表在进程内只生成一次，不计入首次排版
+    width_table()
+    started = time.perf_counter()
+    cold = [TABLE.lines(row) for row in rows[:200]]
+    elapsed = time.perf_counter() - started
+    print(f"首次排版: {elapsed / 200 * 1e6:.2f}µs/行（{max(map(len, cold))}行文本）")
+
+    started = time.perf_counter()
+    for row in rows:
+        TABLE.lines(row)
+    elapsed = time.perf_counter() - started
+    print(f"200种商品重复排版: {elapsed / rounds * 1e6:.2f}µs/行")
+
+    short = [(row[0], "香蕉", row[2], "500g/袋", row[4], row[5]) for row in rows]
+    started = time.perf_counter()
+    for row in short:
+        TABLE.lines(row)
+    elapsed = time.perf_counter() - started
+    print(f"不需折行: {elapsed / rounds * 1e6:.2f}µs/行")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m print_core.bench", description="性能测试与正确性校验")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    chinese = subparsers.add_parser("chinese", help="金额大写")
+    chinese.add_argument("--limit", type=int, default=200000, help="逐个校验的整数范围")
+    chinese.add_argument("--rounds", type=int, default=100000, help="性能测试次数")
+
+    templates = subparsers.add_parser("templates", help="HTML模板渲染（1/50/500行订单）")
+    templates.add_argument("--rounds", type=int, default=20000, help="每组渲染的商品行总数")
+
+    raster = subparsers.add_parser("raster", help="图片渲染：线程对比进程池")
+    raster.add_argument("--jobs", type=int, default=48, help="渲染的订单数")
+    raster.add_argument("--threads", type=int, default=4, help="渲染线程数")
+    raster.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="渲染进程数")
+
+    mono = subparsers.add_parser("mono", help="图片渲染：彩色对比1位黑白")
+    mono.add_argument("--rounds", type=int, default=20, help="每种格式渲染次数")
+
+    widths = subparsers.add_parser("widths", help="纯文本表格排版：字符宽度与对齐")
+    widths.add_argument("--rounds", type=int, default=20000, help="排版的行数")
+
+    wrap = subparsers.add_parser("wrap", help="纯文本表格：长商品名折行")
+    wrap.add_argument("--rounds", type=int, default=20000, help="排版的行数")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "chinese":
+        errors = verify_number_to_chinese(args.limit)
+        for error in errors[:20]:
+            print(error)
+        bench_number_to_chinese(args.rounds)
+        return 1 if errors else 0
+
+    if args.command == "templates":
+        bench_templates(args.rounds)
+        return 0
+
+    if args.command == "raster":
+        bench_raster(args.jobs, args.threads, args.processes)
+        return 0
+
+    if args.command == "mono":
+        bench_mono(args.rounds)
+        return 0
+
+    if args.command == "widths":
+        bench_widths(args.rounds)
+        return 0
+
+    if args.command == "wrap":
+        bench_wrap(args.rounds)
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
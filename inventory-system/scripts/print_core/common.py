@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+渲染公共函数
+金额大写、订单日期解析、任务字段提取、GBK编码，各渲染器共用
+"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+
+
+CHINESE_DIGITS = '零壹贰叁肆伍陆柒捌玖'
+CHINESE_UNITS = ('', '拾', '佰', '仟')
+CHINESE_BIG_UNITS = ('', '万', '亿', '万亿')
+
+# 金额大写缓存条数
+CHINESE_CACHE_SIZE = 4096
+
+_CENT = Decimal('0.01')
+
+
+def _build_group_text():
+    """0-9999 的大写查找表（不含开头的零），组内连续的零只读一个、末尾的零不读
+
+    由低位表逐级拼出：n = d × 10^k + r，d 后紧跟的一位为零（r < 10^(k-1)）时补一个零
+    """
+    table = [''] + [CHINESE_DIGITS[d] for d in range(1, 10)]
+    for k in range(1, 4):
+        size = 10 ** k
+        unit = CHINESE_UNITS[k]
+        zero_below = size // 10
+        for d in range(1, 10):
+            head = CHINESE_DIGITS[d] + unit
+            table.append(head)
+            table.extend(
+                head + (CHINESE_DIGITS[0] if r < zero_below else '') + table[r]
+                for r in range(1, size)
+            )
+    return tuple(table)
+
+
+# 四位一组的大写查找表
+GROUP_TEXT = _build_group_text()
+
+
+def _build_fraction_text(zero_jiao):
+    """角分部分的查找表（0-99分），zero_jiao 为真时零角有分读作“零X分”"""
+    table = ['整']
+    for cents in range(1, 100):
+        jiao, fen = divmod(cents, 10)
+        text = CHINESE_DIGITS[jiao] + '角' if jiao else (CHINESE_DIGITS[0] if zero_jiao else '')
+        if fen:
+            text += CHINESE_DIGITS[fen] + '分'
+        table.append(text)
+    return tuple(table)
+
+
+# 角分查找表：整数部分非零 / 为零（零元伍分，不再读零）
+FRACTION_TEXT = _build_fraction_text(True)
+FRACTION_TEXT_NO_INTEGER = _build_fraction_text(False)
+
+
+def to_cents(num):
+    """金额转为整数分，四舍五入到分
+
+    float 先乘100取整，结果与原值在误差范围内一致时直接使用（不超过两位小数的金额）；
+    其余情况按十进制文本转换（0.29 即 29 分，不受二进制误差影响），
+    常见的不超过两位小数的文本直接拆分字符串，其他用 Decimal 精确计算
+    """
+    if isinstance(num, int):
+        return num * 100
+    if isinstance(num, float):
+        cents = round(num * 100)
+        if abs(num * 100 - cents) < 1e-6 and abs(cents) < 2 ** 50:
+            return cents
+        num = repr(num)
+    if isinstance(num, str):
+        integer, dot, fraction = num.strip().partition('.')
+        if integer.lstrip('-').isdigit() and len(fraction) <= 2 and (not dot or fraction.isdigit()):
+            cents = abs(int(integer)) * 100 + int(fraction.ljust(2, '0'))
+            return -cents if integer.startswith('-') else cents
+    value = num if isinstance(num, Decimal) else Decimal(num)
+    return int(value.quantize(_CENT, rounding=ROUND_HALF_UP) * 100)
+
+
+def integer_to_chinese(n):
+    """正整数的大写（不含“元”），按四位一组查表"""
+    if n < 10000:
+        return GROUP_TEXT[n]
+    if n < 100000000:
+        high, low = divmod(n, 10000)
+        if low == 0:
+            return GROUP_TEXT[high] + '万'
+        return GROUP_TEXT[high] + ('万零' if low < 1000 else '万') + GROUP_TEXT[low]
+
+    groups = []
+    while n:
+        n, group = divmod(n, 10000)
+        groups.append(group)
+    if len(groups) > len(CHINESE_BIG_UNITS):
+        raise ValueError("金额超出范围")
+
+    parts = []
+    zero = False
+    for index in range(len(groups) - 1, -1, -1):
+        group = groups[index]
+        if group == 0:
+            # 全零的组只在后面还有非零数字时读一个零
+            zero = bool(parts)
+            continue
+        # 前面有数字且本组不足千位（如 1,0001）时补读零
+        if zero or (parts and group < 1000):
+            parts.append(CHINESE_DIGITS[0])
+        parts.append(GROUP_TEXT[group])
+        parts.append(CHINESE_BIG_UNITS[index])
+        zero = False
+    return ''.join(parts)
+
+
+@lru_cache(maxsize=CHINESE_CACHE_SIZE)
+def cents_to_chinese(cents):
+    """整数分转中文大写"""
+    if cents < 0:
+        return '负' + cents_to_chinese(-cents)
+    if cents == 0:
+        return '零元整'
+
+    integer_part, decimal_part = divmod(cents, 100)
+    if integer_part == 0:
+        return '零元' + FRACTION_TEXT_NO_INTEGER[decimal_part]
+    return integer_to_chinese(integer_part) + '元' + FRACTION_TEXT[decimal_part]
+
+
+@lru_cache(maxsize=CHINESE_CACHE_SIZE)
+def number_to_chinese(num):
+    """数字转中文大写
+
+    支持 int/float/Decimal/数字字符串，按分四舍五入；相同金额直接取缓存
+    """
+    if not num:
+        return "零元整"
+    return cents_to_chinese(to_cents(num))
+
+
+def parse_order_datetime(value, utc_offset_hours=0):
+    """解析订单时间（ISO格式，Z结尾为UTC），失败返回 None
+
+    Args:
+        utc_offset_hours: 转换到的时区，结果为不带时区的本地时间
+    """
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (TypeError, ValueError):
+        return None
+    if utc_offset_hours:
+        dt = dt.replace(tzinfo=None) + timedelta(hours=utc_offset_hours)
+    return dt
+
+
+def format_order_date(value, fmt='%Y-%m-%d'):
+    """格式化订单日期，无法解析时原样返回"""
+    dt = parse_order_datetime(value)
+    if dt is None:
+        return value or ''
+    return dt.strftime(fmt)
+
+
+def job_fields(job):
+    """任务中渲染用到的订单、商品明细、客户"""
+    order = job.get("order", {})
+    return order, order.get("products", []), order.get("customer", {})
+
+
+def item_fields(item):
+    """商品明细行渲染用到的字段
+
+    单位、规格优先取下单时选择的商品单位（productUnit）
+    """
+    product = item.get("product", {})
+    product_unit = item.get("productUnit") or {}
+    unit = (product_unit.get('unitName', '') or item.get('unitName', '')
+            or product.get('unitName', '') or product.get('unit', '') or '个')
+    specification = product_unit.get('specification', '') or product.get('specification', '') or ''
+    return {
+        "code": product.get('code', '') or '',
+        "name": product.get('name', '') or '',
+        "quantity": item.get('quantity', 0),
+        "price": float(item.get('price', 0)),
+        "amount": float(item.get('totalAmount', 0)),
+        "unit": unit,
+        "specification": specification,
+    }
+
+
+def encode_gbk(text):
+    """编码为GBK（针式打印机使用），跳过无法编码的字符"""
+    return text.encode('gbk', errors='ignore')
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+直连数据库的打印任务客户端
+与 APIClient 接口一致，打印服务与数据库部署在同一台机器时可以绕过HTTP API：
+整个进程共用一个长连接（WAL 模式 + busy_timeout），SQL 语句文本固定以命中
+sqlite3 的语句缓存，一批任务的商品明细用一条 IN (...) 查询取回
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from print_core.api_client import LatencyStats, LeaseTracker, PRINT_LEASE_SECONDS, PRINT_WORKER_ID
+
+# 数据库路径
+PRINT_DB_PATH = os.environ.get("PRINT_DB_PATH", "")
+
+# 数据库被锁时的最长等待时间（毫秒）
+PRINT_DB_BUSY_TIMEOUT = int(os.environ.get("PRINT_DB_BUSY_TIMEOUT", "5000"))
+
+CLAIM_CANDIDATES_SQL = """
+    SELECT id FROM PrintJob
+    WHERE status = 'pending'
+       OR (status = 'processing' AND leaseExpiresAt IS NOT NULL AND leaseExpiresAt < ?)
+    ORDER BY createdAt ASC
+    LIMIT ?
+"""
+
+CLAIM_UPDATE_SQL = """
+    UPDATE PrintJob
+    SET status = 'processing', workerId = ?, leaseExpiresAt = ?,
+        printerName = COALESCE(?, printerName), updatedAt = ?
+    WHERE id IN ({ids})
+"""
+
+JOBS_SQL = """
+    SELECT pj.id, pj.orderId, pj.status, pj.printerName, pj.workerId, pj.createdAt,
+           so.orderNumber, so.totalAmount, so.remark, so.createdAt AS orderCreatedAt,
+           c.id AS customerId, c.name AS customerName, c.phone AS customerPhone,
+           c.address AS customerAddress
+    FROM PrintJob pj
+    JOIN SalesOrder so ON pj.orderId = so.id
+    JOIN Customer c ON so.customerId = c.id
+    WHERE pj.id IN ({ids})
+    ORDER BY pj.createdAt ASC
+"""
+
+ORDER_PRODUCTS_SQL = """
+    SELECT sop.id, sop.salesOrderId, sop.productId, sop.productUnitId, sop.quantity,
+           sop.price, sop.totalAmount,
+           p.code, p.name, p.description,
+           pu.unitName, pu.specification
+    FROM SalesOrderProduct sop
+    JOIN Product p ON sop.productId = p.id
+    LEFT JOIN ProductUnit pu ON sop.productUnitId = pu.id
+    WHERE sop.salesOrderId IN ({ids})
+    ORDER BY sop.salesOrderId, sop.id
+"""
+
+UPDATE_STATUS_SQL = """
+    UPDATE PrintJob
+    SET status = ?, updatedAt = ?,
+        printerName = COALESCE(?, printerName),
+        errorMessage = CASE WHEN ? THEN ? ELSE errorMessage END,
+        printedAt = CASE WHEN ? = 'completed' THEN ? ELSE printedAt END,
+        leaseExpiresAt = CASE WHEN ? = 'processing' THEN leaseExpiresAt ELSE NULL END,
+        workerId = CASE WHEN ? = 'pending' THEN NULL ELSE workerId END
+    WHERE id = ? AND (workerId IS NULL OR (workerId = ? AND (leaseExpiresAt IS NULL OR leaseExpiresAt >= ?)))
+"""
+
+RENEW_LEASES_SQL = """
+    UPDATE PrintJob
+    SET leaseExpiresAt = ?
+    WHERE id IN ({ids}) AND status = 'processing' AND workerId = ?
+      AND (leaseExpiresAt IS NULL OR leaseExpiresAt >= ?)
+"""
+
+RENEWED_SQL = """
+    SELECT id FROM PrintJob
+    WHERE id IN ({ids}) AND workerId = ? AND leaseExpiresAt = ?
+"""
+
+
+def now_ms():
+    """当前时间（毫秒时间戳，与Prisma在SQLite中存储DateTime的格式一致）"""
+    return int(time.time() * 1000)
+
+
+def to_iso(value):
+    """数据库中的时间（毫秒时间戳或文本）转为ISO格式字符串"""
+    if value is None:
+        return ''
+    if isinstance(value, (int, float)):
+        dt = datetime.fromtimestamp(value / 1000, tz=timezone.utc)
+        return dt.strftime('%Y-%m-%dT%H:%M:%S.') + f"{dt.microsecond // 1000:03d}Z"
+    return str(value)
+
+
+def in_placeholders(ids):
+    """IN (...) 参数：个数补齐到2的幂，使SQL文本只有少数几种，能命中语句缓存"""
+    size = 1
+    while size < len(ids):
+        size *= 2
+    params = list(ids) + [ids[-1]] * (size - len(ids))
+    return ", ".join("?" * size), params
+
+
+class DBClient:
+    """直连SQLite的打印任务客户端，接口与 APIClient 一致"""
+
+    def __init__(self, db_path=None, poll_interval=5, printer_name=None,
+                 worker_id=None, lease_seconds=None):
+        self.db_path = db_path or PRINT_DB_PATH
+        self.poll_interval = poll_interval
+        self.printer_name = printer_name
+        self.worker_id = worker_id or PRINT_WORKER_ID
+        self.lease_seconds = lease_seconds or PRINT_LEASE_SECONDS
+        self.latency = LatencyStats()
+        self.leases = LeaseTracker(self.lease_seconds)
+        self._lock = threading.Lock()
+        self.conn = self._connect()
+
+    def _connect(self):
+        """打开长连接：WAL 模式允许API服务读写的同时读取，busy_timeout 避免锁冲突直接报错"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=PRINT_DB_BUSY_TIMEOUT / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=128
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA busy_timeout = {PRINT_DB_BUSY_TIMEOUT}")
+        return conn
+
+    def _timed(self, name, func, *args):
+        """执行并记录耗时"""
+        started = time.perf_counter()
+        ok = False
+        try:
+            result = func(*args)
+            ok = True
+            return result
+        finally:
+            self.latency.record(name, time.perf_counter() - started, ok)
+
+    def claim_jobs(self, limit=10, wait=0):
+        """认领待打印任务（在一个写事务内完成选取与标记）"""
+        try:
+            jobs = self._timed("claim", self._claim_jobs, limit)
+            self.leases.hold(jobs)
+            return jobs
+        except Exception as e:
+            print(f"认领打印任务失败: {e}")
+            return []
+
+    def _claim_jobs(self, limit):
+        now = now_ms()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.conn.execute(CLAIM_CANDIDATES_SQL, (now, limit)).fetchall()
+                ids = [row["id"] for row in rows]
+                if ids:
+                    placeholders, params = in_placeholders(ids)
+                    self.conn.execute(
+                        CLAIM_UPDATE_SQL.format(ids=placeholders),
+                        [self.worker_id, now + self.lease_seconds * 1000, self.printer_name, now] + params
+                    )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            if not ids:
+                return []
+            return self._load_jobs(ids)
+
+    def _load_jobs(self, ids):
+        """加载任务及订单数据，组装成与API相同的结构"""
+        placeholders, params = in_placeholders(ids)
+        job_rows = self.conn.execute(JOBS_SQL.format(ids=placeholders), params).fetchall()
+
+        order_ids = sorted({row["orderId"] for row in job_rows})
+        products_by_order = {order_id: [] for order_id in order_ids}
+        if order_ids:
+            placeholders, params = in_placeholders(order_ids)
+            for item in self.conn.execute(ORDER_PRODUCTS_SQL.format(ids=placeholders), params):
+                products_by_order[item["salesOrderId"]].append({
+                    "id": item["id"],
+                    "productId": item["productId"],
+                    "productUnitId": item["productUnitId"],
+                    "quantity": item["quantity"],
+                    "price": item["price"],
+                    "totalAmount": item["totalAmount"],
+                    "unitName": item["unitName"] or '',
+                    "productUnit": {
+                        "unitName": item["unitName"] or '',
+                        "specification": item["specification"] or '',
+                    } if item["productUnitId"] else {},
+                    "product": {
+                        "id": item["productId"],
+                        "code": item["code"],
+                        "name": item["name"],
+                        "description": item["description"],
+                    },
+                })
+
+        jobs = []
+        for row in job_rows:
+            jobs.append({
+                "id": row["id"],
+                "orderId": row["orderId"],
+                "status": row["status"],
+                "printerName": row["printerName"],
+                "workerId": row["workerId"],
+                "createdAt": to_iso(row["createdAt"]),
+                "order": {
+                    "id": row["orderId"],
+                    "orderNumber": row["orderNumber"],
+                    "totalAmount": row["totalAmount"],
+                    "remark": row["remark"],
+                    "createdAt": to_iso(row["orderCreatedAt"]),
+                    "customer": {
+                        "id": row["customerId"],
+                        "name": row["customerName"],
+                        "phone": row["customerPhone"],
+                        "address": row["customerAddress"],
+                    },
+                    "products": products_by_order.get(row["orderId"], []),
+                },
+            })
+        return jobs
+
+    def renew_leases(self):
+        """到了续租间隔时为处理中的任务续租，返回已失效的任务ID（同 APIClient.renew_leases）"""
+        ids = self.leases.due()
+        if not ids:
+            return set()
+        try:
+            return self.leases.renewed(ids, self._timed("lease", self._renew_leases, ids))
+        except Exception as e:
+            print(f"打印任务续租失败: {e}")
+            self.leases.failed()
+            return set()
+
+    def _renew_leases(self, ids):
+        now = now_ms()
+        lease_expires_at = now + self.lease_seconds * 1000
+        placeholders, params = in_placeholders(ids)
+        with self._lock:
+            self.conn.execute(RENEW_LEASES_SQL.format(ids=placeholders),
+                              [lease_expires_at] + params + [self.worker_id, now])
+            rows = self.conn.execute(RENEWED_SQL.format(ids=placeholders),
+                                     params + [self.worker_id, lease_expires_at]).fetchall()
+        return [row["id"] for row in rows]
+
+    def wait_for_jobs(self, limit=10):
+        """认领待打印任务，没有任务时等待 poll_interval 秒"""
+        jobs = self.claim_jobs(limit)
+        if not jobs:
+            time.sleep(self.poll_interval)
+        return jobs
+
+    def update_status(self, job_id, status, printer_name=None, error_message=None):
+        """更新打印任务状态"""
+        return self.update_statuses([{
+            "id": job_id,
+            "status": status,
+            "printerName": printer_name,
+            "errorMessage": error_message,
+        }])
+
+    def update_statuses(self, records):
+        """批量更新打印任务状态（一个事务）"""
+        try:
+            self._timed("status_batch", self._update_statuses, records)
+            self.leases.release(records)
+            return True
+        except Exception as e:
+            print(f"更新打印任务状态失败: {e}")
+            return False
+
+    def _update_statuses(self, records):
+        now = now_ms()
+        params = []
+        for record in records:
+            status = record["status"]
+            has_error = "errorMessage" in record and record["errorMessage"] is not None
+            params.append((
+                status, now,
+                record.get("printerName") or None,
+                has_error, record.get("errorMessage"),
+                status, now,
+                status,
+                status,
+                record["id"], self.worker_id, now,
+            ))
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany(UPDATE_STATUS_SQL, params)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+并发任务分发器
+渲染在有界线程池中并行执行，每台打印机各有一个提交队列，保证同一台打印机按顺序出纸
+"""
+
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from print_core.metrics import QUEUE_DEPTH
+
+# 渲染线程数
+PRINT_WORKERS = int(os.environ.get("PRINT_WORKERS", "4"))
+
+
+class JobDispatcher:
+    """打印任务分发器
+
+    Args:
+        render: render(job) -> 渲染结果，在线程池中并行执行
+        submit: submit(printer_name, job, rendered)，在打印机队列线程中按顺序执行
+        on_error: on_error(job, exc)，渲染或提交抛出异常时调用
+        default_printer: 任务未指定打印机时使用的打印机
+        max_workers: 渲染线程数
+    """
+
+    def __init__(self, render, submit, on_error=None, default_printer="default", max_workers=None):
+        self.render = render
+        self.submit = submit
+        self.on_error = on_error
+        self.default_printer = default_printer
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers or PRINT_WORKERS,
+            thread_name_prefix="render"
+        )
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    def printer_for(self, job):
+        """任务对应的打印机"""
+        return job.get("printerName") or self.default_printer
+
+    def dispatch(self, jobs):
+        """提交一批任务：立即开始渲染，按打印机排队等待提交"""
+        for job in jobs:
+            printer_name = self.printer_for(job)
+            QUEUE_DEPTH.inc(printer_name)
+            future = self._pool.submit(self.render, job)
+            self._queue_for(printer_name).put((job, future))
+
+    def join(self):
+        """等待已分发的任务全部提交完成"""
+        with self._lock:
+            queues = list(self._queues.values())
+        for q in queues:
+            q.join()
+
+    def run_batch(self, jobs):
+        """分发一批任务并等待完成"""
+        self.dispatch(jobs)
+        self.join()
+
+    def shutdown(self):
+        """停止渲染线程池"""
+        self._pool.shutdown(wait=False)
+
+    def _queue_for(self, printer_name):
+        """获取打印机的提交队列，首次使用时启动队列线程"""
+        with self._lock:
+            q = self._queues.get(printer_name)
+            if q is None:
+                q = queue.Queue()
+                self._queues[printer_name] = q
+                thread = threading.Thread(
+                    target=self._printer_loop,
+                    args=(printer_name, q),
+                    name=f"printer-{printer_name}",
+                    daemon=True
+                )
+                thread.start()
+            return q
+
+    def _printer_loop(self, printer_name, q):
+        """打印机队列线程：按入队顺序等待渲染结果并提交"""
+        while True:
+            job, future = q.get()
+            try:
+                rendered = future.result()
+                self.submit(printer_name, job, rendered)
+            except Exception as e:
+                self._handle_error(job, e)
+            finally:
+                QUEUE_DEPTH.dec(printer_name)
+                q.task_done()
+
+    def _handle_error(self, job, exc):
+        if self.on_error is None:
+            print(f"打印任务 #{job.get('id')} 失败: {exc}")
+            return
+        try:
+            self.on_error(job, exc)
+        except Exception as e:
+            print(f"错误处理失败: {e}")
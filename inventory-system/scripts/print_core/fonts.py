@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+字体查找与文本测量（图片渲染使用）
+字体在进程内只查找、加载一次；文本尺寸按 (字体, 文本) 缓存，表头、固定文字、
+常见数字在多个任务间重复使用
+"""
+
+import os
+import subprocess
+import threading
+from functools import lru_cache
+
+# 指定字体文件，不设置时按候选列表查找
+PRINT_FONT = os.environ.get("PRINT_FONT", "")
+
+# 候选中文字体
+FONT_PATHS = [
+    '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc',
+    '/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/noto/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/truetype/noto/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc',
+    '/usr/share/fonts/wqy-zenhei/wqy-zenhei.ttc',
+]
+
+# 文本尺寸缓存条数
+TEXT_SIZE_CACHE_SIZE = 8192
+
+_font_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def find_font():
+    """查找可用的中文字体（结果在进程内缓存）"""
+    if PRINT_FONT and os.path.exists(PRINT_FONT):
+        print(f"找到字体: {PRINT_FONT}")
+        return PRINT_FONT
+
+    for font_path in FONT_PATHS:
+        if os.path.exists(font_path):
+            print(f"找到字体: {font_path}")
+            return font_path
+
+    # 搜索所有可用字体
+    try:
+        result = subprocess.run(['fc-list', ':lang=zh', '-f', '%{file}\n'],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=10)
+        for font in result.stdout.decode('utf-8', errors='replace').splitlines():
+            font = font.strip()
+            if font and os.path.exists(font):
+                print(f"找到字体(fc-list): {font}")
+                return font
+    except Exception as e:
+        print(f"fc-list 搜索失败: {e}")
+
+    return None
+
+
+@lru_cache(maxsize=None)
+def get_font(size):
+    """指定字号的字体（进程内只加载一次）；找不到中文字体时使用PIL默认字体"""
+    from PIL import ImageFont
+
+    with _font_lock:
+        font_path = find_font()
+        if font_path:
+            try:
+                font = ImageFont.truetype(font_path, size)
+                print(f"成功加载字体: {font_path} ({size})")
+                return font
+            except Exception as e:
+                print(f"字体加载失败: {e}")
+        else:
+            print("未找到中文字体，使用默认字体")
+        return ImageFont.load_default()
+
+
+def load_fonts(sizes):
+    """按字号取字体，返回 {名称: 字体}
+
+    Args:
+        sizes: {名称: 字号}
+    """
+    return {name: get_font(size) for name, size in sizes.items()}
+
+
+@lru_cache(maxsize=TEXT_SIZE_CACHE_SIZE)
+def text_size(font, text):
+    """文本尺寸 (宽, 高)，按 (字体, 文本) 缓存"""
+    left, top, right, bottom = font.getbbox(text)
+    return right - left, bottom - top
+
+
+def get_text_size(draw, text, font):
+    """获取文本尺寸"""
+    return text_size(font, text)
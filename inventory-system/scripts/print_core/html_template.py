@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+HTML销售单模板
+模板文件只解析一次：样式等静态段预先编码为 bytes，抬头、商品行、合计编译为 f-string 函数，
+商品行逐行填充后一次 join，不再用 += 拼接；多页订单每页一张完整的销售单，附本页小计；
+模板文件修改（或替换）后，下次渲染时按 mtime 自动重新加载，无需重启服务
+"""
+
+import hashlib
+import html
+import os
+import re
+import string
+import threading
+
+from print_core.common import format_order_date, item_fields, job_fields, number_to_chinese
+from print_core.pagination import page_rows, paginate
+
+# 模板文件路径，默认使用内置销售单模板
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+DEFAULT_TEMPLATE = os.path.join(TEMPLATE_DIR, 'receipt.html')
+PRINT_HTML_TEMPLATE = os.environ.get("PRINT_HTML_TEMPLATE", "") or DEFAULT_TEMPLATE
+
+# 每页商品行数，0 表示不分页（整单打印为一张销售单）；模板 row 段名后写了行数时以模板为准
+PRINT_HTML_PAGE_ROWS = int(os.environ.get("PRINT_HTML_PAGE_ROWS", "0"))
+
+# 分段标记：整行 <!--@ 段名 [行数] -->
+SECTION_PATTERN = re.compile(r'^<!--@\s*(\w+)(?:\s+(\d+))?\s*-->[ \t]*\r?\n?', re.M)
+
+# 原样输出的段
+STATIC_SECTIONS = ('head', 'batch_head', 'body_start', 'page_start', 'page_end', 'tail')
+
+# 需要填充的段及可用字段
+FIELD_SECTIONS = {
+    'header': {'customer_name', 'customer_phone', 'order_date', 'order_number'},
+    'row': {'index', 'code', 'name', 'quantity', 'unit', 'specification', 'price', 'amount'},
+    'blank_row': set(),
+    'footer': {'total_qty', 'total_amount', 'amount_in_words'},
+    'page_summary': {
+        'page_number', 'page_count', 'page_qty', 'page_amount',
+        'carried_qty', 'carried_amount', 'running_qty', 'running_amount',
+    },
+}
+
+
+class TemplateError(Exception):
+    """模板格式错误"""
+
+
+# 文本字段，输出时做HTML转义（其余为数字）
+TEXT_FIELDS = {
+    'customer_name', 'customer_phone', 'order_date', 'order_number',
+    'code', 'name', 'unit', 'specification', 'amount_in_words',
+}
+
+
+def escape(value):
+    """字符串字段做HTML转义，数字保持原样以便格式化；绝大多数值不含特殊字符，直接返回"""
+    if isinstance(value, str) and ('&' in value or '<' in value or '>' in value):
+        return html.escape(value, quote=False)
+    return value
+
+
+def parse_sections(source):
+    """按分段标记拆分模板，返回 {段名: (内容, 参数)}，第一个标记之前的说明文字忽略"""
+    matches = list(SECTION_PATTERN.finditer(source))
+    if not matches:
+        raise TemplateError("模板中没有分段标记")
+
+    sections = {}
+    for i, match in enumerate(matches):
+        name = match.group(1)
+        if name not in STATIC_SECTIONS and name not in FIELD_SECTIONS:
+            raise TemplateError(f"未知的模板段: {name}")
+        if name in sections:
+            raise TemplateError(f"模板段重复: {name}")
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(source)
+        sections[name] = (source[match.end():end], match.group(2))
+    return sections
+
+
+# 允许的格式说明（如 .2f、>8、,.2f），不允许嵌套字段
+FORMAT_SPEC_PATTERN = re.compile(r'[\w.,%<>=^+\- #]*')
+
+
+def compile_section(name, text):
+    """把 str.format 语法的模板段编译为函数 f(字段dict) -> str
+
+    格式串在加载时检查并编译为 f-string，渲染时不再逐次解析，文本字段在其中转义；
+    错误在加载时报出，而不是打印时
+    """
+    fields = FIELD_SECTIONS[name]
+    pieces = []
+    try:
+        parsed = list(string.Formatter().parse(text))
+    except ValueError as e:
+        raise TemplateError(f"模板段 {name} 格式错误: {e}")
+
+    for literal, field, spec, conversion in parsed:
+        if literal:
+            pieces.append('f' + repr(literal.replace('{', '{{').replace('}', '}}')))
+        if field is None:
+            continue
+        if field not in fields:
+            raise TemplateError(f"模板段 {name} 中有未知字段: {field}")
+        if not FORMAT_SPEC_PATTERN.fullmatch(spec or ''):
+            raise TemplateError(f"模板段 {name} 中字段 {field} 的格式不支持: {spec}")
+        value = f"d['{field}']"
+        if field in TEXT_FIELDS:
+            value = f"e({value})"
+        pieces.append('f"{' + value + (f"!{conversion}" if conversion else "") + (f":{spec}" if spec else "") + '}"')
+
+    source = "lambda d: " + (' '.join(pieces) or "''")
+    try:
+        return eval(compile(source, f"<template:{name}>", 'eval'), {'e': escape})
+    except (SyntaxError, ValueError) as e:
+        raise TemplateError(f"模板段 {name} 编译失败: {e}")
+
+
+class ReceiptTemplate:
+    """编译后的销售单模板
+
+    Args:
+        source: 模板文件内容
+        path: 模板文件路径（仅用于显示）
+    """
+
+    def __init__(self, source, path=None):
+        self.path = path
+        self.digest = hashlib.sha256(source.encode('utf-8')).hexdigest()[:16]
+        sections = parse_sections(source)
+
+        for name in ('head', 'body_start', 'header', 'row', 'footer', 'tail'):
+            if name not in sections:
+                raise TemplateError(f"模板缺少段: {name}")
+
+        # 静态段：编码一次，渲染时直接拼接 bytes
+        for name in STATIC_SECTIONS:
+            setattr(self, name, sections.get(name, ('', None))[0].encode('utf-8'))
+        self.single_head = self.head + self.body_start
+        self.batch_head_bytes = self.head + self.batch_head + self.body_start
+
+        self.header = compile_section('header', sections['header'][0])
+        row, rows_per_page = sections['row']
+        self.row = compile_section('row', row)
+        # row 段名后的行数为每页商品行数，不写时按 PRINT_HTML_PAGE_ROWS，默认不分页
+        self.rows_per_page = int(rows_per_page or 0) or PRINT_HTML_PAGE_ROWS or None
+        self.footer = compile_section('footer', sections['footer'][0])
+        blank_row, min_rows = sections.get('blank_row', ('', None))
+        self.blank_row = compile_section('blank_row', blank_row)({})
+        self.min_rows = int(min_rows or 0)
+        self.page_summary = compile_section('page_summary', sections.get('page_summary', ('', None))[0])
+
+    def pages(self, job):
+        """订单分页（生成器）"""
+        return paginate(job_fields(job)[1], page_rows(self.rows_per_page))
+
+    def body(self, job, page=None):
+        """一张销售单的正文（bytes），page 为分页后的一页，不传时整单一页"""
+        order, products, customer = job_fields(job)
+        if page is None:
+            page = next(paginate(products, None))
+        total_amount = float(order.get('totalAmount', 0))
+
+        parts = [self.header({
+            'customer_name': customer.get('name', ''),
+            'customer_phone': customer.get('phone', ''),
+            'order_date': format_order_date(order.get('createdAt', '')),
+            'order_number': order.get('orderNumber', ''),
+        })]
+
+        row = self.row
+        for idx, item in page.rows():
+            fields = item_fields(item)
+            fields['index'] = idx
+            parts.append(row(fields))
+
+        if self.blank_row:
+            parts.extend([self.blank_row] * max(self.min_rows - len(page.items), 0))
+
+        if page.count > 1:
+            parts.append(self.page_summary(page.fields()))
+
+        parts.append(self.footer({
+            'total_qty': sum(item.get('quantity', 0) for item in products),
+            'total_amount': total_amount,
+            'amount_in_words': number_to_chinese(total_amount),
+        }))
+        return ''.join(parts).encode('utf-8')
+
+    def render(self, job):
+        """完整HTML文档（bytes），多页订单每页一张销售单"""
+        pages = list(self.pages(job))
+        if len(pages) == 1:
+            return self.render_page(job, pages[0])
+        return self._paged_document((job, page) for page in pages)
+
+    def render_page(self, job, page):
+        """一页的HTML文档（bytes）"""
+        return b''.join((self.single_head, self.body(job, page), self.tail))
+
+    def render_batch(self, jobs):
+        """多张销售单合成一个HTML文档，每页一张"""
+        return self._paged_document((job, page) for job in jobs for page in self.pages(job))
+
+    def _paged_document(self, pages):
+        parts = [self.batch_head_bytes]
+        for job, page in pages:
+            parts += (self.page_start, self.body(job, page), self.page_end)
+        parts.append(self.tail)
+        return b''.join(parts)
+
+
+def load_template(path):
+    """读取并编译模板文件"""
+    with open(path, encoding='utf-8') as f:
+        return ReceiptTemplate(f.read(), path)
+
+
+class TemplateStore:
+    """按路径缓存编译后的模板，文件变化时重新加载
+
+    重新加载失败（格式错误、文件被删除）时继续使用上一个版本
+    """
+
+    def __init__(self):
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        try:
+            stat = os.stat(path)
+            version = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            version = None
+
+        cached = self._templates.get(path)
+        if cached and (cached[0] == version or version is None):
+            return cached[1]
+
+        with self._lock:
+            cached = self._templates.get(path)
+            if cached and cached[0] == version:
+                return cached[1]
+            try:
+                template = load_template(path)
+            except (OSError, UnicodeDecodeError, TemplateError) as e:
+                if cached:
+                    print(f"重新加载模板失败，继续使用旧模板: {path}: {e}")
+                    self._templates[path] = (version, cached[1])
+                    return cached[1]
+                raise
+            if cached:
+                print(f"模板已重新加载: {path}")
+            self._templates[path] = (version, template)
+            return template
+
+
+_store = TemplateStore()
+
+
+def get_template(path=None):
+    """取得编译后的模板（文件修改后自动重新加载）"""
+    return _store.get(path or PRINT_HTML_TEMPLATE)
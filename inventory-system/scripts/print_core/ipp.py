@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+"""
+最小 IPP/1.1 客户端和本地测试服务
+只实现 Print-Job：请求和文档在内存中拼接后一次 POST 到 CUPS，不写临时文件，不启动子进程。
+本地测试服务（IPP 替身）接收 Print-Job 并保存文档，用于在没有 CUPS 的机器上验证提交流程:
+    python -m print_core.ipp serve [--port 8631] [--output 目录]
+    python -m print_core.ipp test
+"""
+
+import argparse
+import http.client
+import http.server
+import itertools
+import os
+import struct
+import sys
+import threading
+from urllib.parse import urlsplit
+
+IPP_VERSION = b'\x01\x01'
+OP_PRINT_JOB = 0x0002
+
+# 属性组
+TAG_OPERATION = 0x01
+TAG_JOB = 0x02
+TAG_END = 0x03
+TAG_PRINTER = 0x04
+TAG_UNSUPPORTED = 0x05
+
+# 值类型
+TAG_INTEGER = 0x21
+TAG_BOOLEAN = 0x22
+TAG_ENUM = 0x23
+TAG_TEXT = 0x41
+TAG_NAME = 0x42
+TAG_KEYWORD = 0x44
+TAG_URI = 0x45
+TAG_CHARSET = 0x47
+TAG_LANGUAGE = 0x48
+TAG_MIME_TYPE = 0x49
+
+STATUS_OK = 0x0000
+STATUS_BAD_REQUEST = 0x0400
+STATUS_OPERATION_NOT_SUPPORTED = 0x0501
+
+# 取值为枚举的任务属性（值为数字时按 enum 编码，与 cupsEncodeOptions 一致）
+ENUM_OPTIONS = {'finishings', 'orientation-requested', 'print-quality'}
+
+# 按布尔值编码的取值
+BOOLEAN_VALUES = {'true': True, 'false': False, 'yes': True, 'no': False, 'on': True, 'off': False}
+
+_request_ids = itertools.count(1)
+
+
+class IppError(Exception):
+    """IPP 请求失败"""
+
+
+def encode_attribute(tag, name, value):
+    """编码一个属性：值类型(1) 名称长度(2) 名称 值长度(2) 值"""
+    if tag in (TAG_INTEGER, TAG_ENUM):
+        value = struct.pack('>i', value)
+    elif tag == TAG_BOOLEAN:
+        value = b'\x01' if value else b'\x00'
+    elif isinstance(value, str):
+        value = value.encode('utf-8')
+    name = name.encode('ascii')
+    return struct.pack('>BH', tag, len(name)) + name + struct.pack('>H', len(value)) + value
+
+
+def encode_request(operation, attributes, job_attributes=(), request_id=None):
+    """编码 IPP 请求头（不含文档数据），attributes 为 [(值类型, 名称, 值)]"""
+    request_id = request_id or next(_request_ids)
+    parts = [IPP_VERSION, struct.pack('>Hi', operation, request_id), bytes([TAG_OPERATION])]
+    parts += [encode_attribute(*attribute) for attribute in attributes]
+    if job_attributes:
+        parts.append(bytes([TAG_JOB]))
+        parts += [encode_attribute(*attribute) for attribute in job_attributes]
+    parts.append(bytes([TAG_END]))
+    return b''.join(parts)
+
+
+def decode_message(data, tags=None):
+    """解析 IPP 消息，返回 (操作码或状态码, 请求ID, {属性组: {名称: [值]}}, 文档数据)
+
+    传入 tags 字典时同时记录每个属性的值类型 {(属性组, 名称): 值类型}
+    """
+    if len(data) < 9:
+        raise IppError("IPP 消息不完整")
+    code, request_id = struct.unpack('>Hi', data[2:8])
+    groups = {}
+    group = None
+    group_tag = TAG_OPERATION
+    name = None
+    offset = 8
+    try:
+        while True:
+            tag = data[offset]
+            offset += 1
+            if tag == TAG_END:
+                break
+            if tag < 0x10:
+                group = groups.setdefault(tag, {})
+                group_tag = tag
+                continue
+            name_length, = struct.unpack('>H', data[offset:offset + 2])
+            offset += 2
+            if name_length:
+                name = data[offset:offset + name_length].decode('ascii')
+                offset += name_length
+            value_length, = struct.unpack('>H', data[offset:offset + 2])
+            offset += 2
+            value = data[offset:offset + value_length]
+            offset += value_length
+            if tag in (TAG_INTEGER, TAG_ENUM):
+                value, = struct.unpack('>i', value)
+            elif tag == TAG_BOOLEAN:
+                value = value != b'\x00'
+            else:
+                value = value.decode('utf-8', errors='replace')
+            if tags is not None and name_length:
+                tags[group_tag, name] = tag
+            # 名称长度为0表示上一个属性的附加值
+            (group if group is not None else groups.setdefault(TAG_OPERATION, {})).setdefault(name, []).append(value)
+    except (IndexError, struct.error):
+        raise IppError("IPP 消息格式错误")
+    return code, request_id, groups, data[offset:]
+
+
+def option_attribute(name, value):
+    """按 cupsEncodeOptions 的顺序确定 k=v 选项的值类型：整数（枚举属性为 enum）、布尔、关键字"""
+    try:
+        number = int(value)
+    except ValueError:
+        pass
+    else:
+        return TAG_ENUM if name in ENUM_OPTIONS else TAG_INTEGER, name, number
+    if value.lower() in BOOLEAN_VALUES:
+        return TAG_BOOLEAN, name, BOOLEAN_VALUES[value.lower()]
+    return TAG_KEYWORD, name, value
+
+
+def job_attributes(options):
+    """lp -o 风格的选项转为任务属性：k=v 按取值确定类型，单独的 k 为 true"""
+    attributes = []
+    for option in options:
+        name, sep, value = option.partition('=')
+        if sep:
+            attributes.append(option_attribute(name, value))
+        else:
+            attributes.append((TAG_BOOLEAN, name, True))
+    return attributes
+
+
+def print_job(uri, data, document_format='application/octet-stream', job_name='print', options=(),
+              user='print', timeout=30):
+    """提交 Print-Job，返回任务ID；失败抛出 IppError"""
+    parts = urlsplit(uri)
+    if parts.scheme not in ('ipp', 'http'):
+        raise IppError(f"不支持的地址: {uri}")
+    host = parts.hostname or 'localhost'
+    port = parts.port or 631
+    # printer-uri 按 CUPS 习惯使用 ipp:// 形式
+    printer_uri = f"ipp://{parts.netloc}{parts.path}"
+
+    header = encode_request(OP_PRINT_JOB, [
+        (TAG_CHARSET, 'attributes-charset', 'utf-8'),
+        (TAG_LANGUAGE, 'attributes-natural-language', 'zh-cn'),
+        (TAG_URI, 'printer-uri', printer_uri),
+        (TAG_NAME, 'requesting-user-name', user),
+        (TAG_NAME, 'job-name', job_name),
+        (TAG_MIME_TYPE, 'document-format', document_format),
+    ], job_attributes(options))
+
+    connection = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        # 请求头和文档分两段发送，文档不复制
+        connection.request('POST', parts.path or '/', body=(header, data), headers={
+            'Content-Type': 'application/ipp',
+            'Content-Length': str(len(header) + len(data)),
+        })
+        response = connection.getresponse()
+        body = response.read()
+    except (OSError, http.client.HTTPException) as e:
+        raise IppError(f"连接 {host}:{port} 失败: {e}")
+    finally:
+        connection.close()
+
+    if response.status != 200:
+        raise IppError(f"HTTP {response.status} {response.reason}")
+    status, _, groups, _ = decode_message(body)
+    if status >= 0x0100:
+        message = groups.get(TAG_OPERATION, {}).get('status-message', [''])[0]
+        raise IppError(f"IPP 状态 0x{status:04x} {message}".strip())
+    return groups.get(TAG_JOB, {}).get('job-id', [None])[0]
+
+
+class IppStandIn(http.server.ThreadingHTTPServer):
+    """本地 IPP 替身：接受 Print-Job，把文档保存在内存（以及可选的目录）中
+
+    Args:
+        address: 监听地址 (主机, 端口)，端口为0时自动分配
+        output: 保存文档的目录，为空时只保存在内存
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), output=None):
+        super().__init__(address, IppRequestHandler)
+        self.output = output
+        self.jobs = []
+        self._job_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def uri(self):
+        host, port = self.server_address[:2]
+        return f"ipp://{host}:{port}/printers/{{printer}}"
+
+    def add_job(self, path, groups, document, tags=None):
+        with self._lock:
+            job_id = next(self._job_ids)
+            operation = groups.get(TAG_OPERATION, {})
+            job = {
+                'id': job_id,
+                'printer': path.rsplit('/', 1)[-1],
+                'name': operation.get('job-name', [''])[0],
+                'format': operation.get('document-format', [''])[0],
+                'attributes': {k: v[0] for k, v in groups.get(TAG_JOB, {}).items()},
+                'tags': {k: (tags or {}).get((TAG_JOB, k)) for k in groups.get(TAG_JOB, {})},
+                'data': document,
+            }
+            self.jobs.append(job)
+        if self.output:
+            os.makedirs(self.output, exist_ok=True)
+            with open(os.path.join(self.output, f"job-{job_id}.bin"), 'wb') as f:
+                f.write(document)
+        print(f"IPP 收到任务 #{job_id}: {job['printer']} {job['format']} {len(document)} 字节")
+        return job_id
+
+    def start(self):
+        """在后台线程中运行，返回自身"""
+        threading.Thread(target=self.serve_forever, name="ipp-stand-in", daemon=True).start()
+        return self
+
+
+class IppRequestHandler(http.server.BaseHTTPRequestHandler):
+    """处理 IPP POST 请求"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        tags = {}
+        try:
+            operation, request_id, groups, document = decode_message(body, tags)
+        except IppError as e:
+            return self._reply(STATUS_BAD_REQUEST, 0, [(TAG_TEXT, 'status-message', str(e))])
+
+        if operation != OP_PRINT_JOB:
+            return self._reply(STATUS_OPERATION_NOT_SUPPORTED, request_id)
+        job_id = self.server.add_job(self.path, groups, document, tags)
+        self._reply(STATUS_OK, request_id, job=[
+            (TAG_INTEGER, 'job-id', job_id),
+            (TAG_ENUM, 'job-state', 9),  # completed
+        ])
+
+    def _reply(self, status, request_id, operation=(), job=()):
+        body = b''.join([
+            IPP_VERSION, struct.pack('>Hi', status, request_id), bytes([TAG_OPERATION]),
+            encode_attribute(TAG_CHARSET, 'attributes-charset', 'utf-8'),
+            encode_attribute(TAG_LANGUAGE, 'attributes-natural-language', 'zh-cn'),
+            *(encode_attribute(*attribute) for attribute in operation),
+            bytes([TAG_JOB]) if job else b'',
+            *(encode_attribute(*attribute) for attribute in job),
+            bytes([TAG_END]),
+        ])
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/ipp')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def self_test():
+    """启动本地替身，用 print_job 提交一个任务并核对收到的内容"""
+    server = IppStandIn().start()
+    try:
+        data = '销售单\n'.encode('gbk') + b'\x0c'
+        uri = server.uri.format(printer='TEST')
+        job_id = print_job(uri, data, 'application/vnd.cups-raw', job_name='SO0001',
+                           options=['raw', 'media=24x14cm', 'cpi=12', 'page-left=72', 'print-quality=5',
+                                    'fit-to-page=false'])
+        job = server.jobs[-1]
+        assert job_id == job['id'], (job_id, job)
+        assert job['data'] == data and job['printer'] == 'TEST' and job['name'] == 'SO0001', job
+        assert job['attributes'] == {
+            'raw': True, 'media': '24x14cm', 'cpi': 12, 'page-left': 72, 'print-quality': 5, 'fit-to-page': False,
+        }, job['attributes']
+        assert job['tags'] == {
+            'raw': TAG_BOOLEAN, 'media': TAG_KEYWORD, 'cpi': TAG_INTEGER, 'page-left': TAG_INTEGER,
+            'print-quality': TAG_ENUM, 'fit-to-page': TAG_BOOLEAN,
+        }, job['tags']
+        print(f"IPP 自检通过: 任务 #{job_id}")
+        return 0
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m print_core.ipp", description="IPP 本地测试服务")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve = subparsers.add_parser("serve", help="运行本地 IPP 替身")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8631)
+    serve.add_argument("--output", help="保存收到的文档的目录")
+
+    subparsers.add_parser("test", help="自检：启动替身并提交一个任务")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "test":
+        return self_test()
+
+    server = IppStandIn((args.host, args.port), output=args.output)
+    print(f"IPP 替身已启动: PRINT_SPOOL=ipp PRINT_IPP_URI={server.uri}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+表格列布局
+各渲染器用 Column 声明表格的列（标题、宽度、对齐、超出宽度时的处理），在模块加载时编译一次：
+- TextTable：等宽文本表格（纯文本、CUPS、ESC/P），边框、分隔线、空行、表头预先生成，
+  每行只做一次拼接；按显示宽度排版时用 print_core.text_width.pad_text，按字符数排版时编译成一个格式字符串
+- PixelTable：图片表格，预先算好每列的起点和对齐方式，每个单元格只测量一次文字宽度
+新的销售单格式只需声明列，不必在逐行循环中重复计算填充和分隔符。
+overflow='wrap' 的列（商品名、规格）超出列宽时折成多行，折行、填充结果按单元格内容缓存；
+不需要折行的行仍走编译好的单行格式
+"""
+
+import os
+from functools import lru_cache
+
+from print_core.fonts import get_text_size, text_size
+from print_core.text_width import NO_BREAK_BEFORE, display_width, pad_text, wrap_text
+
+# 设为 0 时折行的列改为截断（与旧版一致）
+PRINT_CELL_WRAP = os.environ.get("PRINT_CELL_WRAP", "1") == "1"
+
+# 折行后单元格排版结果缓存条数
+CELL_CACHE_SIZE = 4096
+
+# 对齐方式 -> 格式字符串的对齐符号
+FORMAT_ALIGN = {'left': '<', 'right': '>', 'center': '^'}
+
+
+class Column:
+    """表格的一列
+
+    Args:
+        title: 表头文字
+        width: 列宽（文本表格为字符数或显示宽度，图片表格为像素）
+        align: 单元格对齐 'left' | 'right' | 'center'
+        overflow: 超出列宽时 'truncate'（截断） | 'extend'（原样输出，撑开该列，金额、数量等不可截断的列使用）
+            | 'wrap'（折成多行，PRINT_CELL_WRAP=0 时按 truncate 处理）
+        header_align: 表头对齐，不传时与 align 相同
+        limit: 最多显示的字符数（图片表格按字符数截断），不传时不限
+        max_lines: 折行时最多行数，不传时不限
+    """
+
+    __slots__ = ('title', 'width', 'align', 'overflow', 'header_align', 'limit', 'max_lines')
+
+    def __init__(self, title, width, align='left', overflow='truncate', header_align=None, limit=None,
+                 max_lines=None):
+        if align not in FORMAT_ALIGN or (header_align and header_align not in FORMAT_ALIGN):
+            raise ValueError(f"不支持的对齐方式: {align} / {header_align}")
+        if overflow not in ('truncate', 'extend', 'wrap'):
+            raise ValueError(f"不支持的溢出处理: {overflow}")
+        if overflow == 'wrap' and not PRINT_CELL_WRAP:
+            overflow = 'truncate'
+        self.title = title
+        self.width = width
+        self.align = align
+        self.overflow = overflow
+        self.header_align = header_align or align
+        self.limit = limit
+        self.max_lines = max_lines
+
+    def line_limit(self, max_lines):
+        """本列最多行数：列的 max_lines 与本行允许的行数中较小的"""
+        if self.max_lines is None:
+            return max_lines
+        if max_lines is None:
+            return self.max_lines
+        return min(self.max_lines, max_lines)
+
+
+def _fit(text, width, align='left'):
+    """按显示宽度填充，超出时原样返回（overflow='extend'）"""
+    text = str(text)
+    if display_width(text) > width:
+        return text
+    return pad_text(text, width, align)
+
+
+@lru_cache(maxsize=CELL_CACHE_SIZE)
+def wrap_cell(text, width, align, max_lines, by_chars):
+    """折行并把每行填充到列宽，返回各行组成的元组"""
+    lines = wrap_text(text, width, max_lines, by_chars)
+    if by_chars:
+        return tuple(f"{line:{FORMAT_ALIGN[align]}{width}}" for line in lines)
+    return tuple(pad_text(line, width, align) for line in lines)
+
+
+class TextTable:
+    """等宽文本表格
+
+    Args:
+        columns: Column 列表
+        left / sep / right: 左边框、列间分隔、右边框，如 '| '、' | '、' |'
+        measure: 'display'（按显示宽度，中文占2） | 'chars'（按字符数，与 str.format 一致）
+    """
+
+    def __init__(self, columns, left='|', sep='', right='|', measure='display'):
+        if measure not in ('display', 'chars'):
+            raise ValueError(f"不支持的宽度计算方式: {measure}")
+        self.columns = list(columns)
+        self.left = left
+        self.sep = sep
+        self.right = right
+        self.measure = measure
+        self.widths = [column.width for column in self.columns]
+        # 整行宽度与边框之间的宽度
+        self.width = len(left) + sum(self.widths) + len(sep) * (len(self.columns) - 1) + len(right)
+        self.inner_width = self.width - len(left) - len(right)
+
+        self.row = self._compile([column.align for column in self.columns])
+        self.header = self._compile([column.header_align for column in self.columns])(
+            [column.title for column in self.columns]
+        )
+        self.blank = self.row([''] * len(self.columns))
+        # 折行的列号；折行时其余单元格单独排版，续行中空出
+        self._wrapped = [i for i, column in enumerate(self.columns) if column.overflow == 'wrap']
+        self._cells = [self._compile_cell(column) for column in self.columns]
+        self._spaces = [' ' * width for width in self.widths]
+
+    def _compile(self, aligns):
+        """编译出行格式化函数：cells -> 一行文本"""
+        if self.measure == 'chars':
+            specs = []
+            for i, (column, align) in enumerate(zip(self.columns, aligns)):
+                precision = '' if column.overflow == 'extend' else f".{column.width}"
+                specs.append(f"{{{i}:{FORMAT_ALIGN[align]}{column.width}{precision}}}")
+
+            def escape(text):
+                return text.replace('{', '{{').replace('}', '}}')
+            template = escape(self.left) + escape(self.sep).join(specs) + escape(self.right)
+            fmt = template.format
+
+            def row(cells):
+                return fmt(*map(str, cells))
+            return row
+
+        left, sep, right, widths = self.left, self.sep, self.right, self.widths
+        pads = [_fit if column.overflow == 'extend' else pad_text for column in self.columns]
+
+        def row(cells):
+            return left + sep.join([pad(cell, width, align) for pad, cell, width, align in zip(pads, cells, widths, aligns)]) + right
+        return row
+
+    def _compile_cell(self, column):
+        """单个单元格的格式化函数（折行时使用）"""
+        if self.measure == 'chars':
+            precision = '' if column.overflow == 'extend' else f".{column.width}"
+            return f"{{:{FORMAT_ALIGN[column.align]}{column.width}{precision}}}".format
+        pad = _fit if column.overflow == 'extend' else pad_text
+        return lambda cell: pad(cell, column.width, column.align)
+
+    def lines(self, cells, max_lines=None):
+        """一行数据排成的文本行（列表）：折行的列超出列宽时占多行，其余列只在第一行
+
+        max_lines: 本行最多占的行数（页面剩余行数有限时传入）
+        """
+        if not self._wrapped:
+            return [self.row(cells)]
+        by_chars = self.measure == 'chars'
+        wrapped = {}
+        for i in self._wrapped:
+            column = self.columns[i]
+            wrapped[i] = wrap_cell(str(cells[i]), column.width, column.align, column.line_limit(max_lines), by_chars)
+        height = max(len(cell_lines) for cell_lines in wrapped.values())
+        if height == 1:
+            return [self.row(cells)]
+
+        columns = []
+        for i, cell in enumerate(cells):
+            if i in wrapped:
+                columns.append(wrapped[i])
+            else:
+                columns.append((self._cells[i](str(cell)),))
+        lines = []
+        for n in range(height):
+            line = self.left + self.sep.join(
+                [cell_lines[n] if n < len(cell_lines) else spaces for cell_lines, spaces in zip(columns, self._spaces)]
+            ) + self.right
+            # 没有右边框时去掉续行末尾的空白
+            lines.append(line if self.right else line.rstrip())
+        return lines
+
+    def rule(self, fill='-', junction=None):
+        """分隔线：单元格换成 fill，边框、分隔中的空格换成 fill，其余字符换成 junction（不传时保留原字符）"""
+        def border(text):
+            return ''.join(fill if char == ' ' else (junction or char) for char in text)
+        return border(self.left) + border(self.sep).join(fill * width for width in self.widths) + border(self.right)
+
+    def span(self, text, align='left'):
+        """占满边框之间的一行（合计、分页小计等）"""
+        if self.measure == 'chars':
+            return f"{self.left}{str(text):{FORMAT_ALIGN[align]}{self.inner_width}}{self.right}"
+        return self.left + pad_text(text, self.inner_width, align) + self.right
+
+
+class PixelTable:
+    """图片表格
+
+    Args:
+        columns: Column 列表，宽度为像素
+        x: 第一列的起点
+        padding: 右对齐的文字与单元格右边缘的间距
+    """
+
+    def __init__(self, columns, x, padding=0):
+        self.columns = list(columns)
+        self.x = x
+        self.padding = padding
+        self.lefts = []
+        for column in self.columns:
+            self.lefts.append(x)
+            x += column.width
+        self.right = x
+        self._row = [self._placement(left, column, column.align) for left, column in zip(self.lefts, self.columns)]
+        self._header = [self._placement(left, column, column.header_align) for left, column in zip(self.lefts, self.columns)]
+        self._limits = [column.limit for column in self.columns]
+
+    def wrap(self, text, column, font, max_lines):
+        """按像素宽度折行（右对齐的列留出 padding），结果按 (字体, 文本, 列宽, 行数) 缓存"""
+        width = column.width - (self.padding if column.align == 'right' else 0)
+        return wrap_pixels(font, text, width, column.line_limit(max_lines))
+
+    def _placement(self, left, column, align):
+        """单元格文字的起点：(文字宽度) -> x"""
+        width = column.width
+        if align == 'left':
+            return None, left
+        if align == 'center':
+            return (lambda text_width: left + width // 2 - text_width // 2), None
+        right = left + width - self.padding
+        return (lambda text_width: right - text_width), None
+
+    def _draw(self, draw, y, cells, placements, font, fill, limits):
+        y = int(y)
+        for (place, fixed_x), text, limit in zip(placements, cells, limits):
+            text = str(text)
+            if limit is not None:
+                text = text[:limit]
+            self._draw_text(draw, y, text, place, fixed_x, font, fill)
+
+    def _draw_text(self, draw, y, text, place, fixed_x, font, fill):
+        if place is None:
+            x = fixed_x
+        else:
+            x = place(get_text_size(draw, text, font)[0])
+        draw.text((int(x), y), text, fill=fill, font=font)
+
+    def draw_header(self, draw, y, font, fill):
+        """绘制表头"""
+        self._draw(draw, y, [column.title for column in self.columns], self._header, font, fill,
+                   [None] * len(self.columns))
+
+    def draw_row(self, draw, y, cells, font, fill, line_height=0, max_lines=None):
+        """绘制一行，返回占的行数；折行的列每行向下 line_height 像素，其余列只画在第一行
+
+        max_lines: 本行最多占的行数（页面剩余空间有限时传入）
+        """
+        y = int(y)
+        height = 1
+        for column, (place, fixed_x), text, limit in zip(self.columns, self._row, cells, self._limits):
+            text = str(text)
+            if column.overflow == 'wrap':
+                lines = self.wrap(text, column, font, max_lines)
+                height = max(height, len(lines))
+                for n, line in enumerate(lines):
+                    self._draw_text(draw, y + n * line_height, line, place, fixed_x, font, fill)
+                continue
+            if limit is not None:
+                text = text[:limit]
+            self._draw_text(draw, y, text, place, fixed_x, font, fill)
+        return height
+
+
+@lru_cache(maxsize=CELL_CACHE_SIZE)
+def wrap_pixels(font, text, width, max_lines=None):
+    """按像素宽度折行，返回各行组成的元组
+
+    每行用二分查找能放下的最多字符数（每次测量经 fonts.text_size 缓存），中文任意处断开，
+    行首不出现逗号、句号、右括号等标点，最后一行超出时截断
+    """
+    text = ' '.join(text.split())
+    lines = []
+    start = 0
+    while start < len(text):
+        rest = text[start:]
+        if text_size(font, rest)[0] <= width:
+            lines.append(rest)
+            break
+        # 二分查找放得下的最长前缀
+        low, high = 1, len(rest)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if text_size(font, rest[:middle])[0] <= width:
+                low = middle
+            else:
+                high = middle - 1
+        end = low
+        last_line = max_lines is not None and len(lines) == max_lines - 1
+        if not last_line:
+            if rest[end].isascii() and rest[end].isalnum() and rest[end - 1].isascii() and rest[end - 1].isalnum():
+                # 不在英文单词中间断开：退到单词前
+                word_start = end
+                while word_start > 0 and rest[word_start - 1].isascii() and rest[word_start - 1].isalnum():
+                    word_start -= 1
+                if word_start > 0:
+                    end = word_start
+            elif rest[end] in NO_BREAK_BEFORE and end > 1:
+                end -= 1
+        lines.append(rest[:end].rstrip())
+        if last_line:
+            break
+        start += end
+        while start < len(text) and text[start] == ' ':
+            start += 1
+    return tuple(lines) or ('',)
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+运行指标（Prometheus 文本格式）
+打印服务记录各阶段耗时、各打印机的任务数和结果、排队任务数、轮询间隔，
+设置 PRINT_METRICS_PORT 后在本机 http://127.0.0.1:端口/metrics 提供给 Prometheus 抓取。
+只用标准库实现计数器、仪表和直方图，记录一次只是加锁后更新几个数
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 指标接口端口，0 表示不启动
+PRINT_METRICS_PORT = int(os.environ.get("PRINT_METRICS_PORT", "0"))
+
+# 指标接口监听地址，默认只允许本机访问
+PRINT_METRICS_HOST = os.environ.get("PRINT_METRICS_HOST", "127.0.0.1")
+
+# 耗时直方图的分桶（秒）：文本渲染为毫秒级，HTML转PDF、lp 提交为秒级
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float('inf'):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Metric:
+    """指标基类：按标签值分别记录
+
+    Args:
+        name: 指标名
+        documentation: 说明（# HELP）
+        labelnames: 标签名
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}")
+        return tuple(str(label) for label in labels)
+
+    def collect(self):
+        """文本格式的各行"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._samples(items))
+        return lines
+
+    def _samples(self, items):
+        for key, value in items:
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Counter(Metric):
+    """计数器"""
+
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """仪表：当前值"""
+
+    kind = "gauge"
+
+    def set(self, value, *labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    """直方图：各分桶计数、总和、次数"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, *labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        """记录 with 块的耗时（抛出异常时也记录）"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def _samples(self, items):
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _labels(self.labelnames, key, [("le", _number(float(bound)))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_number(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """全部指标的文本格式"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# 各阶段耗时：fetch（认领到任务的请求，长轮询时含等待新任务的时间）、render（渲染，含编码）、
+# encode（编码为打印数据：GBK、PNG/TIFF/PDF、HTML转PDF）、spool（提交打印）、status（状态批量回写）
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "print_stage_seconds", "Time spent in each print job stage", ("stage",)
+))
+
+# 接口请求耗时（APIClient / DBClient 的每个接口）
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "print_request_seconds", "Print job API / database request latency", ("endpoint", "ok")
+))
+
+# 各打印机的任务数：completed（打印成功） | failed（提交失败） | error（渲染或提交异常、超时）
+JOBS_TOTAL = REGISTRY.register(Counter(
+    "print_jobs_total", "Print jobs finished, by printer and outcome", ("printer", "outcome")
+))
+
+# 各打印机已认领、尚未提交完成的任务数
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "print_queue_depth", "Claimed print jobs waiting to be rendered or spooled", ("printer",)
+))
+
+# 上一次认领返回到下一次开始认领的间隔：处理本批任务、等待空闲容量的时间
+POLL_LAG_SECONDS = REGISTRY.register(Histogram(
+    "print_poll_lag_seconds", "Delay between a claim returning and the next claim starting"
+))
+
+# 认领到的任务数
+CLAIMED_TOTAL = REGISTRY.register(Counter(
+    "print_jobs_claimed_total", "Print jobs claimed from the server"
+))
+
+# 打印服务信息（值恒为1）
+WORKER_INFO = REGISTRY.register(Gauge(
+    "print_worker_info", "Print worker backend and runtime", ("backend", "runtime", "worker_id")
+))
+
+
+def observe_stage(stage, seconds):
+    """记录一个阶段的耗时"""
+    STAGE_SECONDS.observe(seconds, stage)
+
+
+def timed(stage):
+    """记录 with 块耗时的阶段计时器"""
+    return STAGE_SECONDS.time(stage)
+
+
+def job_finished(printer_name, outcome, count=1):
+    """任务结束：按打印机和结果计数"""
+    JOBS_TOTAL.inc(printer_name, outcome, amount=count)
+
+
+class PollClock:
+    """轮询间隔：记录上一次认领返回的时间，下一次认领开始时记录间隔"""
+
+    def __init__(self):
+        self._returned = None
+
+    def claiming(self):
+        """开始认领，返回开始时间"""
+        started = time.monotonic()
+        if self._returned is not None:
+            POLL_LAG_SECONDS.observe(started - self._returned)
+        return started
+
+    def claimed(self, jobs, started):
+        """认领返回：认领到任务时记录 fetch 耗时和任务数"""
+        self._returned = time.monotonic()
+        if jobs:
+            observe_stage("fetch", self._returned - started)
+            CLAIMED_TOTAL.inc(amount=len(jobs))
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """GET /metrics"""
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_server(port=None, host=None):
+    """在后台线程中启动指标接口（进程内只启动一次），端口为 0 时不启动；返回服务器或 None"""
+    global _server
+    port = PRINT_METRICS_PORT if port is None else port
+    host = host or PRINT_METRICS_HOST
+    if not port:
+        return None
+    with _server_lock:
+        if _server is not None:
+            return _server
+        try:
+            server = ThreadingHTTPServer((host, port), MetricsHandler)
+        except OSError as e:
+            print(f"指标接口启动失败 ({host}:{port}): {e}")
+            return None
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+        _server = server
+        print(f"指标接口: http://{host}:{server.server_address[1]}/metrics")
+        return server
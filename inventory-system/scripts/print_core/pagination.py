@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+分页
+把商品明细按每页行数切分，逐页给出本页小计和承前、累计合计；
+paginate() 是生成器，渲染器逐页生成、逐页提交，第一页不必等最后一页渲染完
+"""
+
+import os
+
+from print_core.common import to_cents
+
+# 每页商品行数，覆盖各渲染器的默认值；0 表示使用渲染器默认值
+PRINT_PAGE_ROWS = int(os.environ.get("PRINT_PAGE_ROWS", "0"))
+
+
+def format_quantity(qty):
+    """数量合计的显示：整数不带小数，小数去掉浮点误差"""
+    if isinstance(qty, float):
+        if qty.is_integer():
+            return str(int(qty))
+        return f"{round(qty, 6):g}"
+    return str(qty)
+
+
+class Page:
+    """一页商品明细
+
+    Args:
+        number: 页码（从1开始）
+        count: 总页数
+        start: 本页第一行的序号（从1开始）
+        items: 本页商品明细
+        carried_qty: 承前数量（之前各页合计）
+        carried_cents: 承前货款（分）
+    """
+
+    def __init__(self, number, count, start, items, carried_qty=0, carried_cents=0):
+        self.number = number
+        self.count = count
+        self.start = start
+        self.items = items
+        self.carried_qty = carried_qty
+        self.carried_cents = carried_cents
+        self.page_qty = sum(item.get('quantity', 0) for item in items)
+        self.page_cents = sum(to_cents(item.get('totalAmount', 0)) for item in items)
+
+    @property
+    def is_first(self):
+        return self.number == 1
+
+    @property
+    def is_last(self):
+        return self.number == self.count
+
+    @property
+    def running_qty(self):
+        """累计数量（含本页）"""
+        return self.carried_qty + self.page_qty
+
+    @property
+    def running_cents(self):
+        """累计货款（分，含本页）"""
+        return self.carried_cents + self.page_cents
+
+    def rows(self):
+        """(序号, 商品明细)"""
+        return enumerate(self.items, self.start)
+
+    def summary(self):
+        """本页小计，按行分组：[[页码], [本页数量, 本页货款], [承前…], [累计…]]，第一页没有承前"""
+        groups = [
+            [f"第 {self.number}/{self.count} 页"],
+            [f"本页数量: {format_quantity(self.page_qty)}", f"本页货款: ¥{self.page_cents / 100:.2f}"],
+        ]
+        if not self.is_first:
+            groups.append([
+                f"承前数量: {format_quantity(self.carried_qty)}",
+                f"承前货款: ¥{self.carried_cents / 100:.2f}",
+            ])
+        groups.append([
+            f"累计数量: {format_quantity(self.running_qty)}",
+            f"累计货款: ¥{self.running_cents / 100:.2f}",
+        ])
+        return groups
+
+    def fields(self):
+        """模板可用的分页字段"""
+        return {
+            'page_number': self.number,
+            'page_count': self.count,
+            'page_qty': format_quantity(self.page_qty),
+            'page_amount': self.page_cents / 100,
+            'carried_qty': format_quantity(self.carried_qty),
+            'carried_amount': self.carried_cents / 100,
+            'running_qty': format_quantity(self.running_qty),
+            'running_amount': self.running_cents / 100,
+        }
+
+
+def page_rows(default):
+    """实际使用的每页行数"""
+    return PRINT_PAGE_ROWS or default
+
+
+def page_count(products, rows_per_page):
+    """总页数，不分页（rows_per_page 为空）或没有商品时为1页"""
+    if not rows_per_page or not products:
+        return 1
+    return (len(products) + rows_per_page - 1) // rows_per_page
+
+
+def paginate(products, rows_per_page):
+    """按每页行数切分商品明细，逐页产出 Page"""
+    count = page_count(products, rows_per_page)
+    size = rows_per_page if rows_per_page and count > 1 else max(len(products), 1)
+    carried_qty = 0
+    carried_cents = 0
+    for number in range(1, count + 1):
+        start = (number - 1) * size
+        page = Page(number, count, start + 1, products[start:start + size], carried_qty, carried_cents)
+        yield page
+        carried_qty = page.running_qty
+        carried_cents = page.running_cents
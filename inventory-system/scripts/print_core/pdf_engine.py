@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+HTML转PDF引擎
+进程内只创建一次：安装了 weasyprint 时在进程内转换，字体配置和页面样式只解析一次；
+否则调用 wkhtmltopdf，HTML经标准输入传入、PDF从标准输出读回，不写临时文件；
+异步打印服务使用 html_to_pdf_async，wkhtmltopdf 子进程超时或被取消时随即结束
+"""
+
+import asyncio
+import os
+import shutil
+import subprocess
+import threading
+
+from print_core.spool import run_process
+
+# 转换引擎：auto | weasyprint | wkhtmltopdf
+PRINT_PDF_ENGINE = os.environ.get("PRINT_PDF_ENGINE", "auto")
+
+# 单次转换超时（秒）
+PRINT_PDF_TIMEOUT = int(os.environ.get("PRINT_PDF_TIMEOUT", "60"))
+
+# 纸张：24cm x 14cm，无边距
+PAGE_CSS = "@page { size: 24cm 14cm; margin: 0; }"
+
+WKHTMLTOPDF_OPTIONS = [
+    '--quiet', '--orientation', 'landscape',
+    '--page-width', '24cm', '--page-height', '14cm',
+    '--margin-top', '0', '--margin-bottom', '0', '--margin-left', '0', '--margin-right', '0',
+    '--encoding', 'utf-8',
+]
+
+
+class PdfError(Exception):
+    """HTML转PDF失败"""
+
+
+class WeasyPrintEngine:
+    """weasyprint 进程内转换"""
+
+    name = "weasyprint"
+
+    def __init__(self):
+        import weasyprint
+        try:
+            from weasyprint.text.fonts import FontConfiguration
+        except ImportError:
+            from weasyprint.fonts import FontConfiguration
+
+        self._weasyprint = weasyprint
+        self.font_config = FontConfiguration()
+        self.page_css = weasyprint.CSS(string=PAGE_CSS, font_config=self.font_config)
+        # weasyprint 的字体配置不是线程安全的
+        self._lock = threading.Lock()
+
+    def to_pdf(self, html):
+        with self._lock:
+            try:
+                if isinstance(html, bytes):
+                    html = html.decode('utf-8')
+                document = self._weasyprint.HTML(string=html)
+                return document.write_pdf(stylesheets=[self.page_css], font_config=self.font_config)
+            except Exception as e:
+                raise PdfError(str(e))
+
+    async def to_pdf_async(self, html):
+        # 进程内转换，在线程中执行
+        return await asyncio.to_thread(self.to_pdf, html)
+
+
+class WkhtmltopdfEngine:
+    """wkhtmltopdf 子进程转换（标准输入输出）"""
+
+    name = "wkhtmltopdf"
+
+    def __init__(self, path=None):
+        self.path = path or shutil.which('wkhtmltopdf')
+        if not self.path:
+            raise PdfError("未找到 wkhtmltopdf")
+
+    def to_pdf(self, html):
+        try:
+            result = subprocess.run(
+                self.command(), input=html if isinstance(html, bytes) else html.encode('utf-8'),
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=PRINT_PDF_TIMEOUT
+            )
+        except subprocess.TimeoutExpired:
+            raise PdfError("转换PDF超时")
+        return self._check(result.returncode, result.stdout, result.stderr)
+
+    async def to_pdf_async(self, html):
+        try:
+            returncode, stdout, stderr = await run_process(
+                self.command(), html if isinstance(html, bytes) else html.encode('utf-8'), PRINT_PDF_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            raise PdfError("转换PDF超时")
+        except OSError as e:
+            raise PdfError(str(e))
+        return self._check(returncode, stdout, stderr)
+
+    def command(self):
+        return [self.path] + WKHTMLTOPDF_OPTIONS + ['-', '-']
+
+    def _check(self, returncode, stdout, stderr):
+        """检查转换结果，返回PDF内容"""
+        if returncode != 0 or not stdout.startswith(b'%PDF'):
+            raise PdfError(stderr.decode('utf-8', errors='replace').strip() or "转换PDF失败")
+        return stdout
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def create_engine(name=None):
+    """创建转换引擎：auto 时优先 weasyprint，未安装时回退到 wkhtmltopdf 并给出警告"""
+    name = name or PRINT_PDF_ENGINE
+    if name in ("auto", "weasyprint"):
+        try:
+            return WeasyPrintEngine()
+        except ImportError:
+            if name == "weasyprint":
+                raise PdfError("未安装 weasyprint")
+            print("警告: 未安装 weasyprint，改用 wkhtmltopdf，每张销售单都要启动一次 wkhtmltopdf 进程；"
+                  "安装: pip3 install -r requirements-html.txt")
+    return WkhtmltopdfEngine()
+
+
+def get_engine():
+    """进程内共用的转换引擎（首次使用时创建）"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = create_engine()
+            print(f"HTML转PDF引擎: {_engine.name}")
+        return _engine
+
+
+def html_to_pdf(html):
+    """HTML（str 或 UTF-8 bytes）转PDF，返回PDF内容，失败抛出 PdfError"""
+    return get_engine().to_pdf(html)
+
+
+async def html_to_pdf_async(html):
+    """html_to_pdf 的异步版本"""
+    return await get_engine().to_pdf_async(html)
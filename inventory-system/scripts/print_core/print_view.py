@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+打印视图解码
+服务端以 view=print 返回的任务只包含渲染需要的字段，商品明细为按 itemFields 排列的数组；
+这里把它展开成与完整任务相同的嵌套结构（只含渲染用到的键），渲染代码无需区分两种格式
+"""
+
+# 服务端未返回字段名时使用的默认顺序
+PRINT_VIEW_ITEM_FIELDS = ("code", "name", "quantity", "unitName", "specification", "price", "totalAmount")
+
+
+def decode_item(values, fields):
+    """商品明细数组 -> 订单商品"""
+    item = dict(zip(fields, values))
+    unit_name = item.get("unitName") or ''
+    return {
+        "quantity": item.get("quantity", 0),
+        "price": item.get("price", 0),
+        "totalAmount": item.get("totalAmount", 0),
+        "unitName": unit_name,
+        "productUnit": {
+            "unitName": unit_name,
+            "specification": item.get("specification") or '',
+        },
+        "product": {
+            "code": item.get("code") or '',
+            "name": item.get("name") or '',
+        },
+    }
+
+
+def decode_job(view, fields=PRINT_VIEW_ITEM_FIELDS):
+    """打印视图任务 -> 任务"""
+    return {
+        "id": view["id"],
+        "orderId": view.get("orderId"),
+        "printerName": view.get("printerName"),
+        "createdAt": view.get("createdAt") or '',
+        "order": {
+            "id": view.get("orderId"),
+            "orderNumber": view.get("orderNumber", ''),
+            "createdAt": view.get("orderCreatedAt") or '',
+            "totalAmount": view.get("totalAmount", 0),
+            "customer": {
+                "name": view.get("customerName", ''),
+                "phone": view.get("customerPhone", ''),
+            },
+            "products": [decode_item(values, fields) for values in view.get("items", [])],
+        },
+    }
+
+
+def decode_jobs(payload):
+    """解码任务列表响应；不是打印视图时原样返回 data"""
+    jobs = payload.get("data", [])
+    if payload.get("view") != "print":
+        return jobs
+    fields = tuple(payload.get("itemFields") or PRINT_VIEW_ITEM_FIELDS)
+    return [decode_job(view, fields) for view in jobs]
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+渲染结果缓存
+按 (渲染器, 模板版本, 订单内容哈希) 缓存渲染好的打印文档：补打、重复任务直接复用，
+不再重新渲染（HTML转PDF每单要数秒）。内存和磁盘两级，均按字节数上限做LRU淘汰
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from print_core.renderers.base import Document
+
+# 设为 0 关闭渲染缓存
+PRINT_RENDER_CACHE = os.environ.get("PRINT_RENDER_CACHE", "1") == "1"
+
+# 内存缓存上限（MB）
+PRINT_RENDER_CACHE_MB = float(os.environ.get("PRINT_RENDER_CACHE_MB", "64"))
+
+# 磁盘缓存目录与上限（MB），上限为 0 时不使用磁盘缓存
+PRINT_RENDER_CACHE_DIR = os.environ.get(
+    "PRINT_RENDER_CACHE_DIR", os.path.join(tempfile.gettempdir(), "print_render_cache")
+)
+PRINT_RENDER_CACHE_DISK_MB = float(os.environ.get("PRINT_RENDER_CACHE_DISK_MB", "512"))
+
+# 哈希长度（sha256 十六进制）
+KEY_LENGTH = 64
+
+
+def cache_key(renderer, job):
+    """缓存键：渲染器标识 + 订单内容哈希"""
+    payload = json.dumps(
+        job.get("order", {}), sort_keys=True, ensure_ascii=False,
+        separators=(',', ':'), default=str
+    )
+    digest = hashlib.sha256()
+    digest.update(renderer.cache_tag().encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(payload.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class MemoryCache:
+    """内存LRU缓存，按字节数淘汰"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+
+    def get(self, key):
+        document = self._items.get(key)
+        if document is not None:
+            self._items.move_to_end(key)
+        return document
+
+    def put(self, key, document):
+        size = len(document.data)
+        if size > self.max_bytes:
+            return
+        previous = self._items.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous.data)
+        self._items[key] = document
+        self.size += size
+        while self.size > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.size -= len(evicted.data)
+
+
+class DiskCache:
+    """磁盘LRU缓存：每个文档一个文件（哈希+扩展名），按修改时间淘汰，命中时更新修改时间"""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        """启动时扫描已有文件，按修改时间排序"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and len(entry.name) > KEY_LENGTH and entry.name[KEY_LENGTH] == '.':
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._items[name[:KEY_LENGTH]] = (name[KEY_LENGTH:], size)
+            self.size += size
+        self._evict()
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def get(self, key):
+        entry = self._items.get(key)
+        if entry is None:
+            return None
+        suffix, _ = entry
+        path = self._path(key, suffix)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            self._remove(key)
+            return None
+        self._items.move_to_end(key)
+        return Document(data, suffix=suffix)
+
+    def put(self, key, document):
+        size = len(document.data)
+        if size > self.max_bytes:
+            return
+        path = self._path(key, document.suffix)
+        # 先写临时文件再改名，避免进程中断留下不完整的文件
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(document.data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"写入渲染缓存失败: {e}")
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            return
+        if key in self._items:
+            self._remove(key, unlink=False)
+        self._items[key] = (document.suffix, size)
+        self.size += size
+        self._evict()
+
+    def _remove(self, key, unlink=True):
+        suffix, size = self._items.pop(key)
+        self.size -= size
+        if unlink:
+            try:
+                os.unlink(self._path(key, suffix))
+            except OSError:
+                pass
+
+    def _evict(self):
+        while self.size > self.max_bytes and self._items:
+            self._remove(next(iter(self._items)))
+
+
+class RenderCache:
+    """两级渲染缓存
+
+    Args:
+        memory_mb: 内存缓存上限（MB）
+        directory: 磁盘缓存目录，为空时只用内存
+        disk_mb: 磁盘缓存上限（MB）
+    """
+
+    def __init__(self, memory_mb=None, directory=None, disk_mb=None):
+        memory_mb = PRINT_RENDER_CACHE_MB if memory_mb is None else memory_mb
+        directory = PRINT_RENDER_CACHE_DIR if directory is None else directory
+        disk_mb = PRINT_RENDER_CACHE_DISK_MB if disk_mb is None else disk_mb
+
+        self.memory = MemoryCache(int(memory_mb * 1024 * 1024))
+        self.disk = None
+        if directory and disk_mb > 0:
+            try:
+                self.disk = DiskCache(directory, int(disk_mb * 1024 * 1024))
+            except OSError as e:
+                print(f"渲染缓存目录不可用，只使用内存缓存: {e}")
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            document = self.memory.get(key)
+            if document is None and self.disk is not None:
+                document = self.disk.get(key)
+                if document is not None:
+                    self.memory.put(key, document)
+            if document is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return document
+
+    def put(self, key, document):
+        with self._lock:
+            self.memory.put(key, document)
+            if self.disk is not None:
+                self.disk.put(key, document)
+
+    def render(self, renderer, job):
+        """取缓存的渲染结果，没有时渲染并缓存；renderer.cacheable(document) 为假的结果不缓存"""
+        key = cache_key(renderer, job)
+        document = self.get(key)
+        if document is not None:
+            print(f"打印任务 #{job.get('id')} 使用缓存的渲染结果")
+            return document
+        document = renderer.render(job)
+        if renderer.cacheable(document):
+            self.put(key, document)
+        return document
+
+    async def render_async(self, renderer, job):
+        """render 的异步版本：读写缓存在线程中执行，渲染使用 renderer.render_async"""
+        key = cache_key(renderer, job)
+        document = await asyncio.to_thread(self.get, key)
+        if document is not None:
+            print(f"打印任务 #{job.get('id')} 使用缓存的渲染结果")
+            return document
+        document = await renderer.render_async(job)
+        if renderer.cacheable(document):
+            await asyncio.to_thread(self.put, key, document)
+        return document
+
+    def summary(self):
+        """命中统计文本"""
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0
+        return f"渲染缓存: 命中{self.hits}次 未命中{self.misses}次 命中率{rate:.0f}%"
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""
+渲染器
+各渲染器按需导入：只用文本打印的服务不会加载 PIL 等图片依赖
+"""
+
+import importlib
+
+# 渲染器名称 -> (模块, 类名)
+RENDERERS = {
+    "text": ("print_core.renderers.text", "TextRenderer"),
+    "cups": ("print_core.renderers.cups", "CupsRenderer"),
+    "escp": ("print_core.renderers.escp", "EscpRenderer"),
+    "image": ("print_core.renderers.image", "ImageRenderer"),
+    "html_pdf": ("print_core.renderers.html_pdf", "HtmlPdfRenderer"),
+    "console": ("print_core.renderers.console", "ConsoleRenderer"),
+}
+
+
+def get_renderer(name, **kwargs):
+    """按名称创建渲染器"""
+    if name not in RENDERERS:
+        raise ValueError(f"未知的渲染器: {name}，可选: {', '.join(RENDERERS)}")
+    module_name, class_name = RENDERERS[name]
+    module = importlib.import_module(module_name)
+    return getattr(module, class_name)(**kwargs)
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+渲染器接口
+render(job) 在渲染线程中生成待打印文档，spool(printer_name, document) 在打印机队列线程中提交；
+分页的渲染器实现 render_page(job, page)，多页订单可以逐页生成、逐页提交；
+异步打印服务调用 render_async / spool_async，默认在线程中执行同步版本，
+调用子进程的渲染器覆盖为由事件循环管理子进程的版本
+"""
+
+import asyncio
+
+from print_core.common import job_fields
+from print_core.layout import PRINT_CELL_WRAP
+from print_core.pagination import page_count, page_rows, paginate
+from print_core.sinks import get_sink
+from print_core.spool import cups_print, cups_print_async
+from print_core.tracing import span
+
+
+class Document:
+    """渲染结果：待发送给打印机的数据
+
+    Args:
+        data: 打印数据（bytes）
+        suffix: 文档类型（扩展名），决定提交到CUPS时的文档格式
+        text: 文本渲染器的原始文本，用于预览（从磁盘缓存取回的文档没有）
+    """
+
+    def __init__(self, data, suffix='.txt', text=None):
+        self.data = data
+        self.suffix = suffix
+        self.text = text
+
+
+class Renderer:
+    """渲染器基类"""
+
+    # 渲染器名称（--backend 参数）
+    name = None
+
+    # 服务启动时显示的名称
+    title = None
+
+    # 模板版本，修改排版后递增，使渲染缓存失效
+    version = "1"
+
+    def cache_tag(self):
+        """渲染缓存键中区分渲染器、模板、每页行数和单元格折行（PRINT_CELL_WRAP）的部分"""
+        wrap = "wrap" if PRINT_CELL_WRAP else "truncate"
+        return f"{self.name}:{self.version}:{self.page_rows()}:{wrap}"
+
+    def cacheable(self, document):
+        """渲染结果是否可以缓存"""
+        return True
+
+    # 每页商品行数，None 表示不分页（PRINT_PAGE_ROWS 可统一覆盖）
+    rows_per_page = None
+
+    def page_rows(self):
+        """实际使用的每页行数"""
+        return page_rows(self.rows_per_page)
+
+    def pages(self, job):
+        """商品明细分页（生成器）"""
+        return paginate(job_fields(job)[1], self.page_rows())
+
+    def page_count(self, job):
+        """订单的页数"""
+        return page_count(job_fields(job)[1], self.page_rows())
+
+    def render(self, job):
+        """生成打印文档：各页依次拼接为一个文档"""
+        return join_pages([self.render_page(job, page) for page in self.pages(job)])
+
+    def render_page(self, job, page):
+        """生成一页打印文档（page 为 print_core.pagination.Page）"""
+        raise NotImplementedError
+
+    def render_pages(self, job):
+        """逐页生成打印文档（生成器）"""
+        for page in self.pages(job):
+            with span("render_page", **{"print.page": page.number}):
+                document = self.render_page(job, page)
+            yield document
+
+    async def render_async(self, job):
+        """render 的异步版本"""
+        return await asyncio.to_thread(self.render, job)
+
+    def close(self):
+        """停止服务时释放渲染器占用的资源（进程池等）"""
+
+    def spool(self, printer_name, document):
+        """提交打印，返回 (success, 打印作业ID, 错误信息)"""
+        raise NotImplementedError
+
+    async def spool_async(self, printer_name, document):
+        """spool 的异步版本"""
+        return await asyncio.to_thread(self.spool, printer_name, document)
+
+    def spool_pages(self, printer_name, documents):
+        """逐页提交打印，某页失败时停止；documents 可以是边渲染边产出的 PageStream"""
+        spool_ids = []
+        for number, document in enumerate(documents, 1):
+            success, spool_id, error = self.spool(printer_name, document)
+            if not success:
+                return False, ', '.join(spool_ids) or None, f"第{number}页: {error}"
+            if spool_id:
+                spool_ids.append(spool_id)
+        return True, ', '.join(spool_ids) or None, None
+
+    async def spool_pages_async(self, printer_name, documents):
+        """spool_pages 的异步版本：下一页在线程中渲染"""
+        pages = iter(documents)
+        spool_ids = []
+        number = 0
+        while True:
+            document = await asyncio.to_thread(next, pages, None)
+            if document is None:
+                return True, ', '.join(spool_ids) or None, None
+            number += 1
+            success, spool_id, error = await self.spool_async(printer_name, document)
+            if not success:
+                return False, ', '.join(spool_ids) or None, f"第{number}页: {error}"
+            if spool_id:
+                spool_ids.append(spool_id)
+
+
+class PageStream:
+    """多页文档：第一页在渲染线程中生成，其余页在提交时逐页生成
+
+    提交线程发送第一页后再渲染下一页，打印机不必等整单渲染完才开始出纸
+    """
+
+    def __init__(self, pages):
+        self._pages = iter(pages)
+        self.first = next(self._pages)
+
+    def __iter__(self):
+        yield self.first
+        yield from self._pages
+
+
+def join_pages(documents):
+    """多页合并为一个文档：数据直接拼接（适用于文本和打印机命令流）"""
+    if len(documents) == 1:
+        return documents[0]
+    texts = [document.text for document in documents]
+    return Document(
+        b''.join(document.data for document in documents),
+        suffix=documents[0].suffix,
+        text=None if None in texts else '\n'.join(texts)
+    )
+
+
+def spool_raw(printer_name, document, options=(), timeout=30):
+    """提交打印机原生数据（纯文本、ESC/P）：按 PRINT_SINK 直连网络打印机，否则经CUPS"""
+    return get_sink().spool(
+        printer_name, document,
+        lambda: cups_print(printer_name, document, options=options, timeout=timeout)
+    )
+
+
+async def spool_raw_async(printer_name, document, options=(), timeout=30):
+    """spool_raw 的异步版本：经CUPS时 lp 子进程由事件循环管理，直连打印机时在线程中写入"""
+    if get_sink().name == "cups":
+        return await cups_print_async(printer_name, document, options=options, timeout=timeout)
+    return await asyncio.to_thread(spool_raw, printer_name, document, options, timeout)
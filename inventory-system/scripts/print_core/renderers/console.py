@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+控制台渲染器
+40字符宽度的销售单，输出到标准输出模拟打印
+"""
+
+from print_core.common import format_order_date, item_fields, job_fields, number_to_chinese
+from print_core.pagination import paginate
+from print_core.renderers.base import Document, Renderer
+
+# 每页商品行数（与补足空行的行数一致）
+PAGE_ROWS = 8
+
+
+def format_print_content(job, page=None):
+    """格式化打印内容
+
+    page 为分页后的一页（print_core.pagination.Page），不传时整单打印在一页
+    """
+    order, products, customer = job_fields(job)
+    if page is None:
+        page = next(paginate(products, None))
+
+    lines = []
+
+    # 标题
+    lines.append("销售单".center(40))
+    lines.append("")
+
+    # 表头信息
+    lines.append(f"客户名称: {customer.get('name', '')}")
+    lines.append(f"电话: {customer.get('phone', '')}")
+    lines.append(f"单号: {order.get('orderNumber', '')}")
+
+    # 格式化日期
+    order_date = format_order_date(order.get('createdAt', ''), '%Y.%m.%d')
+    lines.append(f"日期: {order_date}")
+    lines.append("")
+
+    # 表格分隔线
+    lines.append("-" * 40)
+
+    # 表头
+    lines.append(f"{'货号':<8}{'品名':<12}{'数量':>6}{'单价':>8}{'金额':>8}")
+    lines.append("-" * 40)
+
+    # 商品明细
+    total_qty = sum(item.get('quantity', 0) for item in products)
+    for _, item in page.rows():
+        fields = item_fields(item)
+        code = fields['code'][:6]
+        name = fields['name'][:10]
+        qty = fields['quantity']
+        price = fields['price']
+        amount = fields['amount']
+
+        lines.append(f"{code:<8}{name:<12}{qty:>6}{price:>8.2f}{amount:>8.2f}")
+
+    # 空行填充（至少8行）
+    for _ in range(max(PAGE_ROWS - len(page.items), 0)):
+        lines.append("")
+
+    lines.append("-" * 40)
+
+    # 汇总信息：整单一页时本页即整单，多页时为本页小计和承前、累计合计
+    total_amount = float(order.get('totalAmount', 0))
+    if page.count > 1:
+        for group in page.summary():
+            lines.append("  ".join(group))
+    else:
+        lines.append(f"本页数量: {total_qty}")
+        lines.append(f"本页货款: ¥{total_amount:.2f}")
+    lines.append(f"本单货款(大写): {number_to_chinese(total_amount)}")
+    lines.append(f"前欠款: ¥0.00")
+    lines.append("")
+    lines.append("注: 货物当面点清，过后概不负责。")
+    lines.append("")
+    lines.append("")
+
+    return "\n".join(lines)
+
+
+def print_receipt(content):
+    """
+    执行打印
+    这里使用标准输出模拟打印，实际使用时需要根据打印机型号
+    使用相应的打印库（如python-escpos、pyusb等）
+    """
+    print("=" * 50)
+    print("开始打印...")
+    print("=" * 50)
+    print(content)
+    print("=" * 50)
+    print("打印完成")
+    print("=" * 50)
+    return True
+
+
+class ConsoleRenderer(Renderer):
+    """控制台渲染器"""
+
+    name = "console"
+    title = "控制台版"
+    rows_per_page = PAGE_ROWS
+
+    def render_page(self, job, page):
+        content = format_print_content(job, page)
+        return Document(content.encode('utf-8'), text=content)
+
+    def spool(self, printer_name, document):
+        if print_receipt(document.data.decode('utf-8')):
+            return True, None, None
+        return False, None, "打印失败"
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+CUPS文本渲染器
+22cm x 14cm 纸张的带边框文本表格，GBK编码通过CUPS打印
+"""
+
+from print_core.common import encode_gbk, format_order_date, item_fields, job_fields, number_to_chinese
+from print_core.layout import Column, TextTable
+from print_core.pagination import paginate
+from print_core.renderers.base import Document, Renderer, spool_raw, spool_raw_async
+from print_core.tracing import stage
+
+# 每页商品行数：14cm 纸张按每英寸6行约33行，多页时表头、表尾和本页小计共约25行
+PAGE_ROWS = 8
+
+# 商品表格：品名超出列宽折行，数字原样输出
+TABLE = TextTable([
+    Column('序号', 4, 'center', overflow='extend'),
+    Column('品名', 14, 'left', overflow='wrap', header_align='center', max_lines=2),
+    Column('数量', 6, 'center', overflow='extend'),
+    Column('单价', 10, 'center', overflow='extend'),
+    Column('金额', 10, 'center', overflow='extend'),
+], left='| ', sep=' | ', right=' |', measure='chars')
+
+# 标题、边框宽度
+TOTAL_WIDTH = sum(TABLE.widths) + 6  # +6 是分隔符
+
+# 边框线
+BORDER = "+" + "-" * (TOTAL_WIDTH - 2) + "+"
+SEPARATOR = TABLE.rule('-', '+')
+
+# lp 打印参数
+LP_OPTIONS = [
+    'raw',             # 纯文本模式
+    'cpi=12',          # 每英寸12字符
+    'lpi=6',           # 每英寸6行
+    'page-left=72',    # 左边距0.5英寸
+    'page-right=72',   # 右边距
+    'page-top=72',     # 上边距
+    'page-bottom=72',  # 下边距
+]
+
+
+def format_print_content(job, page=None):
+    """格式化打印内容 - 22cm x 14cm 纸张，居中打印
+
+    page 为分页后的一页（print_core.pagination.Page），不传时整单打印在一页
+    """
+    order, products, customer = job_fields(job)
+    if page is None:
+        page = next(paginate(products, None))
+
+    lines = []
+
+    # 标题
+    lines.append("")
+    lines.append("=" * TOTAL_WIDTH)
+    lines.append(" " * ((TOTAL_WIDTH - 6) // 2) + "销售单")
+    lines.append("=" * TOTAL_WIDTH)
+
+    # 客户信息
+    customer_name = customer.get('name', '')
+    customer_phone = customer.get('phone', '')
+    order_date = format_order_date(order.get('createdAt', ''))
+    order_number = order.get('orderNumber', '')[:20]
+
+    lines.append(BORDER)
+    lines.append(f"| 客户: {customer_name:<24} | 日期: {order_date} |")
+    lines.append(f"| 电话: {customer_phone:<24} | 单号: {order_number:<14} |")
+    lines.append(SEPARATOR)
+
+    # 表头
+    lines.append(TABLE.header)
+    lines.append(SEPARATOR)
+
+    # 商品明细
+    total_qty = sum(item.get('quantity', 0) for item in products)
+    # 品名折行多占的行不超过本页剩余的行数
+    spare_lines = PAGE_ROWS - len(page.items)
+    table_lines = 0
+    for idx, item in page.rows():
+        fields = item_fields(item)
+        row_lines = TABLE.lines((idx, fields['name'], fields['quantity'], f"{fields['price']:.2f}", f"{fields['amount']:.2f}"),
+                                max_lines=1 + max(spare_lines, 0))
+        spare_lines -= len(row_lines) - 1
+        table_lines += len(row_lines)
+        lines.extend(row_lines)
+
+    # 空行填充
+    lines.extend([TABLE.blank] * max(4 - table_lines, 0))
+
+    lines.append(SEPARATOR)
+
+    # 多页时每页附本页小计和承前、累计合计
+    if page.count > 1:
+        for group in page.summary():
+            lines.append(f"| {'  '.join(group):<42} |")
+        lines.append(SEPARATOR)
+
+    # 汇总信息
+    total_amount = float(order.get('totalAmount', 0))
+    lines.append(f"| 总数量: {total_qty:<34} |")
+    lines.append(f"| 总金额: ¥{total_amount:<34.2f} |")
+    lines.append(f"| 大写: {number_to_chinese(total_amount):<36} |")
+    lines.append(BORDER)
+
+    # 底部信息
+    lines.append("| 服务电话:                             客户签名:      |")
+    lines.append("|                                          __________   |")
+    lines.append("=" * TOTAL_WIDTH)
+    lines.append("| 备注: 货物当面点清，过后概不负责。                   |")
+    lines.append("=" * TOTAL_WIDTH)
+    lines.append("")
+
+    return "\n".join(lines)
+
+
+class CupsRenderer(Renderer):
+    """CUPS文本渲染器"""
+
+    name = "cups"
+    title = "CUPS版"
+    version = "2"
+    rows_per_page = PAGE_ROWS
+
+    def render_page(self, job, page):
+        content = format_print_content(job, page)
+        # 添加Form Feed (FF)命令，告诉打印机打印完成可以出纸
+        with stage("encode"):
+            data = encode_gbk(content) + b'\x0c'
+        return Document(data, text=content)
+
+    def spool(self, printer_name, document):
+        return spool_raw(printer_name, document, options=LP_OPTIONS)
+
+    async def spool_async(self, printer_name, document):
+        return await spool_raw_async(printer_name, document, options=LP_OPTIONS)
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+ESC/P渲染器
+使用ESC/P命令直接生成打印数据，避免图片模糊问题；
+打印数据由 EscpBuilder 直接写成字节，标题、表头、底部等固定内容只编码一次
+"""
+
+from print_core.common import encode_gbk, format_order_date, item_fields, job_fields
+from print_core.layout import Column, TextTable
+from print_core.pagination import paginate
+from print_core.renderers.base import Document, Renderer, spool_raw, spool_raw_async
+from print_core.tracing import stage
+
+# ESC/P 命令定义
+ESC = b'\x1b'
+GS = b'\x1d'
+FS = b'\x1c'
+
+# ESC/P Commands
+CMD_INIT = ESC + b'@'              # 初始化打印机
+CMD_ALIGN_LEFT = ESC + b'a' + b'\x00'    # 左对齐
+CMD_ALIGN_CENTER = ESC + b'a' + b'\x01'  # 居中对齐
+CMD_BOLD_ON = ESC + b'E' + b'\x01'       # 粗体开启
+CMD_BOLD_OFF = ESC + b'E' + b'\x00'      # 粗体关闭
+CMD_DOUBLE_WIDTH_ON = ESC + b'W' + b'\x01'  # 倍宽开启
+CMD_DOUBLE_WIDTH_OFF = ESC + b'W' + b'\x00' # 倍宽关闭
+CMD_DOUBLE_HEIGHT_ON = ESC + b'w' + b'\x01' # 倍高开启
+CMD_DOUBLE_HEIGHT_OFF = ESC + b'w' + b'\x00'# 倍高关闭
+CMD_ITALIC_ON = ESC + b'4'               # 斜体开启
+CMD_ITALIC_OFF = ESC + b'5'              # 斜体关闭
+CMD_UNDERLINE_ON = ESC + b'-' + b'\x01'  # 下划线开启
+CMD_UNDERLINE_OFF = ESC + b'-' + b'\x00' # 下划线关闭
+CMD_LINE_FEED = b'\x0a'                  # 换行
+CMD_FORM_FEED = b'\x0c'                 # 走纸
+CMD_RETURN = b'\x0d'                     # 回车
+
+# 设置行间距为 1/6 英寸 (默认)
+CMD_LINE_SPACING_6 = ESC + b'2'
+
+# 设置行间距为 n/180 英寸
+def cmd_line_spacing(n):
+    return ESC + b'3' + bytes([n])
+
+# 打印并换行
+CMD_PRINT_FEED = b'\x0a' * 2
+
+# 每页商品行数
+PAGE_ROWS = 10
+
+# 分隔线
+RULE = "-" * 40
+
+# 商品表格：列间一个空格，品名超出列宽折行
+TABLE = TextTable([
+    Column('序号', 4, 'left', overflow='extend'),
+    Column('品名', 10, 'left', overflow='wrap', max_lines=2),
+    Column('数量', 4, 'right', overflow='extend'),
+    Column('金额', 8, 'right', overflow='extend'),
+], left='', sep=' ', right='', measure='chars')
+
+
+class EscpBuilder:
+    """ESC/P 打印数据
+
+    命令和文字直接追加到一个 bytearray：文字逐段编码为GBK（无法编码的字符跳过），
+    命令字节原样写入；同时记录每行文字，用于预览
+    """
+
+    def __init__(self):
+        self.data = bytearray()
+        self.lines = []
+        self._line = []
+
+    def command(self, command):
+        """写入命令字节"""
+        self.data += command
+        return self
+
+    def init(self):
+        """初始化打印机，行间距恢复默认"""
+        return self.command(CMD_INIT + CMD_LINE_SPACING_6)
+
+    def line_spacing(self, n=None):
+        """行间距：不传时为默认 1/6 英寸，否则为 n/180 英寸"""
+        return self.command(CMD_LINE_SPACING_6 if n is None else cmd_line_spacing(n))
+
+    def align(self, center):
+        return self.command(CMD_ALIGN_CENTER if center else CMD_ALIGN_LEFT)
+
+    def bold(self, on):
+        return self.command(CMD_BOLD_ON if on else CMD_BOLD_OFF)
+
+    def double_size(self, on):
+        """倍宽倍高"""
+        if on:
+            return self.command(CMD_DOUBLE_WIDTH_ON + CMD_DOUBLE_HEIGHT_ON)
+        return self.command(CMD_DOUBLE_WIDTH_OFF + CMD_DOUBLE_HEIGHT_OFF)
+
+    def text(self, text):
+        """写入文字（不换行）"""
+        self.data += encode_gbk(text)
+        self._line.append(text)
+        return self
+
+    def feed(self, count=1):
+        """换行，count 大于1时空出 count-1 行"""
+        self.data += CMD_LINE_FEED * count
+        self.lines.append(''.join(self._line))
+        self.lines.extend([''] * (count - 1))
+        self._line = []
+        return self
+
+    def line(self, text=''):
+        """写入一行文字并换行"""
+        if self._line:
+            return self.text(text).feed()
+        # 常见情况：整行文字，直接写入
+        self.data += encode_gbk(text)
+        self.data += CMD_LINE_FEED
+        self.lines.append(text)
+        return self
+
+    def form_feed(self):
+        return self.command(CMD_FORM_FEED)
+
+    def append(self, block):
+        """追加预先生成的固定内容（以换行结束的 EscpBuilder）"""
+        self.data += block.data
+        self.lines.extend(block.lines)
+        return self
+
+    def preview(self):
+        """预览文本"""
+        return '\n'.join(self.lines + ([''.join(self._line)] if self._line else []))
+
+
+def _static_block(build):
+    """固定内容只生成、编码一次"""
+    builder = EscpBuilder()
+    build(builder)
+    return builder
+
+
+# 标题：初始化、居中放大打印“销售单”，之后空一行
+HEADER_BLOCK = _static_block(
+    lambda b: b.init().align(True).double_size(True).text("销售单").double_size(False).feed()
+    .align(False).line_spacing().feed()
+)
+
+# 表头
+TABLE_HEAD_BLOCK = _static_block(
+    lambda b: b.bold(True).line(TABLE.header).bold(False).line(RULE)
+)
+
+# 底部：汇总后空一行，签名栏，之后空两行
+FOOTER_BLOCK = _static_block(
+    lambda b: b.feed().line(RULE).line("服务电话:").text("客户签名: ________________").feed(3)
+)
+
+
+def create_escp_content(job, page=None):
+    """创建ESC/P格式的打印内容，返回 EscpBuilder（data 为打印数据）
+
+    page 为分页后的一页（print_core.pagination.Page），不传时整单打印在一页；
+    多页时每页以走纸结束
+    """
+    order, products, customer = job_fields(job)
+    if page is None:
+        page = next(paginate(products, None))
+
+    builder = EscpBuilder().append(HEADER_BLOCK)
+
+    # 客户信息
+    customer_name = customer.get('name', '')
+    customer_phone = customer.get('phone', '')
+    order_date = format_order_date(order.get('createdAt', ''))
+    order_number = order.get('orderNumber', '')[:20]
+
+    builder.line(f"客户: {customer_name}")
+    builder.line(f"电话: {customer_phone}")
+    builder.line(f"日期: {order_date}")
+    builder.line(f"单号: {order_number}")
+    builder.line(RULE)
+
+    builder.append(TABLE_HEAD_BLOCK)
+
+    # 商品明细
+    total_qty = sum(item.get('quantity', 0) for item in products)
+    # 品名折行多占的行不超过本页剩余的行数
+    spare_lines = PAGE_ROWS - len(page.items)
+    for idx, item in page.rows():
+        fields = item_fields(item)
+        row_lines = TABLE.lines((idx, fields['name'], fields['quantity'], f"{fields['amount']:.2f}"),
+                                max_lines=1 + max(spare_lines, 0))
+        spare_lines -= len(row_lines) - 1
+        for line in row_lines:
+            builder.line(line)
+
+    builder.line(RULE)
+
+    # 多页时每页附本页小计和承前、累计合计
+    if page.count > 1:
+        for group in page.summary():
+            builder.line("  ".join(group))
+
+    # 汇总
+    total_amount = float(order.get('totalAmount', 0))
+    builder.line(f"总数量: {total_qty}")
+    builder.line(f"总金额: ¥{total_amount:.2f}")
+
+    builder.append(FOOTER_BLOCK)
+    if page.count > 1:
+        builder.form_feed()
+
+    return builder
+
+
+class EscpRenderer(Renderer):
+    """ESC/P渲染器"""
+
+    name = "escp"
+    title = "ESC/P直接打印版"
+    version = "3"
+    rows_per_page = PAGE_ROWS
+
+    def render_page(self, job, page):
+        # 排版时逐段编码为GBK，编码阶段即整个生成过程
+        with stage("encode"):
+            builder = create_escp_content(job, page)
+        # 打印数据直接交给输出通道，不再复制
+        return Document(builder.data, text=builder.preview())
+
+    def spool(self, printer_name, document):
+        return spool_raw(printer_name, document, options=['raw', 'media=24x14cm'])
+
+    async def spool_async(self, printer_name, document):
+        return await spool_raw_async(printer_name, document, options=['raw', 'media=24x14cm'])
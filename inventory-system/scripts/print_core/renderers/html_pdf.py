@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+HTML+PDF渲染器
+按HTML模板（print_core/templates/receipt.html，可替换）生成销售单，
+由常驻的转换引擎（weasyprint / wkhtmltopdf）转换为PDF，
+PDF在内存中直接提交给CUPS（lp 标准输入或 IPP）；支持把多张销售单合成一个多页PDF
+"""
+
+from print_core.html_template import get_template
+from print_core.pagination import page_rows
+from print_core.pdf_engine import PdfError, get_engine, html_to_pdf, html_to_pdf_async
+from print_core.renderers.base import Document, Renderer
+from print_core.spool import PRINT_SPOOL, cups_print, cups_print_async, lpr_print, lpr_print_async
+from print_core.tracing import stage
+
+# 直接打印HTML时的 lpr 参数
+HTML_LPR_OPTIONS = ['raw', 'media=22x14cm']
+
+
+def generate_html_content(job, template=None):
+    """生成HTML内容"""
+    return get_template(template).render(job).decode('utf-8')
+
+
+def generate_batch_html(jobs, template=None):
+    """多张销售单合成一个HTML，每张一页"""
+    return get_template(template).render_batch(jobs).decode('utf-8')
+
+
+def lpr_print_html(printer_name, document):
+    """转换PDF失败时直接打印HTML"""
+    if PRINT_SPOOL == "ipp":
+        return cups_print(printer_name, document, options=HTML_LPR_OPTIONS)
+    return lpr_print(printer_name, document, options=HTML_LPR_OPTIONS)
+
+
+async def lpr_print_html_async(printer_name, document):
+    """lpr_print_html 的异步版本"""
+    if PRINT_SPOOL == "ipp":
+        return await cups_print_async(printer_name, document, options=HTML_LPR_OPTIONS)
+    return await lpr_print_async(printer_name, document, options=HTML_LPR_OPTIONS)
+
+
+class HtmlPdfRenderer(Renderer):
+    """HTML+PDF渲染器
+
+    渲染阶段即转换为PDF（结果可缓存）；转换失败时返回HTML文档，提交时直接打印HTML
+
+    Args:
+        template: 模板文件路径，默认按 PRINT_HTML_TEMPLATE
+    """
+
+    name = "html_pdf"
+    title = "HTML+PDF版"
+
+    def __init__(self, template=None):
+        self.template = template
+        # 启动时创建转换引擎，没有使用常驻的 weasyprint 时立即可见
+        try:
+            get_engine()
+        except PdfError as e:
+            print(f"HTML转PDF引擎不可用，将直接打印HTML: {e}")
+
+    def cache_tag(self):
+        # 模板内容变化后缓存键随之变化，不会取到旧模板的渲染结果
+        return f"{super().cache_tag()}:{get_template(self.template).digest}"
+
+    def page_rows(self):
+        # 每页行数由模板决定
+        return page_rows(get_template(self.template).rows_per_page)
+
+    def render(self, job):
+        return self._to_document(get_template(self.template).render(job))
+
+    async def render_async(self, job):
+        # 生成HTML很快，直接在事件循环中执行；转换PDF由事件循环管理 wkhtmltopdf 子进程
+        return await self._to_document_async(get_template(self.template).render(job))
+
+    def render_page(self, job, page):
+        return self._to_document(get_template(self.template).render_page(job, page))
+
+    def render_batch(self, jobs):
+        """多张销售单渲染为一个多页PDF"""
+        return self._to_document(get_template(self.template).render_batch(jobs))
+
+    def _to_document(self, html):
+        try:
+            with stage("encode"):
+                return Document(html_to_pdf(html), suffix='.pdf')
+        except PdfError as e:
+            print(f"转换PDF失败，尝试直接打印HTML: {e}")
+            return Document(html, suffix='.html')
+
+    async def _to_document_async(self, html):
+        try:
+            with stage("encode"):
+                return Document(await html_to_pdf_async(html), suffix='.pdf')
+        except PdfError as e:
+            print(f"转换PDF失败，尝试直接打印HTML: {e}")
+            return Document(html, suffix='.html')
+
+    def cacheable(self, document):
+        return document.suffix == '.pdf'
+
+    def spool(self, printer_name, document):
+        if document.suffix == '.pdf':
+            return cups_print(printer_name, document)
+        return lpr_print_html(printer_name, document)
+
+    async def spool_async(self, printer_name, document):
+        if document.suffix == '.pdf':
+            return await cups_print_async(printer_name, document)
+        return await lpr_print_html_async(printer_name, document)
@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+"""
+图片渲染器
+200 DPI 绘制销售单图片，PNG格式通过CUPS打印；多页订单合成多页PDF；PIL 在首次渲染时才导入。
+设置 PRINT_RASTER_PROCESSES 后在渲染进程池中绘制和编码（不占主进程的GIL），
+进程启动时预先加载字体，只把编码好的PNG/PDF传回主进程。
+销售单只有黑白两色：PRINT_IMAGE_MODE=mono 时直接按1位黑白绘制，输出1位PNG或 CCITT G4 压缩的TIFF，
+CUPS 不必再做彩色转换和抖动，编码时间和提交的数据量都小得多
+"""
+
+import asyncio
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from print_core.common import format_order_date, item_fields, job_fields, number_to_chinese
+from print_core.fonts import get_text_size, load_fonts
+from print_core.layout import Column, PixelTable
+from print_core.pagination import paginate
+from print_core.renderers.base import Document, Renderer
+from print_core.spool import cups_print, cups_print_async
+from print_core.tracing import stage
+
+# 打印分辨率
+DPI = 200
+
+# 渲染进程数，0 表示在渲染线程中绘制
+PRINT_RASTER_PROCESSES = int(os.environ.get("PRINT_RASTER_PROCESSES", "0"))
+
+# 颜色模式：rgb（默认，彩色PNG） | mono（1位黑白）
+PRINT_IMAGE_MODE = os.environ.get("PRINT_IMAGE_MODE", "rgb")
+
+# 黑白模式的单页格式：png（1位PNG） | tiff（CCITT G4）；多页订单均为PDF
+PRINT_IMAGE_FORMAT = os.environ.get("PRINT_IMAGE_FORMAT", "png")
+
+# 颜色模式 -> PIL 图片模式
+IMAGE_MODES = {"rgb": "RGB", "mono": "1"}
+
+# 字号
+FONT_SIZES = {"title": 28, "body": 16, "small": 12}
+
+# 每页商品行数：1102像素高，表头约175、表尾约205、本页小计约90，每行22
+PAGE_ROWS = 28
+
+# 边距
+MARGIN = 50
+
+# 商品表格（像素）：品名超出列宽折行（PRINT_CELL_WRAP=0 时最多12个字），数字右对齐
+TABLE = PixelTable([
+    Column('序号', 40, 'center'),
+    Column('品名', 280, 'left', overflow='wrap', header_align='center', limit=12, max_lines=2),
+    Column('数量', 80, 'right', header_align='center'),
+    Column('单价', 140, 'right', header_align='center'),
+    Column('金额', 180, 'right', header_align='center'),
+], x=MARGIN + 5, padding=5)
+
+# lp 打印参数
+LP_OPTIONS = ['media=24x14cm', 'fit-to-page', 'print-quality=5']
+
+
+def draw_text_centered(draw, text, x, y, font, color, img_width, max_width=None):
+    """绘制居中文字"""
+    text_width, text_height = get_text_size(draw, text, font)
+    if max_width is None:
+        max_width = img_width - x - 40
+    text_x = x + (max_width - text_width) // 2
+    draw.text((int(text_x), int(y)), text, fill=color, font=font)
+
+
+def create_print_image(job, page=None, mode="rgb"):
+    """创建打印图片
+
+    page 为分页后的一页（print_core.pagination.Page），不传时整单画在一页；
+    mode 为 mono 时按1位黑白绘制（文字不做抗锯齿）
+    """
+    from PIL import Image, ImageDraw
+
+    order, products, customer = job_fields(job)
+    if page is None:
+        page = next(paginate(products, None))
+
+    # 提高DPI到200，解决模糊问题
+    dpi = DPI
+    img_width = int(24 * dpi / 2.54)  # 约1890像素
+    img_height = int(14 * dpi / 2.54)   # 约1102像素
+
+    img = Image.new(IMAGE_MODES[mode], (img_width, img_height), 'white')
+    draw = ImageDraw.Draw(img)
+
+    # 加载字体 - 使用较小字号
+    fonts = load_fonts(FONT_SIZES)
+    title_font = fonts["title"]
+    body_font = fonts["body"]
+    small_font = fonts["small"]
+
+    black = 'black'
+
+    # 边距
+    margin = MARGIN
+    line_height = 22
+
+    y = margin
+
+    # 标题
+    title_text = "销售单"
+    title_width, title_height = get_text_size(draw, title_text, title_font)
+    title_x = (img_width - title_width) // 2
+    draw.text((int(title_x), int(y)), title_text, fill=black, font=title_font)
+    y += line_height * 2
+
+    # 客户信息
+    customer_name = customer.get('name', '')
+    customer_phone = customer.get('phone', '')
+    order_date = format_order_date(order.get('createdAt', ''))
+    order_number = order.get('orderNumber', '')[:20]
+
+    # 左对齐绘制
+    draw.text((margin, int(y)), "客户: " + customer_name, fill=black, font=body_font)
+
+    date_text = "日期: " + order_date
+    date_width, _ = get_text_size(draw, date_text, body_font)
+    draw.text((int(img_width - margin - date_width), int(y)), date_text, fill=black, font=body_font)
+    y += line_height
+
+    draw.text((margin, int(y)), "电话: " + customer_phone, fill=black, font=body_font)
+
+    order_text = "单号: " + order_number
+    order_width, _ = get_text_size(draw, order_text, body_font)
+    draw.text((int(img_width - margin - order_width), int(y)), order_text, fill=black, font=body_font)
+    y += line_height
+
+    # 实线分隔 - 解决虚线问题
+    draw.line([(margin, int(y)), (img_width - margin, int(y))], fill=black, width=2)
+    y += 8
+
+    # 表格
+    TABLE.draw_header(draw, y, body_font, black)
+    y += line_height
+
+    # 表头分隔线
+    draw.line([(margin, int(y)), (img_width - margin, int(y))], fill=black, width=2)
+    y += 5
+
+    # 商品明细
+    total_qty = sum(item.get('quantity', 0) for item in products)
+    # 品名折行多占的行不超过本页剩余的行数，表尾不会超出纸张
+    spare_lines = PAGE_ROWS - len(page.items)
+    for idx, item in page.rows():
+        fields = item_fields(item)
+        row_lines = TABLE.draw_row(draw, y, (idx, fields['name'], fields['quantity'], f"{fields['price']:.2f}",
+                                             f"{fields['amount']:.2f}"), body_font, black,
+                                   line_height=line_height, max_lines=1 + max(spare_lines, 0))
+        spare_lines -= row_lines - 1
+
+        y += line_height * row_lines
+
+        # 每行分隔线 - 实线
+        draw.line([(margin, int(y)), (img_width - margin, int(y))], fill=black, width=1)
+
+    y += 8
+
+    # 多页时每页附本页小计和承前、累计合计
+    if page.count > 1:
+        for group in page.summary():
+            draw.text((margin, int(y)), "    ".join(group), fill=black, font=body_font)
+            y += line_height
+
+    # 汇总
+    draw.line([(margin, int(y)), (img_width - margin, int(y))], fill=black, width=2)
+    y += 15
+
+    total_amount = float(order.get('totalAmount', 0))
+
+    draw.text((margin, int(y)), f"总数量: {total_qty}", fill=black, font=body_font)
+    y += line_height
+
+    draw.text((margin, int(y)), f"总金额: ¥{total_amount:.2f}", fill=black, font=body_font)
+    y += line_height
+
+    chinese_amount = number_to_chinese(total_amount)
+    draw.text((margin, int(y)), f"大写: {chinese_amount}", fill=black, font=body_font)
+    y += line_height * 2
+
+    # 分隔线
+    draw.line([(margin, int(y)), (img_width - margin, int(y))], fill=black, width=2)
+    y += 20
+
+    # 底部
+    draw.text((margin, int(y)), "服务电话:", fill=black, font=body_font)
+
+    sign_x = img_width - margin - 200
+    draw.text((int(sign_x), int(y)), "客户签名:", fill=black, font=body_font)
+    y += line_height
+    draw.line([(int(sign_x), int(y)), (img_width - margin, int(y))], fill=black, width=1)
+    y += 25
+
+    # 备注
+    draw.line([(margin, int(y)), (img_width - margin, int(y))], fill=black, width=1)
+    y += 10
+    draw.text((margin, int(y)), "备注: 货物当面点清，过后概不负责。", fill=black, font=small_font)
+
+    return img
+
+
+def image_to_png(img):
+    """图片编码为PNG - 保持清晰度"""
+    buffer = io.BytesIO()
+    img.save(buffer, 'PNG', dpi=(DPI, DPI))
+    return buffer.getvalue()
+
+
+def image_to_tiff(img):
+    """1位黑白图片编码为 CCITT G4 压缩的TIFF"""
+    buffer = io.BytesIO()
+    img.save(buffer, 'TIFF', compression='group4', dpi=(DPI, DPI))
+    return buffer.getvalue()
+
+
+def encode_image(img, image_format):
+    """单页图片编码，返回 (数据, 扩展名)；TIFF 只用于1位黑白图片"""
+    if image_format == 'tiff' and img.mode == '1':
+        return image_to_tiff(img), '.tiff'
+    return image_to_png(img), '.png'
+
+
+def images_to_pdf(images):
+    """多页图片合成一个PDF（PNG不能多页）"""
+    buffer = io.BytesIO()
+    images[0].save(buffer, 'PDF', resolution=DPI, save_all=True, append_images=images[1:])
+    return buffer.getvalue()
+
+
+def rasterize(job, rows_per_page, mode="rgb", image_format="png"):
+    """整单绘制并编码，返回 (数据, 扩展名)：单页为PNG（或TIFF），多页为PDF"""
+    pages = paginate(job_fields(job)[1], rows_per_page)
+    images = [create_print_image(job, page, mode) for page in pages]
+    with stage("encode"):
+        if len(images) == 1:
+            return encode_image(images[0], image_format)
+        return images_to_pdf(images), '.pdf'
+
+
+def rasterize_page(job, page, mode="rgb", image_format="png"):
+    """绘制一页并编码，返回 (数据, 扩展名)"""
+    image = create_print_image(job, page, mode)
+    with stage("encode"):
+        return encode_image(image, image_format)
+
+
+def init_raster_process():
+    """渲染进程初始化：导入PIL、加载字体，第一个任务不必等待"""
+    import PIL.Image  # noqa: F401
+    load_fonts(FONT_SIZES)
+
+
+class RasterPool:
+    """渲染进程池
+
+    使用 spawn 启动进程（打印服务主进程有多个线程，fork 不安全）；
+    渲染进程异常退出时重建进程池，当前任务记为失败
+
+    Args:
+        processes: 进程数
+    """
+
+    def __init__(self, processes):
+        self.processes = processes
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=init_raster_process
+                )
+            return self._executor
+
+    def _reset(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def run(self, func, *args):
+        """在渲染进程中执行 func(*args)，返回结果"""
+        executor = self._get_executor()
+        try:
+            return executor.submit(func, *args).result()
+        except BrokenProcessPool:
+            self._reset(executor)
+            raise RuntimeError("渲染进程异常退出")
+
+    async def run_async(self, func, *args):
+        """run 的异步版本：等待结果不占用线程"""
+        executor = self._get_executor()
+        try:
+            return await asyncio.wrap_future(executor.submit(func, *args))
+        except BrokenProcessPool:
+            self._reset(executor)
+            raise RuntimeError("渲染进程异常退出")
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ImageRenderer(Renderer):
+    """图片渲染器
+
+    Args:
+        processes: 渲染进程数，默认按 PRINT_RASTER_PROCESSES，0 表示在渲染线程中绘制
+        mode: 颜色模式 rgb | mono，默认按 PRINT_IMAGE_MODE
+        image_format: 黑白模式的单页格式 png | tiff，默认按 PRINT_IMAGE_FORMAT
+    """
+
+    name = "image"
+    title = "图片版 v2"
+    version = "2"
+    rows_per_page = PAGE_ROWS
+
+    def __init__(self, processes=None, mode=None, image_format=None):
+        processes = PRINT_RASTER_PROCESSES if processes is None else processes
+        self.pool = RasterPool(processes) if processes > 0 else None
+        self.mode = mode or PRINT_IMAGE_MODE
+        if self.mode not in IMAGE_MODES:
+            raise ValueError(f"未知的颜色模式: {self.mode}，可选: {', '.join(IMAGE_MODES)}")
+        self.image_format = image_format or PRINT_IMAGE_FORMAT
+
+    def cache_tag(self):
+        return f"{super().cache_tag()}:{self.mode}:{self.image_format}"
+
+    def render(self, job):
+        args = (job, self.page_rows(), self.mode, self.image_format)
+        if self.pool is None:
+            data, suffix = rasterize(*args)
+        else:
+            data, suffix = self.pool.run(rasterize, *args)
+        return Document(data, suffix=suffix)
+
+    async def render_async(self, job):
+        if self.pool is None:
+            return await super().render_async(job)
+        data, suffix = await self.pool.run_async(rasterize, job, self.page_rows(), self.mode, self.image_format)
+        return Document(data, suffix=suffix)
+
+    def render_page(self, job, page):
+        args = (job, page, self.mode, self.image_format)
+        if self.pool is None:
+            data, suffix = rasterize_page(*args)
+        else:
+            data, suffix = self.pool.run(rasterize_page, *args)
+        return Document(data, suffix=suffix)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+
+    def spool(self, printer_name, document):
+        return cups_print(printer_name, document, options=LP_OPTIONS, timeout=60)
+
+    async def spool_async(self, printer_name, document):
+        return await cups_print_async(printer_name, document, options=LP_OPTIONS, timeout=60)
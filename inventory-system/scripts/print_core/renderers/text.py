@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+纯文本表格渲染器
+90字符宽度固定表格，GBK编码通过CUPS raw 模式发送到针式打印机
+"""
+
+from print_core.common import encode_gbk, item_fields, job_fields, parse_order_datetime
+from print_core.layout import Column, TextTable
+from print_core.pagination import paginate
+from print_core.renderers.base import Document, Renderer, spool_raw, spool_raw_async
+from print_core.tracing import stage
+
+# 每页商品行数（与补足空行的行数一致，即一张表格的容量）
+PAGE_ROWS = 10
+
+# 商品表格 - 只保留左右竖线 (序号6+名称22+数量18+规格10+单价14+金额18=88)
+# 数量和单位合并为一列，格式：数量+单位
+TABLE = TextTable([
+    Column('序号', 6, 'center'),
+    Column('商品名称', 22, 'center', overflow='wrap', max_lines=3),
+    Column('数量', 18, 'center'),
+    Column('规格', 10, 'center', overflow='wrap', max_lines=2),
+    Column('单价', 14, 'center'),
+    Column('金额', 18, 'center'),
+])
+
+# 90字符宽度
+PAGE_WIDTH = TABLE.width
+PAGE_RULE = "-" * PAGE_WIDTH
+# 商品之间的虚线分割
+ROW_RULE = TABLE.rule('-')
+
+
+def left_text(text, width):
+    """左对齐文本，超出宽度时截断并以 .. 结尾"""
+    text = str(text)
+    if len(text) > width:
+        return text[:width-2] + '..'
+    return text + ' ' * (width - len(text))
+
+
+def create_print_content(job, page=None):
+    """创建纯文本打印内容 - 90字符宽度，适合针式打印机
+
+    page 为分页后的一页（print_core.pagination.Page），不传时整单打印在一页
+    """
+    order, products, customer = job_fields(job)
+    if page is None:
+        page = next(paginate(products, None))
+
+    lines = []
+
+    # ========== 标题区域 ==========
+    lines.append("                                           利 发 副 食")
+    lines.append(PAGE_RULE)
+
+    # ========== 订单信息 ==========
+    order_date = ''
+    order_time = ''
+    # 转换为本地时间 (UTC+8)
+    dt = parse_order_datetime(order.get('createdAt', ''), utc_offset_hours=8)
+    if dt:
+        order_date = dt.strftime('%Y-%m-%d')
+        order_time = dt.strftime('%H:%M:%S')
+
+    order_number = order.get('orderNumber', '')
+    # 单号信息行 - 90字符宽度：|单号: xxx        日期: xxx         时间: xxx        |
+    lines.append(f"|单号: {order_number:<48}日  期: {order_date}时  间: {order_time}|")
+    lines.append(PAGE_RULE)
+    lines.append(f"|客户名称: {customer.get('name', ''):<74}|")
+    lines.append(f"|联系电话: {customer.get('phone', ''):<78}|")
+    lines.append(PAGE_RULE)
+
+    lines.append(TABLE.header)
+    lines.append(PAGE_RULE)
+
+    # ========== 商品明细 ==========
+    total_items = len(products)  # 商品种类数
+    total_amount = 0.0
+    for item in products:
+        total_amount += float(item.get('totalAmount', 0))
+
+    # 商品名、规格过长时折行，多占的行从补足的空行中扣除，表格总高度不变
+    spare_lines = PAGE_ROWS - len(page.items)
+    for idx, item in page.rows():
+        fields = item_fields(item)
+        unit = fields['unit'][:3]
+        specification = fields['specification']
+
+        name = fields['name']
+        qty = fields['quantity']
+        price = fields['price']
+        amount = fields['amount']
+
+        # 数量和单位合并显示
+        qty_with_unit = f"{qty}{unit}"
+
+        row_lines = TABLE.lines((idx, name, qty_with_unit, specification, f'{price:.2f}', f'{amount:.2f}'),
+                                max_lines=1 + max(spare_lines, 0))
+        spare_lines -= len(row_lines) - 1
+        lines.extend(row_lines)
+        lines.append(ROW_RULE)
+
+    # 如果商品数据少于10行，补充空行至10行
+    lines.extend([TABLE.blank] * max(0, spare_lines))
+
+    lines.append(PAGE_RULE)
+    lines.append(TABLE.row(('', '', '合计', '', f'{total_items}种', f'{total_amount:.2f}')))
+    lines.append(PAGE_RULE)
+
+    # 多页时每页附本页小计和承前、累计合计
+    if page.count > 1:
+        for group in page.summary():
+            lines.append(TABLE.span('    '.join(group)))
+        lines.append(PAGE_RULE)
+    lines.append("")
+    lines.append(f"{left_text('服务电话: 15820159623', 60)}客户签名: ________________")
+    lines.append("")
+    lines.append("")
+
+    # 走纸
+    lines.append("\n\n\n")
+
+    # 合并所有行
+    content = '\n'.join(lines)
+    return content
+
+
+class TextRenderer(Renderer):
+    """纯文本表格渲染器"""
+
+    name = "text"
+    title = "纯文本表格版"
+    version = "3"
+    rows_per_page = PAGE_ROWS
+
+    def render_page(self, job, page):
+        content = create_print_content(job, page)
+        # Form Feed 走纸
+        with stage("encode"):
+            data = encode_gbk(content) + b'\x0c'
+        return Document(data, text=content)
+
+    def spool(self, printer_name, document):
+        return spool_raw(printer_name, document, options=['raw', 'media=24x14cm'])
+
+    async def spool_async(self, printer_name, document):
+        return await spool_raw_async(printer_name, document, options=['raw', 'media=24x14cm'])
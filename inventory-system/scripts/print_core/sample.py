@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+示例打印任务，用于 --test 预览和性能测试
+"""
+
+SAMPLE_JOB = {
+    "id": 0,
+    "order": {
+        "orderNumber": "SO202401010001",
+        "createdAt": "2024-01-01T10:30:00Z",
+        "totalAmount": 1234.56,
+        "customer": {
+            "name": "测试客户",
+            "phone": "13800138000"
+        },
+        "products": [
+            {
+                "product": {"name": "苹果醋"},
+                "quantity": 10.5,
+                "price": 5.50,
+                "unitName": "斤",
+                "totalAmount": 57.75,
+                "remark": "新鲜"
+            },
+            {
+                "product": {"name": "香蕉"},
+                "quantity": 20,
+                "price": 3.00,
+                "unitName": "斤",
+                "totalAmount": 60.00,
+                "remark": ""
+            },
+            {
+                "product": {"name": "橙子"},
+                "quantity": 15.5,
+                "price": 4.50,
+                "unitName": "斤",
+                "totalAmount": 69.75,
+                "remark": "甜"
+            }
+        ]
+    }
+}
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+打印输出通道
+打印机原生数据（纯文本、ESC/P）可以不经CUPS，直接写入网络打印机的 9100 端口（JetDirect/RAW）：
+连接按打印机保持、使用前检查是否仍然可用，按块写入、打印机缓冲区满时等待（超时即失败）；
+找不到网络地址或连接失败时回退到CUPS
+"""
+
+import os
+import re
+import select
+import socket
+import threading
+import time
+
+from print_core.spool import default_printer, lpstat
+
+# 输出通道：cups（默认，全部经CUPS） | socket（原生数据直连 9100 端口，失败时回退CUPS）
+PRINT_SINK = os.environ.get("PRINT_SINK", "cups")
+
+# 打印机网络地址，格式 "打印机名=主机[:端口],..."；未配置的打印机从 lpstat -v 的 socket:// 地址获取
+PRINT_SOCKET_PRINTERS = os.environ.get("PRINT_SOCKET_PRINTERS", "")
+
+# 连接超时、单次写入超时（秒）
+PRINT_SOCKET_TIMEOUT = float(os.environ.get("PRINT_SOCKET_TIMEOUT", "10"))
+
+# 空闲超过该时间（秒）的连接关闭重连，打印机通常会断开长时间空闲的连接
+PRINT_SOCKET_IDLE = float(os.environ.get("PRINT_SOCKET_IDLE", "60"))
+
+RAW_PORT = 9100
+
+# 每次写入的块大小
+CHUNK_SIZE = 64 * 1024
+
+# lpstat 查询结果缓存时间（秒）
+LOOKUP_TTL = 300
+
+DEVICE_PATTERN = re.compile(r'socket://\[?([^\s\]/:]+)\]?(?::(\d+))?')
+
+
+class SendError(Exception):
+    """写入打印机失败
+
+    Args:
+        sent: 失败前已写入的字节数，为0时可以安全地改用CUPS重新提交
+    """
+
+    def __init__(self, message, sent=0):
+        super().__init__(message)
+        self.sent = sent
+
+
+def parse_address(text):
+    """解析 "主机[:端口]" 或 socket:// 地址"""
+    text = text.strip()
+    match = DEVICE_PATTERN.match(text)
+    if match:
+        return match.group(1), int(match.group(2) or RAW_PORT)
+    host, _, port = text.rpartition(':') if text.count(':') == 1 else (text, '', '')
+    return host, int(port or RAW_PORT)
+
+
+def parse_printer_map(text):
+    """解析 PRINT_SOCKET_PRINTERS"""
+    printers = {}
+    for entry in text.split(','):
+        name, sep, address = entry.partition('=')
+        if sep and name.strip() and address.strip():
+            printers[name.strip()] = parse_address(address)
+    return printers
+
+
+class SocketConnection:
+    """到一台打印机的TCP连接"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.sock = None
+        self.last_used = 0
+        self.lock = threading.Lock()
+
+    def connect(self):
+        self.close()
+        sock = socket.create_connection((self.host, self.port), timeout=PRINT_SOCKET_TIMEOUT)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock = sock
+        self.last_used = time.monotonic()
+
+    def healthy(self):
+        """连接是否仍然可用：未空闲过久，且对端没有关闭（可读且读到0字节即已关闭）"""
+        if self.sock is None or time.monotonic() - self.last_used > PRINT_SOCKET_IDLE:
+            return False
+        try:
+            readable, _, _ = select.select([self.sock], [], [], 0)
+            if readable:
+                # 打印机偶尔回传状态数据，读掉即可；读到空表示连接已关闭
+                return bool(self.sock.recv(4096))
+            return True
+        except OSError:
+            return False
+
+    def send(self, data):
+        """按块写入；打印机缓冲区满时 send 阻塞等待，超时视为失败
+
+        用 send 而不是 sendall：sendall 中途失败时不知道已经写出多少，
+        send 每次返回实际写入内核的字节数，失败时 sent 为0才说明这个任务一个字节都没发出
+        """
+        view = memoryview(data)
+        sent = 0
+        try:
+            while sent < len(view):
+                sent += self.sock.send(view[sent:sent + CHUNK_SIZE])
+        except OSError as e:
+            self.close()
+            raise SendError(f"写入 {self.host}:{self.port} 失败: {e}", sent)
+        self.last_used = time.monotonic()
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+
+class SocketPool:
+    """按 (主机, 端口) 复用的打印机连接；同一台打印机同一时间只有一个任务在写"""
+
+    def __init__(self):
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    def _connection(self, host, port):
+        with self._lock:
+            connection = self._connections.get((host, port))
+            if connection is None:
+                connection = SocketConnection(host, port)
+                self._connections[(host, port)] = connection
+            return connection
+
+    def send(self, host, port, data):
+        """写入数据；复用的连接已失效且未写出数据时重连一次"""
+        connection = self._connection(host, port)
+        with connection.lock:
+            reused = connection.healthy()
+            if not reused:
+                try:
+                    connection.connect()
+                except OSError as e:
+                    raise SendError(f"连接 {host}:{port} 失败: {e}")
+            try:
+                connection.send(data)
+            except SendError as e:
+                if not reused or e.sent:
+                    raise
+                try:
+                    connection.connect()
+                except OSError as e:
+                    raise SendError(f"连接 {host}:{port} 失败: {e}")
+                connection.send(data)
+
+    def close(self):
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for connection in connections:
+            with connection.lock:
+                connection.close()
+
+
+class CupsSink:
+    """全部经CUPS提交"""
+
+    name = "cups"
+
+    def spool(self, printer_name, document, cups):
+        return cups()
+
+    def close(self):
+        pass
+
+
+class SocketSink:
+    """原生数据直连网络打印机，找不到地址或连接失败时回退CUPS
+
+    Args:
+        printers: 打印机名 -> (主机, 端口)，默认按 PRINT_SOCKET_PRINTERS
+    """
+
+    name = "socket"
+
+    def __init__(self, printers=None):
+        self.printers = parse_printer_map(PRINT_SOCKET_PRINTERS) if printers is None else printers
+        self.pool = SocketPool()
+        self._lookups = {}
+
+    def resolve(self, printer_name):
+        """打印机的网络地址，不是 socket:// 打印机时返回 None"""
+        if printer_name in self.printers:
+            return self.printers[printer_name]
+
+        cached = self._lookups.get(printer_name)
+        if cached and time.monotonic() - cached[0] < LOOKUP_TTL:
+            return cached[1]
+
+        name = printer_name
+        if not name or name == 'default':
+            name = default_printer()
+        address = None
+        if name:
+            match = DEVICE_PATTERN.search(lpstat('-v', name))
+            if match:
+                address = (match.group(1), int(match.group(2) or RAW_PORT))
+        self._lookups[printer_name] = (time.monotonic(), address)
+        return address
+
+    def spool(self, printer_name, document, cups):
+        """写入打印机，返回 (success, 打印作业ID, 错误信息)；cups() 为回退的CUPS提交"""
+        address = self.resolve(printer_name)
+        if address is None:
+            return cups()
+
+        host, port = address
+        try:
+            self.pool.send(host, port, document.data)
+        except SendError as e:
+            if e.sent:
+                # 已经写出部分数据，改用CUPS会重复打印
+                return False, None, str(e)
+            print(f"直连打印机失败，改用CUPS: {e}")
+            return cups()
+        return True, f"socket://{host}:{port}", None
+
+    def close(self):
+        self.pool.close()
+
+
+SINKS = {
+    "cups": CupsSink,
+    "socket": SocketSink,
+}
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def get_sink():
+    """进程内共用的输出通道（首次使用时按 PRINT_SINK 创建）"""
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            if PRINT_SINK not in SINKS:
+                raise ValueError(f"未知的输出通道: {PRINT_SINK}，可选: {', '.join(SINKS)}")
+            _sink = SINKS[PRINT_SINK]()
+        return _sink
+
+
+def close_sink():
+    """关闭输出通道的连接"""
+    global _sink
+    with _sink_lock:
+        if _sink is not None:
+            _sink.close()
+            _sink = None
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+提交到CUPS
+文档数据始终在内存中：lp / lpr 经标准输入接收数据，或经 IPP 直接 POST 到 CUPS，不写临时文件；
+*_async 版本供异步打印服务使用，子进程由事件循环管理，超时或取消时结束子进程
+"""
+
+import asyncio
+import os
+import re
+import signal
+import subprocess
+
+from print_core import tracing
+from print_core.ipp import IppError, print_job
+
+# 提交方式：lp（默认，经标准输入交给 lp） | ipp（IPP 直接提交，不启动子进程）
+PRINT_SPOOL = os.environ.get("PRINT_SPOOL", "lp")
+
+# IPP 打印机地址，{printer} 替换为打印机名
+PRINT_IPP_URI = os.environ.get("PRINT_IPP_URI", "ipp://localhost:631/printers/{printer}")
+
+# 文档类型 -> IPP document-format
+DOCUMENT_FORMATS = {
+    '.pdf': 'application/pdf',
+    '.png': 'image/png',
+    '.tiff': 'image/tiff',
+    '.html': 'text/html',
+    '.txt': 'text/plain',
+}
+
+
+def lpstat(*args):
+    """执行 lpstat，失败时返回空字符串"""
+    try:
+        result = subprocess.run(['lpstat', *args], stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return ''
+    return result.stdout.decode('utf-8', errors='replace') if result.returncode == 0 else ''
+
+
+def default_printer():
+    """系统默认打印机名，查询失败时返回 None"""
+    match = re.search(r':\s*(\S+)', lpstat('-d'))
+    return match.group(1) if match else None
+
+
+def run_spooler(cmd, data, timeout):
+    """执行 lp / lpr，数据经标准输入传入，返回 (success, 输出, 错误信息)"""
+    try:
+        result = subprocess.run(
+            cmd, input=data,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout
+        )
+    except subprocess.TimeoutExpired:
+        return False, None, "打印超时"
+    except Exception as e:
+        return False, None, str(e)
+
+    if result.returncode == 0:
+        return True, result.stdout.decode('utf-8', errors='replace').strip(), None
+    else:
+        return False, None, result.stderr.decode('utf-8', errors='replace').strip()
+
+
+async def run_process(cmd, data, timeout):
+    """异步执行子进程，数据经标准输入传入，返回 (returncode, stdout, stderr)
+
+    超时抛出 asyncio.TimeoutError；超时或被取消时结束整个进程组（包括子进程启动的进程），
+    不留下占着管道的进程
+    """
+    process = await asyncio.create_subprocess_exec(
+        *cmd, stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        start_new_session=True
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(data), timeout)
+    except BaseException:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        await asyncio.shield(process.wait())
+        raise
+    return process.returncode, stdout, stderr
+
+
+async def run_spooler_async(cmd, data, timeout):
+    """run_spooler 的异步版本"""
+    try:
+        returncode, stdout, stderr = await run_process(cmd, data, timeout)
+    except asyncio.TimeoutError:
+        return False, None, "打印超时"
+    except OSError as e:
+        return False, None, str(e)
+
+    if returncode == 0:
+        return True, stdout.decode('utf-8', errors='replace').strip(), None
+    else:
+        return False, None, stderr.decode('utf-8', errors='replace').strip()
+
+
+def lp_command(printer_name, options=()):
+    """lp 命令参数，打印机为空或 default 时使用系统默认打印机"""
+    cmd = ['lp']
+    if printer_name and printer_name != 'default':
+        cmd += ['-d', printer_name]
+    for option in options:
+        cmd += ['-o', option]
+    return cmd
+
+
+def lp_print(printer_name, document, options=(), timeout=30):
+    """经标准输入把文档交给 lp"""
+    return run_spooler(lp_command(printer_name, options), document.data, timeout)
+
+
+def lpr_command(printer_name, options=()):
+    """lpr 命令参数"""
+    cmd = ['lpr']
+    if printer_name and printer_name != 'default':
+        cmd += ['-P', printer_name]
+    for option in options:
+        cmd += ['-o', option]
+    return cmd
+
+
+def lpr_print(printer_name, document, options=(), timeout=30):
+    """经标准输入把文档交给 lpr"""
+    success, _, error = run_spooler(lpr_command(printer_name, options), document.data, timeout)
+    # lpr 不输出任务号
+    return success, "lpr" if success else None, error
+
+
+def ipp_print(printer_name, document, options=(), timeout=30):
+    """经 IPP 提交到CUPS"""
+    if not printer_name or printer_name == 'default':
+        printer_name = default_printer() or 'default'
+    uri = PRINT_IPP_URI.format(printer=printer_name)
+    document_format = DOCUMENT_FORMATS.get(document.suffix, 'application/octet-stream')
+    if 'raw' in options:
+        document_format = 'application/vnd.cups-raw'
+        options = [option for option in options if option != 'raw']
+    try:
+        job_id = print_job(uri, document.data, document_format, options=options, timeout=timeout)
+    except IppError as e:
+        return False, None, str(e)
+    return True, f"{printer_name}-{job_id}", None
+
+
+def _spool_span(document):
+    """提交到CUPS的 span，结束前由调用方设置打印作业ID"""
+    return tracing.span("cups_print", **{"print.spool": PRINT_SPOOL, "print.document.bytes": len(document.data)})
+
+
+def _spooled(span, result):
+    """记录提交结果到 span，原样返回结果"""
+    success, spool_id, error = result
+    span.set("cups.job.id", spool_id)
+    if not success:
+        span.fail(error)
+    return result
+
+
+def cups_print(printer_name, document, options=(), timeout=30):
+    """按 PRINT_SPOOL 提交到CUPS，返回 (success, 打印作业ID, 错误信息)"""
+    with _spool_span(document) as span:
+        if PRINT_SPOOL == "ipp":
+            return _spooled(span, ipp_print(printer_name, document, options=options, timeout=timeout))
+        return _spooled(span, lp_print(printer_name, document, options=options, timeout=timeout))
+
+
+async def lpr_print_async(printer_name, document, options=(), timeout=30):
+    """lpr_print 的异步版本"""
+    success, _, error = await run_spooler_async(lpr_command(printer_name, options), document.data, timeout)
+    return success, "lpr" if success else None, error
+
+
+async def cups_print_async(printer_name, document, options=(), timeout=30):
+    """cups_print 的异步版本：lp 子进程由事件循环管理，IPP 在线程中提交"""
+    with _spool_span(document) as span:
+        if PRINT_SPOOL == "ipp":
+            return _spooled(span, await asyncio.to_thread(ipp_print, printer_name, document, options=options, timeout=timeout))
+        cmd = lp_command(printer_name, options)
+        return _spooled(span, await run_spooler_async(cmd, document.data, timeout))
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+文本显示宽度（等宽打印）
+全角(F)、宽字符(W)为2，组合字符、零宽字符为0；模糊宽度(A)的字符（× ① — “ ” 等）
+在GBK中占两个字节，针式打印机按全角打印，也记为2。
+纯ASCII文本直接按长度计算；GBK能编码的文本，编码后的字节数即显示宽度，截断也按字节进行
+（在C中完成，不需要宽度表）；其余文本（韩文、表情、CJK扩展B等）和折行按字符查宽度表：
+BMP 和第一辅助平面按 unicodedata.east_asian_width 生成一个字节一项的表（128KB，进程内只生成一次），
+第二、三平面（CJK 扩展B及以后）按范围判断为宽字符。这类文本截断时一次求出宽度前缀和，
+用 bisect 找到截断位置；单元格排版结果按 (文本, 宽度, 对齐) 缓存。
+wrap_text 按显示宽度折行：中文在任意两字之间断开（不加连字符），英文单词尽量在空格处断开，
+行首不出现逗号、句号、右括号等标点；折行结果按参数缓存，常用商品名在进程内只折行一次
+"""
+
+import bisect
+import itertools
+import unicodedata
+from functools import lru_cache
+
+# 宽度表覆盖的范围：BMP 和第一辅助平面逐个查询，第二、三平面（CJK 扩展B及以后）均为宽字符
+LOOKUP_END = 0x20000
+WIDE_PLANES = (0x20000, 0x40000)
+
+# 宽度表之外的第一个字符
+LOOKUP_END_CHAR = chr(LOOKUP_END)
+
+# 含非ASCII字符的单元格排版结果缓存条数
+PAD_CACHE_SIZE = 8192
+
+# 折行结果缓存条数
+WRAP_CACHE_SIZE = 4096
+
+# 不能出现在行首的标点（折行时连同前一个字符一起移到下一行），不加连字符
+NO_BREAK_BEFORE = frozenset('，。、；：？！）」』】》〕〉”’…—％,.;:?!)]}%')
+
+# 宽度为0的字符类别：非间距组合符、封闭组合符、格式字符（零宽空格、零宽连接符等）
+ZERO_WIDTH_CATEGORIES = frozenset(['Mn', 'Me', 'Cf'])
+
+
+def char_width(char):
+    """单个字符的显示宽度"""
+    category = unicodedata.category(char)
+    if category in ZERO_WIDTH_CATEGORIES:
+        return 0
+    east_asian = unicodedata.east_asian_width(char)
+    if east_asian in ('W', 'F'):
+        return 2
+    if east_asian == 'A':
+        try:
+            return 2 if len(char.encode('gbk')) == 2 else 1
+        except UnicodeEncodeError:
+            return 1
+    return 1
+
+
+@lru_cache(maxsize=None)
+def width_table():
+    """BMP 和第一辅助平面每个码位的宽度（bytearray，128KB）"""
+    return bytearray(map(char_width, map(chr, range(LOOKUP_END))))
+
+
+def code_width(codepoint):
+    """码位的显示宽度，宽度表之外的码位按范围判断"""
+    if codepoint < LOOKUP_END:
+        return width_table()[codepoint]
+    start, end = WIDE_PLANES
+    if start <= codepoint < end:
+        return 2
+    return char_width(chr(codepoint))
+
+
+def char_widths(text):
+    """文本中每个字符的显示宽度（迭代器）"""
+    if not text or max(text) < LOOKUP_END_CHAR:
+        return map(width_table().__getitem__, map(ord, text))
+    return map(code_width, map(ord, text))
+
+
+def _wide_width(text):
+    """含非ASCII字符的文本宽度：GBK编码后的字节数与显示宽度一致，不能编码时逐字查表"""
+    try:
+        return len(text.encode('gbk'))
+    except UnicodeEncodeError:
+        return sum(char_widths(text))
+
+
+def display_width(text):
+    """文本的显示宽度"""
+    text = str(text)
+    if text.isascii():
+        return len(text)
+    return _wide_width(text)
+
+
+def truncate(text, width):
+    """截断到不超过 width 的显示宽度，返回 (截断后的文本, 其显示宽度)"""
+    # 每个字符至少占1（零宽字符除外），只需看前 width 个字符之后的少量字符
+    head = text[:width * 2]
+    try:
+        return _truncate_gbk(head.encode('gbk'), width)
+    except UnicodeEncodeError:
+        pass
+    prefix = list(itertools.accumulate(char_widths(head)))
+    end = bisect.bisect_right(prefix, width)
+    return head[:end], prefix[end - 1] if end else 0
+
+
+def _truncate_gbk(data, width):
+    """按GBK编码截断（字节数即宽度）：取前 width 个字节，截在双字节字符中间时，
+    末尾半个字符解码为 U+FFFD（能用GBK编码的原文不会含有 U+FFFD），去掉即可"""
+    data = data[:width]
+    head = data.decode('gbk', errors='replace')
+    if head.endswith('\ufffd'):
+        return head[:-1], len(data) - 1
+    return head, len(data)
+
+
+def pad_text(text, width, align='left'):
+    """填充文本到指定显示宽度，超出时截断（截断后仍补足宽度，不会错列）
+
+    align: 'left' | 'right' | 'center'
+    """
+    text = str(text)
+    if text.isascii():
+        if len(text) > width:
+            text = text[:width]
+        return _pad(text, width - len(text), align)
+    return _pad_wide(text, width, align)
+
+
+@lru_cache(maxsize=PAD_CACHE_SIZE)
+def _pad_wide(text, width, align):
+    """含非ASCII字符的文本（商品名、单位、规格在各订单间大量重复，按参数缓存）"""
+    try:
+        data = text.encode('gbk')
+    except UnicodeEncodeError:
+        current_width = sum(char_widths(text))
+        if current_width > width:
+            text, current_width = truncate(text, width)
+    else:
+        current_width = len(data)
+        if current_width > width:
+            text, current_width = _truncate_gbk(data, width)
+    return _pad(text, width - current_width, align)
+
+
+def _pad(text, padding, align):
+    if padding <= 0:
+        return text
+    if align == 'left':
+        return text + ' ' * padding
+    elif align == 'right':
+        return ' ' * padding + text
+    else:  # center
+        left = padding // 2
+        return ' ' * left + text + ' ' * (padding - left)
+
+
+def _is_word_char(char):
+    return char.isascii() and char.isalnum()
+
+
+@lru_cache(maxsize=WRAP_CACHE_SIZE)
+def wrap_text(text, width, max_lines=None, by_chars=False):
+    """按显示宽度折行，返回各行组成的元组（每行不超过 width）
+
+    max_lines: 最多行数，超出部分截断在最后一行
+    by_chars: 按字符数而不是显示宽度计算（与 str.format 对齐的表格）
+    """
+    text = ' '.join(str(text).split())
+    widths = [1] * len(text) if by_chars else list(char_widths(text))
+    lines = []
+    start = 0
+    length = len(text)
+    while start < length:
+        if max_lines is not None and len(lines) == max_lines - 1:
+            rest = text[start:]
+            lines.append(rest[:width] if by_chars else truncate(rest, width)[0])
+            break
+
+        line_width = 0
+        end = start
+        last_break = -1
+        while end < length:
+            char = text[end]
+            if line_width + widths[end] > width:
+                break
+            if end > start and not (_is_word_char(char) and _is_word_char(text[end - 1])):
+                # 英文单词（字母数字串）之外的位置都可以断开
+                last_break = end
+            line_width += widths[end]
+            end += 1
+        if end == length:
+            lines.append(text[start:])
+            break
+        if end == start:
+            # 列宽放不下一个字符，至少放一个，避免死循环
+            end = start + 1
+        elif _is_word_char(text[end]) and _is_word_char(text[end - 1]) and last_break > start:
+            # 不在英文单词中间断开
+            end = last_break
+        elif text[end] in NO_BREAK_BEFORE and end - start > 1:
+            end -= 1
+        lines.append(text[start:end].rstrip())
+        start = end
+        while start < length and text[start] == ' ':
+            start += 1
+    return tuple(lines) or ('',)
+
+
+def clear_cache():
+    """清空单元格排版、折行缓存"""
+    _pad_wide.cache_clear()
+    wrap_text.cache_clear()
@@ -0,0 +1,353 @@
+# -*- coding: utf-8 -*-
+"""
+打印任务链路追踪
+设置 PRINT_TRACE_FILE 后，每个打印任务记录一条链路（trace），按 OTLP JSON 格式逐批追加到文件（每行一批），
+可导入 Jaeger / Tempo 或离线画出耗时瀑布图：
+    print_job（任务创建 -> 状态回写完成）
+      ├─ queued   任务创建到开始认领（轮询间隔造成的等待）
+      ├─ claim    认领请求
+      ├─ render   渲染（含 encode、多页订单的 render_page）
+      ├─ spool    提交打印（含 lp / ipp，属性 cups.job.id 为 lp 输出的打印作业ID）
+      └─ status   状态批量回写
+span 以打印任务ID（print.job.id）和CUPS打印作业ID（cups.job.id）关联；
+当前 span 放在 contextvars 中，渲染器、提交函数里的 span 自动成为其子 span（to_thread 会复制上下文）。
+未设置 PRINT_TRACE_FILE 时各函数只做一次判断
+"""
+
+import contextvars
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from print_core import metrics
+
+# 链路输出文件（OTLP JSON，每行一批），为空时不记录
+PRINT_TRACE_FILE = os.environ.get("PRINT_TRACE_FILE", "")
+
+# 服务名（resource 的 service.name）
+PRINT_TRACE_SERVICE = os.environ.get("PRINT_TRACE_SERVICE", "print-service")
+
+# 写入文件的间隔（秒）
+PRINT_TRACE_FLUSH_INTERVAL = float(os.environ.get("PRINT_TRACE_FLUSH_INTERVAL", "1"))
+
+# OTLP 枚举值
+SPAN_KIND_INTERNAL = 1
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current = contextvars.ContextVar("print_trace_span", default=None)
+
+
+def now():
+    """当前时间（Unix 纳秒）"""
+    return time.time_ns()
+
+
+def _random_id(size):
+    return os.urandom(size).hex()
+
+
+def _attribute(key, value):
+    """OTLP JSON 属性（64位整数按字符串表示）"""
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    elif isinstance(value, (list, tuple)):
+        typed = {"arrayValue": {"values": [_attribute("", item)["value"] for item in value]}}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def parse_time(value):
+    """任务创建时间（ISO 字符串或毫秒时间戳） -> Unix 纳秒，无法解析时返回 None"""
+    if not value:
+        return None
+    try:
+        if isinstance(value, (int, float)):
+            return int(value * 1_000_000)
+        return int(datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp() * 1e9)
+    except (ValueError, OverflowError):
+        return None
+
+
+class Span:
+    """一个 span
+
+    Args:
+        name: 名称
+        trace_id: 所属链路，不传时新建链路
+        parent: 父 span
+        start: 开始时间（Unix 纳秒），不传时为当前时间
+    """
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start', 'end', 'attributes', 'status', 'message')
+
+    def __init__(self, name, trace_id=None, parent=None, start=None, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else (trace_id or _random_id(16))
+        self.span_id = _random_id(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start = start or now()
+        self.end = None
+        self.attributes = dict(attributes or {})
+        self.status = STATUS_OK
+        self.message = None
+
+    def set(self, key, value):
+        """设置属性，值为 None 时忽略"""
+        if value is not None:
+            self.attributes[key] = value
+        return self
+
+    def fail(self, message):
+        """标记为失败"""
+        self.status = STATUS_ERROR
+        self.message = str(message)
+        return self
+
+    def to_otlp(self):
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end or now()),
+            "attributes": [_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": self.status},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.message:
+            span["status"]["message"] = self.message
+        return span
+
+
+class _NoopSpan:
+    """未启用追踪时的 span：所有操作都不做"""
+
+    def set(self, key, value):
+        return self
+
+    def fail(self, message):
+        return self
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """链路记录与导出
+
+    结束的 span 放入内存队列，后台线程每 flush_interval 秒把一批写成一行 OTLP JSON
+    （ExportTraceServiceRequest：resourceSpans -> scopeSpans -> spans）
+
+    Args:
+        path: 输出文件
+        service: 服务名
+        flush_interval: 写入间隔（秒）
+    """
+
+    def __init__(self, path, service=None, flush_interval=None):
+        self.path = path
+        self.flush_interval = flush_interval or PRINT_TRACE_FLUSH_INTERVAL
+        from print_core.api_client import PRINT_WORKER_ID
+        self.resource = {"attributes": [
+            _attribute("service.name", service or PRINT_TRACE_SERVICE),
+            _attribute("host.name", socket.gethostname()),
+            _attribute("print.worker.id", PRINT_WORKER_ID),
+        ]}
+        self._jobs = {}
+        self._finished = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def finish(self, span, end=None):
+        """结束 span，等待写入"""
+        span.end = end or now()
+        with self._lock:
+            self._finished.append(span)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+                self._thread.start()
+
+    def child(self, parent, name, start, end, **attributes):
+        """记录一个已经结束的子 span"""
+        span = Span(name, parent=parent, start=start, attributes=attributes)
+        self.finish(span, end)
+        return span
+
+    def job_span(self, job_id):
+        """打印任务的根 span（未开始追踪时为 None）"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def start_job(self, job, claim_started, claim_returned):
+        """认领到任务：根 span 从任务创建时间开始，记录排队和认领两段"""
+        created = parse_time(job.get("createdAt"))
+        root = Span("print_job", start=created or claim_started, attributes={
+            "print.job.id": job["id"],
+            "print.order.id": job.get("orderId") or job.get("order", {}).get("id"),
+            "print.printer": job.get("printerName"),
+        })
+        root.attributes = {key: value for key, value in root.attributes.items() if value is not None}
+        if created and created < claim_started:
+            self.child(root, "queued", created, claim_started)
+        self.child(root, "claim", max(created or claim_started, claim_started), claim_returned)
+        with self._lock:
+            self._jobs[job["id"]] = root
+        return root
+
+    def end_job(self, job_id, end=None, **attributes):
+        """结束打印任务的根 span"""
+        with self._lock:
+            root = self._jobs.pop(job_id, None)
+        if root is None:
+            return
+        for key, value in attributes.items():
+            root.set(key, value)
+        self.finish(root, end)
+
+    def flush(self):
+        """把已结束的 span 写入文件"""
+        with self._write_lock:
+            with self._lock:
+                spans, self._finished = self._finished, []
+            if not spans:
+                return
+            line = json.dumps({"resourceSpans": [{
+                "resource": self.resource,
+                "scopeSpans": [{"scope": {"name": "print_core"}, "spans": [span.to_otlp() for span in spans]}],
+            }]}, ensure_ascii=False, separators=(',', ':'))
+            try:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                print(f"写入链路文件失败: {e}")
+
+    def shutdown(self):
+        """停止服务：未完成的任务以当前时间结束并标记，写入剩余 span"""
+        with self._lock:
+            job_ids = list(self._jobs)
+        for job_id in job_ids:
+            self.end_job(job_id, **{"print.unfinished": True})
+        self.flush()
+
+    def _run(self):
+        """后台写入线程"""
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    """进程内的 Tracer，未设置 PRINT_TRACE_FILE 时为 None"""
+    global _tracer
+    if not PRINT_TRACE_FILE:
+        return None
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer(PRINT_TRACE_FILE)
+    return _tracer
+
+
+@contextmanager
+def span(name, job_id=None, **attributes):
+    """记录 with 块为一个 span，返回的 span 可设置属性；抛出异常时标记为失败
+
+    父 span 为当前上下文中的 span；传入 job_id 且当前 span 不属于该任务时，父 span 为任务的根 span。
+    不在任何任务链路中时（如渲染进程池的子进程里）不记录
+    """
+    tracer = get_tracer()
+    if tracer is None:
+        yield NOOP_SPAN
+        return
+
+    parent = _current.get()
+    if job_id is not None:
+        root = tracer.job_span(job_id)
+        if root is not None and (parent is None or parent.trace_id != root.trace_id):
+            parent = root
+    if parent is None:
+        yield NOOP_SPAN
+        return
+    current = Span(name, parent=parent, attributes={key: value for key, value in attributes.items() if value is not None})
+    if job_id is not None:
+        current.set("print.job.id", job_id)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.fail(str(e) or type(e).__name__)
+        raise
+    finally:
+        _current.reset(token)
+        tracer.finish(current)
+
+
+@contextmanager
+def stage(name, job_id=None, **attributes):
+    """处理阶段：同时记录阶段耗时指标（print_stage_seconds）和 span"""
+    with metrics.timed(name), span(name, job_id, **attributes) as current:
+        yield current
+
+
+def jobs_claimed(jobs, started):
+    """认领返回：为每个任务开始一条链路（started 为开始认领的时间，Unix 纳秒）"""
+    tracer = get_tracer()
+    if tracer is None or not jobs:
+        return
+    returned = now()
+    for job in jobs:
+        tracer.start_job(job, started, returned)
+
+
+def job_error(job_id, message):
+    """任务渲染或提交异常：根 span 标记为失败"""
+    tracer = get_tracer()
+    if tracer is None:
+        return
+    root = tracer.job_span(job_id)
+    if root is not None:
+        root.fail(message)
+
+
+def statuses_flushed(records, started, ok):
+    """状态批量回写结束：每个任务记录 status 子 span，回写成功的任务结束链路"""
+    tracer = get_tracer()
+    if tracer is None:
+        return
+    ended = now()
+    for record in records:
+        root = tracer.job_span(record["id"])
+        if root is None:
+            continue
+        status = tracer.child(root, "status", started, ended, **{"print.status": record["status"]})
+        if not ok:
+            status.fail("状态回写失败")
+            continue
+        if record["status"] == 'failed':
+            root.fail(record.get("errorMessage") or "打印失败")
+        tracer.end_job(record["id"], ended, **{"print.status": record["status"]})
+
+
+def shutdown():
+    """停止服务时写入剩余的 span"""
+    if _tracer is not None:
+        _tracer.shutdown()
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+打印服务主循环
+认领任务 -> 渲染线程池并行渲染 -> 按打印机顺序提交 -> 状态批量回写，各打印服务共用；
+多页订单在渲染线程中只生成第一页，提交时边渲染边逐页发送
+"""
+
+import os
+import time
+
+from print_core import metrics, tracing
+from print_core.api_client import StatusBuffer
+from print_core.dispatcher import JobDispatcher
+from print_core.render_cache import PRINT_RENDER_CACHE, RenderCache
+from print_core.renderers.base import PageStream
+from print_core.sinks import close_sink
+
+# 每次认领的任务数
+BATCH_SIZE = 10
+
+# 设为 1 时，支持合并打印的渲染器（HTML+PDF）把同一打印机的一批任务合成一个文档提交
+PRINT_BATCH_DOCUMENT = os.environ.get("PRINT_BATCH_DOCUMENT", "0") == "1"
+
+# 多页订单逐页提交（设为 0 时整单渲染为一个文档后提交，可使用渲染缓存）
+PRINT_STREAM_PAGES = os.environ.get("PRINT_STREAM_PAGES", "1") == "1"
+
+
+class PrintWorker:
+    """打印服务
+
+    Args:
+        renderer: 渲染器（print_core.renderers.base.Renderer）
+        client: 任务客户端（APIClient 或 DBClient）
+        default_printer: 任务未指定打印机时使用的打印机
+        batch_size: 每次认领的任务数
+        max_workers: 渲染线程数
+        render_cache: 渲染缓存，默认按 PRINT_RENDER_CACHE 创建，传 False 关闭
+        batch_document: 一批任务合成一个文档提交，默认按 PRINT_BATCH_DOCUMENT
+        stream_pages: 多页订单逐页提交，默认按 PRINT_STREAM_PAGES
+    """
+
+    def __init__(self, renderer, client, default_printer="default", batch_size=None, max_workers=None,
+                 render_cache=None, batch_document=None, stream_pages=None):
+        self.renderer = renderer
+        self.client = client
+        self.stream_pages = PRINT_STREAM_PAGES if stream_pages is None else stream_pages
+        batch_document = PRINT_BATCH_DOCUMENT if batch_document is None else batch_document
+        self.batch_document = batch_document and hasattr(renderer, 'render_batch')
+        if render_cache is None:
+            render_cache = RenderCache() if PRINT_RENDER_CACHE else False
+        self.render_cache = render_cache or None
+        self.status_buffer = StatusBuffer(client)
+        self.default_printer = default_printer
+        self.batch_size = batch_size or BATCH_SIZE
+        self.dispatcher = JobDispatcher(
+            self.render, self.submit,
+            on_error=self.handle_error,
+            default_printer=default_printer,
+            max_workers=max_workers
+        )
+        self.poll_clock = metrics.PollClock()
+
+    def render(self, job):
+        """渲染阶段（在渲染线程池中执行）"""
+        print(f"处理打印任务 #{job['id']}, 订单 #{job.get('orderId') or job.get('order', {}).get('id')}")
+        with tracing.stage("render", job['id']):
+            if self.stream_pages and self.renderer.page_count(job) > 1:
+                return PageStream(self.renderer.render_pages(job))
+            if self.render_cache is not None:
+                return self.render_cache.render(self.renderer, job)
+            return self.renderer.render(job)
+
+    def submit(self, printer_name, job, document):
+        """提交阶段：发送到打印机并回写状态（在打印机队列线程中按顺序执行）"""
+        job_id = job['id']
+        with tracing.stage("spool", job_id, **{"print.printer": printer_name}) as span:
+            if isinstance(document, PageStream):
+                success, spool_id, error = self.renderer.spool_pages(printer_name, document)
+            else:
+                success, spool_id, error = self.renderer.spool(printer_name, document)
+            span.set("cups.job.id", spool_id)
+            if not success:
+                span.fail(error)
+        metrics.job_finished(printer_name, 'completed' if success else 'failed')
+
+        if success:
+            print(f"打印成功 #{job_id}" + (f", 打印作业: {spool_id}" if spool_id else ""))
+            self.status_buffer.update_status(job_id, 'completed', printer_name=printer_name)
+        else:
+            print(f"打印失败 #{job_id}: {error}")
+            self.status_buffer.update_status(job_id, 'failed', error_message=error)
+        return success
+
+    def handle_error(self, job, e):
+        """渲染或提交异常"""
+        job_id = job['id']
+        error_msg = str(e)
+        metrics.job_finished(self.dispatcher.printer_for(job), 'error')
+        tracing.job_error(job_id, error_msg)
+        print(f"打印任务 #{job_id} 失败: {error_msg}")
+        self.status_buffer.update_status(job_id, 'failed', error_message=error_msg)
+
+    def process(self, job):
+        """顺序处理单个打印任务"""
+        try:
+            document = self.render(job)
+            return self.submit(self.dispatcher.printer_for(job), job, document)
+        except Exception as e:
+            self.handle_error(job, e)
+            return False
+
+    def run_batch_document(self, jobs):
+        """按打印机分组，每组合成一个文档提交，组内任务状态相同"""
+        groups = {}
+        for job in jobs:
+            groups.setdefault(self.dispatcher.printer_for(job), []).append(job)
+
+        for printer_name, group in groups.items():
+            job_ids = ', '.join(f"#{job['id']}" for job in group)
+            # 合并的文档记录在组内第一个任务的链路中
+            trace_attributes = {"print.job.ids": [job['id'] for job in group]}
+            try:
+                with tracing.stage("render", group[0]['id'], **trace_attributes):
+                    document = self.renderer.render_batch(group)
+                with tracing.stage("spool", group[0]['id'], **{"print.printer": printer_name}, **trace_attributes) as span:
+                    success, spool_id, error = self.renderer.spool(printer_name, document)
+                    span.set("cups.job.id", spool_id)
+                outcome = 'completed' if success else 'failed'
+            except Exception as e:
+                success, spool_id, error = False, None, str(e)
+                outcome = 'error'
+            metrics.job_finished(printer_name, outcome, count=len(group))
+
+            if success:
+                print(f"合并打印成功 {job_ids}" + (f", 打印作业: {spool_id}" if spool_id else ""))
+            else:
+                print(f"合并打印失败 {job_ids}: {error}")
+            for job in group:
+                if success:
+                    self.status_buffer.update_status(job['id'], 'completed', printer_name=printer_name)
+                else:
+                    self.status_buffer.update_status(job['id'], 'failed', error_message=error)
+
+    def run_once(self):
+        """认领并处理一批任务，返回任务数"""
+        started = self.poll_clock.claiming()
+        claim_started = tracing.now()
+        jobs = self.client.wait_for_jobs(limit=self.batch_size)
+        self.poll_clock.claimed(jobs, started)
+        tracing.jobs_claimed(jobs, claim_started)
+        if jobs:
+            print(f"发现 {len(jobs)} 个待打印任务")
+            self.status_buffer.start()
+            if self.batch_document:
+                self.run_batch_document(jobs)
+            else:
+                self.dispatcher.run_batch(jobs)
+            self.status_buffer.flush()
+        else:
+            print("没有待打印任务")
+        return len(jobs)
+
+    def run_forever(self):
+        """主循环，Ctrl+C 停止；设置了 PRINT_METRICS_PORT 时同时提供指标接口"""
+        metrics.WORKER_INFO.set(1, self.renderer.name, "thread", getattr(self.client, "worker_id", ""))
+        metrics.start_server()
+        while True:
+            try:
+                self.run_once()
+            except KeyboardInterrupt:
+                print("\n打印服务已停止")
+                self.stop()
+                return
+            except Exception as e:
+                print(f"错误: {e}")
+                time.sleep(self.client.poll_interval)
+
+    def stop(self):
+        """停止渲染线程，提交剩余状态，关闭打印机连接、渲染进程和客户端"""
+        self.dispatcher.shutdown()
+        self.status_buffer.flush()
+        close_sink()
+        self.renderer.close()
+        print(self.client.latency.summary())
+        if self.render_cache is not None:
+            print(self.render_cache.summary())
+        self.client.close()
+        tracing.shutdown()
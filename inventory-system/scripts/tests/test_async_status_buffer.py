@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+AsyncStatusBuffer：停止服务时取消提交中的状态，最后一次 flush 仍要提交
+运行: cd scripts && python -m pytest -q tests
+"""
+
+import asyncio
+
+from print_core.async_client import AsyncStatusBuffer
+
+
+class SlowClient:
+    """update_statuses 耗时 delay 秒的任务客户端"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.calls = []
+        self.cancelled = 0
+
+    async def update_statuses(self, records):
+        self.calls.append([record["id"] for record in records])
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return True
+
+    async def renew_leases(self):
+        return set()
+
+
+def test_cancelled_flush_keeps_records():
+    async def scenario():
+        client = SlowClient(0.5)
+        buffer = AsyncStatusBuffer(client, flush_interval=0.01, timeout=5)
+        buffer.update_status(1, 'completed', printer_name='P')
+        task = asyncio.create_task(buffer.run())
+        await asyncio.sleep(0.1)
+        # 提交进行中取消后台任务（AsyncPrintWorker.stop 的顺序）
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert client.cancelled == 1
+        assert list(buffer._pending) == [1]
+
+        client.delay = 0
+        assert await buffer.flush() is True
+        assert client.calls == [[1], [1]]
+        assert not buffer._pending
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_flush_keeps_newer_status():
+    async def scenario():
+        client = SlowClient(0.5)
+        buffer = AsyncStatusBuffer(client, flush_interval=0.01, timeout=5)
+        buffer.update_status(1, 'processing')
+        flushing = asyncio.create_task(buffer.flush())
+        await asyncio.sleep(0.1)
+        # 提交期间到达的新状态不被旧记录覆盖
+        buffer.update_status(1, 'completed')
+        flushing.cancel()
+        await asyncio.gather(flushing, return_exceptions=True)
+        assert buffer._pending[1]["status"] == 'completed'
+
+    asyncio.run(scenario())
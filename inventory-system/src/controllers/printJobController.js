@@ -1,6 +1,335 @@
-const { PrismaClient } = require('@prisma/client');
+const { EventEmitter } = require('events');
+const { PrismaClient, Prisma } = require('@prisma/client');
 const prisma = new PrismaClient();
 
+// 打印任务事件：新任务进入待打印状态时通知挂起的长轮询请求
+const printJobEvents = new EventEmitter();
+printJobEvents.setMaxListeners(0);
+
+// 长轮询最长等待时间（秒）
+const MAX_WAIT_SECONDS = 60;
+
+// 认领租约默认/最长时间（秒）
+const DEFAULT_LEASE_SECONDS = 300;
+const MAX_LEASE_SECONDS = 3600;
+
+// 解析长轮询等待时间
+const parseWaitSeconds = (wait) => Math.min(Math.max(parseInt(wait) || 0, 0), MAX_WAIT_SECONDS);
+
+// 打印任务需要的订单数据
+const printJobInclude = {
+  order: {
+    include: {
+      customer: true,
+      products: {
+        include: {
+          productUnit: true,
+          product: {
+            include: {
+              category: true
+            }
+          }
+        }
+      }
+    }
+  }
+};
+
+// 打印视图：只包含渲染需要的字段，一条联表查询取回任务、订单、客户和商品明细
+const PRINT_VIEW = 'print';
+
+// 打印视图中商品明细为数组，字段顺序如下
+const PRINT_VIEW_ITEM_FIELDS = ['code', 'name', 'quantity', 'unitName', 'specification', 'price', 'totalAmount'];
+
+// SQLite 中 DateTime 存为毫秒时间戳，原生查询返回的可能是数字、文本或 Date
+const toISOString = (value) => {
+  if (value === null || value === undefined) {
+    return null;
+  }
+  const date = value instanceof Date ? value : new Date(typeof value === 'bigint' ? Number(value) : value);
+  return isNaN(date.getTime()) ? String(value) : date.toISOString();
+};
+
+// 查询打印视图，按 ids 中任务的创建时间排序
+const findPrintViews = async (ids) => {
+  if (ids.length === 0) {
+    return [];
+  }
+
+  const rows = await prisma.$queryRaw`
+    SELECT pj.id AS jobId, pj.orderId, pj.printerName, pj.createdAt AS jobCreatedAt,
+           so.orderNumber, so.totalAmount AS orderTotalAmount, so.createdAt AS orderCreatedAt,
+           c.name AS customerName, c.phone AS customerPhone,
+           p.code, p.name, sop.quantity, pu.unitName, pu.specification, sop.price, sop.totalAmount
+    FROM PrintJob pj
+    JOIN SalesOrder so ON so.id = pj.orderId
+    JOIN Customer c ON c.id = so.customerId
+    LEFT JOIN SalesOrderProduct sop ON sop.salesOrderId = so.id
+    LEFT JOIN Product p ON p.id = sop.productId
+    LEFT JOIN ProductUnit pu ON pu.id = sop.productUnitId
+    WHERE pj.id IN (${Prisma.join(ids)})
+    ORDER BY pj.createdAt ASC, pj.id ASC, sop.id ASC
+  `;
+
+  const jobs = new Map();
+  for (const row of rows) {
+    const jobId = Number(row.jobId);
+    let job = jobs.get(jobId);
+    if (!job) {
+      job = {
+        id: jobId,
+        orderId: Number(row.orderId),
+        printerName: row.printerName,
+        createdAt: toISOString(row.jobCreatedAt),
+        orderNumber: row.orderNumber,
+        orderCreatedAt: toISOString(row.orderCreatedAt),
+        totalAmount: Number(row.orderTotalAmount),
+        customerName: row.customerName,
+        customerPhone: row.customerPhone,
+        items: []
+      };
+      jobs.set(jobId, job);
+    }
+    // 没有商品的订单 LEFT JOIN 出一行空明细
+    if (row.name !== null) {
+      job.items.push([
+        row.code,
+        row.name,
+        Number(row.quantity),
+        row.unitName || '',
+        row.specification || '',
+        Number(row.price),
+        Number(row.totalAmount)
+      ]);
+    }
+  }
+  return Array.from(jobs.values());
+};
+
+// 按视图加载任务：print 为打印视图，否则为包含完整订单数据的任务
+const loadPrintJobs = (ids, view) => {
+  if (view === PRINT_VIEW) {
+    return findPrintViews(ids);
+  }
+  if (ids.length === 0) {
+    return [];
+  }
+  return prisma.printJob.findMany({
+    where: { id: { in: ids } },
+    include: printJobInclude,
+    orderBy: { createdAt: 'asc' }
+  });
+};
+
+// 打印任务列表响应，打印视图附带商品明细字段名
+const printJobsResponse = (printJobs, view) => {
+  if (view === PRINT_VIEW) {
+    return { success: true, view, itemFields: PRINT_VIEW_ITEM_FIELDS, data: printJobs };
+  }
+  return { success: true, data: printJobs };
+};
+
+// 查询待打印任务
+const findPendingPrintJobs = async (limit, view) => {
+  const pending = await prisma.printJob.findMany({
+    where: {
+      status: 'pending'
+    },
+    select: { id: true },
+    orderBy: {
+      createdAt: 'asc'
+    },
+    take: limit
+  });
+  return loadPrintJobs(pending.map((job) => job.id), view);
+};
+
+// 可认领的任务：待打印，或处理中但租约已过期（打印服务崩溃/失联）
+const claimableWhere = (now) => ({
+  OR: [
+    { status: 'pending' },
+    { status: 'processing', leaseExpiresAt: { lt: now } }
+  ]
+});
+
+// 认领任务：条件更新保证同一任务只会被一个打印服务认领
+const claimPrintJobs = async (workerId, limit, leaseSeconds, printerName, view) => {
+  const now = new Date();
+  const leaseExpiresAt = new Date(now.getTime() + leaseSeconds * 1000);
+
+  const candidates = await prisma.printJob.findMany({
+    where: claimableWhere(now),
+    select: { id: true },
+    orderBy: { createdAt: 'asc' },
+    take: limit
+  });
+  if (candidates.length === 0) {
+    return [];
+  }
+
+  const data = {
+    status: 'processing',
+    workerId,
+    leaseExpiresAt,
+    updatedAt: now
+  };
+  if (printerName) {
+    data.printerName = printerName;
+  }
+
+  // 同时认领时其他服务已抢到的任务不再满足条件，不会被更新
+  const ids = candidates.map((job) => job.id);
+  const { count } = await prisma.printJob.updateMany({
+    where: { id: { in: ids }, ...claimableWhere(now) },
+    data
+  });
+  if (count === 0) {
+    return [];
+  }
+
+  const claimed = await prisma.printJob.findMany({
+    where: { id: { in: ids }, workerId, leaseExpiresAt },
+    select: { id: true }
+  });
+  return loadPrintJobs(claimed.map((job) => job.id), view);
+};
+
+// 仍由 workerId 持有的任务：认领者一致且租约未过期（终态任务的租约已释放，重复提交同一状态不受影响）
+// 租约过期的任务可能已被重新认领，旧打印服务不能再更新状态或续租
+const leaseHeldWhere = (workerId, now) => ({
+  workerId,
+  OR: [
+    { leaseExpiresAt: null },
+    { leaseExpiresAt: { gte: now } }
+  ]
+});
+
+// 续租：把 workerId 仍持有的处理中任务的租约延长 leaseSeconds 秒，返回续租成功的任务ID
+const renewLeases = async (workerId, ids, leaseSeconds) => {
+  const now = new Date();
+  const leaseExpiresAt = new Date(now.getTime() + leaseSeconds * 1000);
+
+  const { count } = await prisma.printJob.updateMany({
+    where: { id: { in: ids }, status: 'processing', ...leaseHeldWhere(workerId, now) },
+    data: { leaseExpiresAt }
+  });
+  if (count === 0) {
+    return [];
+  }
+
+  const renewed = await prisma.printJob.findMany({
+    where: { id: { in: ids }, workerId, leaseExpiresAt },
+    select: { id: true }
+  });
+  return renewed.map((job) => job.id);
+};
+
+// 打印任务状态
+const VALID_STATUSES = ['pending', 'processing', 'completed', 'failed'];
+
+// 批量更新状态最多条数
+const MAX_BATCH_UPDATES = 500;
+
+// 校验状态值，返回错误信息
+const validateStatus = (status) => {
+  if (!status) {
+    return '状态不能为空';
+  }
+  if (!VALID_STATUSES.includes(status)) {
+    return '无效的状态值';
+  }
+  return null;
+};
+
+// 构造状态更新数据
+const buildStatusUpdateData = ({ status, printerName, errorMessage }) => {
+  const updateData = {
+    status,
+    updatedAt: new Date()
+  };
+
+  if (printerName) {
+    updateData.printerName = printerName;
+  }
+
+  if (errorMessage !== undefined) {
+    updateData.errorMessage = errorMessage;
+  }
+
+  if (status === 'completed') {
+    updateData.printedAt = new Date();
+  }
+
+  // 任务结束或放回队列时释放租约
+  if (status !== 'processing') {
+    updateData.leaseExpiresAt = null;
+  }
+  if (status === 'pending') {
+    updateData.workerId = null;
+  }
+
+  return updateData;
+};
+
+// 订阅新打印任务事件，wait(timeoutMs) 返回 'pending' | 'timeout' | 'closed'（客户端已断开）
+// 订阅后发生的事件都会被记住：查询前订阅，查询期间创建的任务也会唤醒等待
+const watchPrintJobs = (res) => {
+  let signaled = null;
+  let wake = null;
+  let timer = null;
+  const notify = (reason) => {
+    if (!signaled) {
+      signaled = reason;
+      if (wake) {
+        wake(reason);
+      }
+    }
+  };
+  const onPending = () => notify('pending');
+  const onClose = () => notify('closed');
+  printJobEvents.on('pending', onPending);
+  res.on('close', onClose);
+
+  return {
+    wait: (timeoutMs) => new Promise((resolve) => {
+      if (signaled) {
+        resolve(signaled);
+        return;
+      }
+      wake = resolve;
+      timer = setTimeout(() => notify('timeout'), timeoutMs);
+    }),
+    stop: () => {
+      clearTimeout(timer);
+      printJobEvents.off('pending', onPending);
+      res.off('close', onClose);
+    }
+  };
+};
+
+// 长轮询：query() 没有返回任务时等待新任务再查询，直到超时；客户端断开时返回 null
+const longPoll = async (res, wait, query) => {
+  const deadline = Date.now() + parseWaitSeconds(wait) * 1000;
+  for (;;) {
+    const watcher = watchPrintJobs(res);
+    try {
+      const printJobs = await query();
+      if (printJobs.length > 0 || Date.now() >= deadline) {
+        return printJobs;
+      }
+      const reason = await watcher.wait(deadline - Date.now());
+      if (reason === 'closed') {
+        return null;
+      }
+      if (reason === 'timeout') {
+        return printJobs;
+      }
+    } finally {
+      watcher.stop();
+    }
+  }
+};
+
 // 创建打印任务
 exports.createPrintJob = async (req, res) => {
   try {
@@ -34,6 +363,7 @@ exports.createPrintJob = async (req, res) => {
         status: 'pending'
       }
     });
+    printJobEvents.emit('pending', printJob);
 
     res.status(201).json({
       success: true,
@@ -47,44 +377,77 @@ exports.createPrintJob = async (req, res) => {
 };
 
 // 获取待打印任务列表
+// 传入 wait（秒）时为长轮询：没有任务则挂起请求，直到有新任务或超时
+// 传入 view=print 时返回打印视图
 exports.getPendingPrintJobs = async (req, res) => {
   try {
-    const { limit = 10 } = req.query;
+    const { limit = 10, wait = 0, view } = req.query;
+    const take = parseInt(limit);
 
-    const printJobs = await prisma.printJob.findMany({
-      where: {
-        status: 'pending'
-      },
-      include: {
-        order: {
-          include: {
-            customer: true,
-            products: {
-              include: {
-                productUnit: true,
-                product: {
-                  include: {
-                    category: true
-                  }
-                }
-              }
-            }
-          }
-        }
-      },
-      orderBy: {
-        createdAt: 'asc'
-      },
-      take: parseInt(limit)
-    });
+    const printJobs = await longPoll(res, wait, () => findPendingPrintJobs(take, view));
+    if (printJobs === null) {
+      return;
+    }
+
+    res.json(printJobsResponse(printJobs, view));
+  } catch (error) {
+    console.error('获取打印任务失败:', error);
+    res.status(500).json({ error: '获取打印任务失败: ' + error.message });
+  }
+};
+
+// 认领待打印任务：原子地把最多 limit 个任务标记为由 workerId 处理，租约 leaseSeconds 秒
+// 租约过期未完成的任务会被重新认领；传入 wait（秒）时没有任务则长轮询等待
+// 传入 view=print 时返回打印视图
+exports.claimPrintJobs = async (req, res) => {
+  try {
+    const { workerId, limit = 10, leaseSeconds = DEFAULT_LEASE_SECONDS, wait = 0, printerName, view } = req.body;
+
+    if (!workerId) {
+      return res.status(400).json({ error: '打印服务ID不能为空' });
+    }
+
+    const take = parseInt(limit);
+    const lease = Math.min(Math.max(parseInt(leaseSeconds) || DEFAULT_LEASE_SECONDS, 1), MAX_LEASE_SECONDS);
+
+    const printJobs = await longPoll(res, wait, () => claimPrintJobs(workerId, take, lease, printerName, view));
+    if (printJobs === null) {
+      return;
+    }
+
+    res.json(printJobsResponse(printJobs, view));
+  } catch (error) {
+    console.error('认领打印任务失败:', error);
+    res.status(500).json({ error: '认领打印任务失败: ' + error.message });
+  }
+};
+
+// 续租：打印服务处理时间较长（一批任务排队、多页订单）时定期调用，避免租约过期后任务被重新认领、重复打印
+// 返回续租成功的任务ID，不在其中的任务已不归该打印服务所有
+exports.renewPrintJobLeases = async (req, res) => {
+  try {
+    const { workerId, ids, leaseSeconds = DEFAULT_LEASE_SECONDS } = req.body;
+
+    if (!workerId) {
+      return res.status(400).json({ error: '打印服务ID不能为空' });
+    }
+    if (!Array.isArray(ids) || ids.length === 0) {
+      return res.status(400).json({ error: '打印任务ID不能为空' });
+    }
+    if (ids.length > MAX_BATCH_UPDATES) {
+      return res.status(400).json({ error: `一次最多续租${MAX_BATCH_UPDATES}个任务` });
+    }
+
+    const lease = Math.min(Math.max(parseInt(leaseSeconds) || DEFAULT_LEASE_SECONDS, 1), MAX_LEASE_SECONDS);
+    const renewed = await renewLeases(workerId, ids.map((id) => parseInt(id)), lease);
 
     res.json({
       success: true,
-      data: printJobs
+      data: renewed
     });
   } catch (error) {
-    console.error('获取打印任务失败:', error);
-    res.status(500).json({ error: '获取打印任务失败: ' + error.message });
+    console.error('打印任务续租失败:', error);
+    res.status(500).json({ error: '打印任务续租失败: ' + error.message });
   }
 };
 
@@ -92,47 +455,102 @@ exports.getPendingPrintJobs = async (req, res) => {
 exports.updatePrintJobStatus = async (req, res) => {
   try {
     const { id } = req.params;
-    const { status, printerName, errorMessage } = req.body;
+    const { status, printerName, errorMessage, workerId } = req.body;
 
-    if (!status) {
-      return res.status(400).json({ error: '状态不能为空' });
+    const validationError = validateStatus(status);
+    if (validationError) {
+      return res.status(400).json({ error: validationError });
     }
 
-    const validStatuses = ['pending', 'processing', 'completed', 'failed'];
-    if (!validStatuses.includes(status)) {
-      return res.status(400).json({ error: '无效的状态值' });
+    const updateData = buildStatusUpdateData({ status, printerName, errorMessage });
+
+    // 带 workerId 时只有租约未过期的持有者可以更新，避免租约过期被重新认领后旧服务覆盖状态
+    let printJob;
+    if (workerId) {
+      const { count } = await prisma.printJob.updateMany({
+        where: { id: parseInt(id), ...leaseHeldWhere(workerId, new Date()) },
+        data: updateData
+      });
+      if (count === 0) {
+        return res.status(409).json({ error: '打印任务已被其他打印服务认领' });
+      }
+      printJob = await prisma.printJob.findUnique({ where: { id: parseInt(id) } });
+    } else {
+      printJob = await prisma.printJob.update({
+        where: { id: parseInt(id) },
+        data: updateData
+      });
     }
 
-    const updateData = {
-      status,
-      updatedAt: new Date()
-    };
+    // 重新放回待打印队列时唤醒等待中的打印服务
+    if (status === 'pending') {
+      printJobEvents.emit('pending', printJob);
+    }
+
+    res.json({
+      success: true,
+      message: '打印任务状态已更新',
+      data: printJob
+    });
+  } catch (error) {
+    console.error('更新打印任务状态失败:', error);
+    res.status(500).json({ error: '更新打印任务状态失败: ' + error.message });
+  }
+};
+
+// 批量更新打印任务状态：updates 为 [{ id, status, printerName, errorMessage, workerId }]
+// 所有更新在同一个事务中执行；带 workerId 的记录只有租约未过期的持有者可以更新
+exports.updatePrintJobStatuses = async (req, res) => {
+  try {
+    const { updates } = req.body;
 
-    if (printerName) {
-      updateData.printerName = printerName;
+    if (!Array.isArray(updates) || updates.length === 0) {
+      return res.status(400).json({ error: '更新列表不能为空' });
     }
 
-    if (errorMessage !== undefined) {
-      updateData.errorMessage = errorMessage;
+    if (updates.length > MAX_BATCH_UPDATES) {
+      return res.status(400).json({ error: `一次最多更新${MAX_BATCH_UPDATES}条` });
     }
 
-    if (status === 'completed') {
-      updateData.printedAt = new Date();
+    for (const update of updates) {
+      if (!update || !parseInt(update.id)) {
+        return res.status(400).json({ error: '打印任务ID不能为空' });
+      }
+      const validationError = validateStatus(update.status);
+      if (validationError) {
+        return res.status(400).json({ error: `打印任务 #${update.id}: ${validationError}` });
+      }
     }
 
-    const printJob = await prisma.printJob.update({
-      where: { id: parseInt(id) },
-      data: updateData
-    });
+    const now = new Date();
+    const results = await prisma.$transaction(updates.map((update) => {
+      let where = { id: parseInt(update.id) };
+      if (update.workerId) {
+        where = { ...where, ...leaseHeldWhere(update.workerId, now) };
+      }
+      return prisma.printJob.updateMany({
+        where,
+        data: buildStatusUpdateData(update)
+      });
+    }));
+
+    // 重新放回待打印队列时唤醒等待中的打印服务
+    if (updates.some((update) => update.status === 'pending')) {
+      printJobEvents.emit('pending');
+    }
 
     res.json({
       success: true,
       message: '打印任务状态已更新',
-      data: printJob
+      data: updates.map((update, index) => ({
+        id: parseInt(update.id),
+        status: update.status,
+        updated: results[index].count > 0
+      }))
     });
   } catch (error) {
-    console.error('更新打印任务状态失败:', error);
-    res.status(500).json({ error: '更新打印任务状态失败: ' + error.message });
+    console.error('批量更新打印任务状态失败:', error);
+    res.status(500).json({ error: '批量更新打印任务状态失败: ' + error.message });
   }
 };
 
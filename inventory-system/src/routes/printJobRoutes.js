@@ -8,9 +8,18 @@ router.post('/', printJobController.createPrintJob);
 // 获取待打印任务列表
 router.get('/pending', printJobController.getPendingPrintJobs);
 
+// 认领待打印任务（带租约）
+router.post('/claim', printJobController.claimPrintJobs);
+
+// 续租（打印服务处理中的任务）
+router.put('/lease', printJobController.renewPrintJobLeases);
+
 // 获取打印任务详情
 router.get('/:id', printJobController.getPrintJobDetail);
 
+// 批量更新打印任务状态
+router.put('/status', printJobController.updatePrintJobStatuses);
+
 // 更新打印任务状态
 router.put('/:id/status', printJobController.updatePrintJobStatus);
 